@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Batch comparison of pairs of files from file batch.py used in file cli.py.
+Every file which is used in several pairs (for example, one baseline and a
+lot of candidates) is loaded and converted to the dictionary only once, then
+pairs are compared in a pool of processes which share these dictionaries
+"""
+
+
+import collections
+import concurrent.futures
+import os
+
+import engines
+import utils
+import const
+
+
+SHARED = {}
+
+
+def set_shared(shared):
+    """
+    Set dictionaries of files which are used in several pairs. It is the
+    initializer of processes of the pool, so with fork the dictionaries are
+    not copied, but shared as read-only memory
+    """
+    SHARED.clear()
+    SHARED.update(shared)
+
+
+def get_report_paths(paths, directory):
+    """
+    Create paths of reports in the directory for files on the paths. Names
+    of reports are built from paths relative to the common directory of the
+    files, so files with the same name from different directories get
+    different reports. Equal names are rejected.
+    Return list of paths
+    """
+    paths = [os.path.abspath(x) for x in paths]
+    root = os.path.commonpath([os.path.dirname(x) for x in paths or ['.']])
+    names = [os.path.relpath(x, root).replace(os.sep, '_') +
+             const.REPORT_EXTENSION for x in paths]
+
+    repeated = [x for x, count in collections.Counter(names).items()
+                if count > 1]
+    if repeated:
+        raise ValueError(f'{const.ERROR_REPORT_NAMES}{", ".join(repeated)}')
+    return [os.path.join(directory, x) for x in names]
+
+
+def get_pairs(baseline, candidates, directory):
+    """
+    Create pairs of the baseline and every candidate with paths of reports
+    in the directory.
+    Return list of tuples (first path, second path, output path) and error
+    or None as tuple
+    """
+    result = None
+    error = None
+
+    try:
+        result = list(zip([baseline] * len(candidates), candidates,
+                          get_report_paths(candidates, directory)))
+
+    except Exception as err:  # pylint: disable=W0703
+        error = f'{const.GET_PAIRS}{const.FAILED_ERROR}{err}'
+
+    return result, error
+
+
+def load_manifest(path, directory):
+    """
+    Load pairs from csv-file with columns from const.MANIFEST_HEADER. If the
+    output path is empty, the report is saved in the directory like in
+    get_pairs.
+    Return list of pairs and error or None as tuple
+    """
+    result = None
+    error = None
+
+    try:
+        data, error = utils.load_data(path)
+        if error is None:
+            header = data[0]
+            pairs = [dict(zip(header, row)) for row in data[1:]]
+            report_paths = iter(get_report_paths(
+                [x[const.SECOND_FILE] for x in pairs
+                 if not x.get(const.OUTPUT_FILE)], directory
+            ))
+            result = [(x[const.FIRST_FILE], x[const.SECOND_FILE],
+                       x.get(const.OUTPUT_FILE) or next(report_paths))
+                      for x in pairs]
+
+    except Exception as err:  # pylint: disable=W0703
+        error = f'{const.LOAD_MANIFEST}{const.FAILED_ERROR}{err}'
+
+    return result, error
+
+
+def load_dict(path, name_key_field, rules=None):
+    """
+    Load file on the path with rules (see utils.compile_rules) and convert
+    it to the dictionary.
+    Return header and dictionary as tuple
+    """
+    data, error = utils.load_data(path, None, rules)
+    if error is not None:
+        raise ValueError(error)
+    result, error = utils.convert_csv_to_dict(data, name_key_field, None)
+    if error is not None:
+        raise ValueError(error)
+    return data[0], result
+
+
+def compare_pair(pair, settings, key_field):
+    """
+    Compare files of the pair with dictionaries from SHARED or loaded ones
+    and save report on the output path of the pair.
+    Return dictionary with paths, statistics and error
+    """
+    statistics = None
+    error = None
+
+    try:
+        items = [SHARED.get(path) or load_dict(path, key_field, settings)
+                 for path in pair[:2]]
+        settings = engines.resolve_fields(settings, [x[0] for x in items])
+        dicts = [x[1] for x in items]
+        error = utils.save_data(pair[2], utils.generate_report(
+            dicts, settings, key_field
+        ))
+        statistics = utils.generate_statistics(dicts, settings, key_field)
+
+    except Exception as err:  # pylint: disable=W0703
+        error = f'{const.COMPARE_PAIR}{const.FAILED_ERROR}{err}'
+
+    return dict(zip(const.MANIFEST_HEADER, pair), **{
+        const.STATISTICS: statistics, const.ERROR: error,
+    })
+
+
+def compare_statistics(paths, output_path, settings, key_field):
+    """
+    Count statistics of differences of two files (see
+    utils.generate_statistics) without the report and save them in
+    json-file on the output path.
+    Return statistics and error or None as tuple
+    """
+    result = None
+    error = None
+
+    try:
+        items = [load_dict(path, key_field, settings) for path in paths]
+        settings = engines.resolve_fields(settings, [x[0] for x in items])
+        result = utils.generate_statistics([x[1] for x in items], settings,
+                                           key_field)
+        error = utils.save_statistics(output_path, result)
+
+    except Exception as err:  # pylint: disable=W0703
+        error = f'{const.COMPARE_STATISTICS}{const.FAILED_ERROR}{err}'
+
+    return result, error
+
+
+def get_summary(results):
+    """
+    Sum statistics of all pairs.
+    Return summary with results of pairs, total statistics and count of
+    failed pairs
+    """
+    total = collections.Counter()
+    for item in results:
+        if item[const.STATISTICS] is not None:
+            total.update({x: y for x, y in item[const.STATISTICS].items()
+                          if x != const.DIFFERENT_FIELDS})
+
+    return {
+        const.PAIRS: results,
+        const.TOTAL: dict(total),
+        const.FAILED: sum(x[const.ERROR] is not None for x in results),
+    }
+
+
+def compare_batch(pairs, summary_path, settings, key_field,
+                  processes=os.cpu_count()):
+    """
+    Compare all pairs and save summary in json-file on the summary path.
+    Files which are used in several pairs are loaded once before the pool
+    is started.
+    Return summary and error or None as tuple
+    """
+    result = None
+    error = None
+
+    try:
+        counts = collections.Counter(x for pair in pairs for x in pair[:2])
+        shared = {path: load_dict(path, key_field, settings)
+                  for path, count in counts.items() if count > 1}
+
+        if processes <= 1:
+            set_shared(shared)
+            results = [compare_pair(x, settings, key_field) for x in pairs]
+            set_shared({})
+        else:
+            with concurrent.futures.ProcessPoolExecutor(
+                    processes, initializer=set_shared,
+                    initargs=(shared,)) as executor:
+                results = list(executor.map(
+                    compare_pair, pairs, [settings] * len(pairs),
+                    [key_field] * len(pairs)
+                ))
+
+        result = get_summary(results)
+        error = utils.save_statistics(summary_path, result)
+
+    except Exception as err:  # pylint: disable=W0703
+        error = f'{const.COMPARE_BATCH}{const.FAILED_ERROR}{err}'
+
+    return result, error
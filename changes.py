@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Stream of changes from file changes.py used in file cli.py.
+Instead of the wide report the difference of two files is saved as records
+of inserts, updates (only changed fields with old and new values) and
+deletes in JSON Lines or csv-file. The second file can be rebuilt from the
+first file and the stream of changes.
+
+Format of JSON Lines: the first line {"op": "header", "record": [fields of
+the second file]}, then {"op": "insert", "key": .., "record": {..}},
+{"op": "update", "key": .., "changes": {field: [old, new]}} and
+{"op": "delete", "key": .., "record": {..}}.
+Format of csv-file: columns from const.CHANGES_HEADER, one row for every
+field of header, inserted record or changed field and one row for delete
+"""
+
+
+import csv
+import itertools
+import json
+
+import utils
+import const
+
+
+def is_jsonl(path):
+    """
+    Check if file on the path is JSON Lines by extension of the path.
+    Return True or False
+    """
+    return utils.get_compression(path)[1].endswith(const.JSONL)
+
+
+def iter_changes(dicts, headers, name_key_field):
+    """
+    Compare dictionaries of two files like from convert_csv_to_dict.
+    Fields from headers of both files are compared, so a field which is
+    removed in the second file is updated to None.
+    Return generator of changes, the first change is the header of the
+    second file
+    """
+    yield {const.OPERATION: const.HEADER, const.RECORD: headers[1]}
+    header = list(dict.fromkeys(headers[0] + headers[1]))
+
+    for key, dict_1 in dicts[0].items():
+        dict_2 = dicts[1].get(key)
+        if dict_2 is None:
+            yield {const.OPERATION: const.DELETE, const.KEY: key,
+                   const.RECORD: dict_1}
+            continue
+
+        different = {x: [dict_1.get(x), dict_2.get(x)] for x in header
+                     if x != name_key_field and dict_1.get(x) != dict_2.get(x)}
+        if different:
+            yield {const.OPERATION: const.UPDATE, const.KEY: key,
+                   const.CHANGES: different}
+
+    for key, dict_2 in dicts[1].items():
+        if key not in dicts[0]:
+            yield {const.OPERATION: const.INSERT, const.KEY: key,
+                   const.RECORD: dict_2}
+
+
+def change_to_rows(change):
+    """
+    Convert the change to rows of csv-file with const.CHANGES_HEADER.
+    Return list of rows
+    """
+    operation = change[const.OPERATION]
+    key = change.get(const.KEY, '')
+
+    if operation == const.HEADER:
+        return [[operation, key, x, '', ''] for x in change[const.RECORD]]
+    if operation == const.INSERT:
+        return [[operation, key, x, '', y]
+                for x, y in change[const.RECORD].items()]
+    if operation == const.UPDATE:
+        return [[operation, key, x, y[0], y[1]]
+                for x, y in change[const.CHANGES].items()]
+    return [[operation, key, '', '', '']]
+
+
+def save_changes(paths, output_path, name_key_field, lists_fields=None):
+    """
+    Compare two files and save changes in JSON Lines or csv-file on the
+    output path.
+    Return counts of inserts, updates and deletes and error or None as
+    tuple
+    """
+    result = None
+    error = None
+
+    try:
+        dicts = []
+        headers = []
+        for index, path in enumerate(paths):
+            list_field = lists_fields[index] if lists_fields else None
+            dict_item = None
+            data, error = utils.load_data(path, list_field)
+            if error is None:
+                dict_item, error = utils.convert_csv_to_dict(
+                    data, name_key_field, list_field
+                )
+            if error is not None:
+                return result, error
+            dicts.append(dict_item)
+            headers.append(data[0])
+
+        result = {const.INSERT: 0, const.UPDATE: 0, const.DELETE: 0}
+        with utils.open_file(output_path, 'w') as my_file:
+            writer = None if is_jsonl(output_path) else csv.writer(my_file)
+            if writer is not None:
+                writer.writerow(const.CHANGES_HEADER)
+            for change in iter_changes(dicts, headers, name_key_field):
+                if change[const.OPERATION] in result:
+                    result[change[const.OPERATION]] += 1
+                if writer is None:
+                    my_file.write(json.dumps(change) + '\n')
+                else:
+                    writer.writerows(change_to_rows(change))
+
+    except Exception as err:  # pylint: disable=W0703
+        result = None
+        error = f'{const.SAVE_CHANGES}{const.FAILED_ERROR}{err}'
+
+    return result, error
+
+
+def iter_saved_changes(path):
+    """
+    Read changes from JSON Lines or csv-file on the path. Rows of csv-file
+    are joined to changes like from iter_changes.
+    Return generator of changes
+    """
+    with utils.open_file(path, 'r') as read_file:
+        if is_jsonl(path):
+            for line in read_file:
+                if line.strip():
+                    yield json.loads(line)
+            return
+
+        rows = csv.reader(read_file)
+        next(rows, None)
+        for (operation, key), group in itertools.groupby(
+                rows, key=lambda x: (x[0], x[1])):
+            group = list(group)
+            if operation == const.HEADER:
+                yield {const.OPERATION: operation,
+                       const.RECORD: [x[2] for x in group]}
+            elif operation == const.INSERT:
+                yield {const.OPERATION: operation, const.KEY: key,
+                       const.RECORD: {x[2]: x[4] for x in group}}
+            elif operation == const.UPDATE:
+                yield {const.OPERATION: operation, const.KEY: key,
+                       const.CHANGES: {x[2]: [x[3], x[4]] for x in group}}
+            else:
+                for _ in group:
+                    yield {const.OPERATION: operation, const.KEY: key}
+
+
+def apply_changes(path, changes_path, output_path, name_key_field):
+    """
+    Apply changes from JSON Lines or csv-file on the changes path to the
+    file on the path and save the result on the output path. The result has
+    fields (key-field is the first) and records of the second file: records
+    of the first file keep their order, inserted records are at the end.
+    Return error or None
+    """
+    error = None
+
+    try:
+        dict_item = None
+        data, error = utils.load_data(path)
+        if error is None:
+            dict_item, error = utils.convert_csv_to_dict(data, name_key_field,
+                                                         None)
+        if error is not None:
+            return error
+
+        header = data[0]
+        for change in iter_saved_changes(changes_path):
+            operation = change[const.OPERATION]
+            if operation == const.HEADER:
+                header = change[const.RECORD]
+            elif operation == const.INSERT:
+                dict_item[change[const.KEY]] = change[const.RECORD]
+            elif operation == const.DELETE:
+                dict_item.pop(change[const.KEY], None)
+            elif operation == const.UPDATE:
+                dict_item[change[const.KEY]].update(
+                    {x: y[1] for x, y in change[const.CHANGES].items()}
+                )
+
+        error = utils.save_data(output_path, utils.dict_to_table(
+            dict_item, [name_key_field] + [x for x in header
+                                           if x != name_key_field]
+        ))
+
+    except Exception as err:  # pylint: disable=W0703
+        error = f'{const.APPLY_CHANGES}{const.FAILED_ERROR}{err}'
+
+    return error
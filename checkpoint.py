@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Comparison with checkpoints from file checkpoint.py used in file cli.py.
+Files are compared by partitions like with engine of partitions, but
+partitions are kept near the output file, and after every compared
+partition the checkpoint is saved: identities of input files, settings,
+count of compared partitions and size of the output file. If comparison
+is stopped, the next run with the same files and settings continues from
+the last compared partition
+"""
+
+
+import csv
+import io
+import json
+import os
+import shutil
+
+import engines
+import pipeline
+import utils
+import const
+
+
+def get_checkpoint_path(path):
+    """
+    Return path of checkpoint for output file on the path
+    """
+    return f'{path}{const.CHECKPOINT_EXTENSION}'
+
+
+def get_identities(paths):
+    """
+    Return identities of files on the paths which are changed with files
+    """
+    return [[os.path.abspath(x), os.path.getsize(x), os.stat(x).st_mtime_ns]
+            for x in paths]
+
+
+def load_checkpoint(path):
+    """
+    Load checkpoint of output file on the path.
+    Return checkpoint or None
+    """
+    try:
+        with open(get_checkpoint_path(path), 'r') as open_file:
+            return json.load(open_file)
+    except Exception:  # pylint: disable=W0703
+        return None
+
+
+def save_checkpoint(path, checkpoint):
+    """
+    Save checkpoint of output file on the path. The checkpoint is replaced
+    at once, so it is never saved partly
+    """
+    with open(f'{get_checkpoint_path(path)}.tmp', 'w') as my_file:
+        json.dump(checkpoint, my_file)
+    os.replace(f'{get_checkpoint_path(path)}.tmp', get_checkpoint_path(path))
+
+
+def compare_files_resumable(paths, output_path, settings, key_field,
+                            memory_budget=const.MEMORY_BUDGET, processes=1):
+    """
+    Compare two files by partitions with checkpoints and save result in
+    csv-file on the output path. Checkpoint and partitions are removed
+    when comparison is finished.
+    Return plan and error or None as tuple
+    """
+    plan = None
+    error = None
+
+    try:
+        if (utils.get_compression(output_path)[0] or
+                not str(output_path).endswith(const.CSV)):
+            raise ValueError(const.ERROR_CHECKPOINT_FORMAT)
+
+        plan = engines.plan_engine(paths, settings, key_field, memory_budget,
+                                   processes)
+        plan[const.ENGINE] = const.ENGINE_PARTITIONS
+        plan[const.PARTITIONS] = max(plan[const.PARTITIONS],
+                                     const.MIN_CHECKPOINT_PARTITIONS)
+        settings = plan[const.SETTINGS]
+
+        state = {
+            const.INPUTS: get_identities(paths),
+            const.KEY: key_field,
+            const.SETTINGS: settings,
+            const.PARTITIONS: plan[const.PARTITIONS],
+        }
+        checkpoint = load_checkpoint(output_path)
+        if (checkpoint is None or not os.path.exists(output_path) or
+                any(checkpoint.get(x) != y for x, y in state.items())):
+            checkpoint = dict(state, **{const.DONE: None, const.OFFSET: 0})
+
+        directory = f'{output_path}{const.PARTS_EXTENSION}'
+        if checkpoint[const.DONE] is None:
+            shutil.rmtree(directory, ignore_errors=True)
+            parts = [engines.split_file(
+                path, key_field, settings[const.FIELDS][index],
+                os.path.join(directory, str(index)), plan[const.PARTITIONS],
+                settings
+            ) for index, path in enumerate(paths)]
+            with open(output_path, 'wb'):
+                pass
+            checkpoint[const.DONE] = 0
+            save_checkpoint(output_path, checkpoint)
+        else:
+            parts = [[os.path.join(directory, str(index), f'{x}.csv')
+                      for x in range(plan[const.PARTITIONS])]
+                     for index in range(2)]
+            plan[const.REASON] = f'resumed from partition ' \
+                                 f'{checkpoint[const.DONE]}'
+
+        with open(output_path, 'r+b') as my_file:
+            my_file.truncate(checkpoint[const.OFFSET])
+            my_file.seek(checkpoint[const.OFFSET])
+            text = io.TextIOWrapper(my_file, encoding=const.ENCODING,
+                                    newline='')
+            writer = csv.writer(text)
+            if checkpoint[const.OFFSET] == 0:
+                writer.writerow(utils.prepare_columns(settings, key_field))
+
+            tasks = [(x, y, settings, key_field) for x, y in
+                     list(zip(*parts))[checkpoint[const.DONE]:]]
+            for rows in pipeline.iter_in_processes(
+                    engines.compare_partitions, tasks, processes):
+                writer.writerows(rows)
+                text.flush()
+                checkpoint[const.DONE] += 1
+                checkpoint[const.OFFSET] = my_file.tell()
+                save_checkpoint(output_path, checkpoint)
+            text.detach()
+
+        os.remove(get_checkpoint_path(output_path))
+        shutil.rmtree(directory, ignore_errors=True)
+
+    except Exception as err:  # pylint: disable=W0703
+        error = f'{const.COMPARE_RESUMABLE}{const.FAILED_ERROR}{err}'
+
+    return plan, error
@@ -0,0 +1,530 @@
+#!/usr/bin/env python3
+"""
+File cli.py runs comparison of two csv files from command line without GUI
+"""
+
+
+import argparse
+import asyncio
+import csv
+import logging
+import os
+import sys
+
+import batch
+import changes
+import checkpoint
+import engines
+import fingerprint
+import incremental
+import key_index
+import service
+import sorting
+import utils
+import const
+
+
+def create_parser():
+    """
+    Create parser of arguments for command line.
+    Return parser
+    """
+    parser = argparse.ArgumentParser(description='Compare two csv files')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    equal = subparsers.add_parser(
+        const.CLI_EQUAL,
+        help='check if files are equal for key field and selected fields'
+    )
+    equal.add_argument('first_file')
+    equal.add_argument('second_file')
+    equal.add_argument('-k', '--key', required=True, help='name of key field')
+    equal.add_argument('-f', '--fields', nargs='+',
+                       help='names of fields to compare (default - all)')
+
+    report = subparsers.add_parser(
+        const.CLI_REPORT,
+        help='generate report with engine selected by the planner'
+    )
+    report.add_argument('first_file')
+    report.add_argument('second_file')
+    report.add_argument('output_file')
+    report.add_argument('-k', '--key', required=True, help='name of key field')
+    add_settings_arguments(report)
+    add_rules_arguments(report)
+    report.add_argument('--memory-budget', type=int,
+                        default=const.MEMORY_BUDGET // 1024 // 1024,
+                        help='memory budget in megabytes')
+    report.add_argument('--engine', choices=const.ENGINES,
+                        help='use the engine instead of the planner')
+    report.add_argument('--processes', type=int, default=os.cpu_count(),
+                        help='count of processes to compare partitions')
+    report.add_argument('--resume', action='store_true',
+                        help='compare by partitions with checkpoints and '
+                             'continue the stopped comparison')
+
+    sort = subparsers.add_parser(
+        const.CLI_SORT, help='sort file by key field with external sort'
+    )
+    sort.add_argument('input_file')
+    sort.add_argument('output_file')
+    sort.add_argument('-k', '--key', required=True, help='name of key field')
+    sort.add_argument('--run-rows', type=int, default=const.SORT_RUN_ROWS,
+                      help='count of rows sorted in memory at once')
+    sort.add_argument('--processes', type=int, default=os.cpu_count(),
+                      help='count of processes to sort runs')
+
+    find = subparsers.add_parser(
+        const.CLI_FIND, help='find rows by keys with sidecar index'
+    )
+    find.add_argument('input_file')
+    find.add_argument('keys', nargs='+')
+    find.add_argument('-k', '--key', required=True, help='name of key field')
+    find.add_argument('-f', '--fields', nargs='+',
+                      help='names of fields to show (default - all)')
+
+    fingerprint_file = subparsers.add_parser(
+        const.CLI_FINGERPRINT, help='build fingerprint of file'
+    )
+    fingerprint_file.add_argument('input_file')
+    fingerprint_file.add_argument('-k', '--key', required=True,
+                                  help='name of key field')
+    fingerprint_file.add_argument('--buckets', type=int,
+                                  default=const.FINGERPRINT_BUCKETS,
+                                  help='count of buckets of keys')
+
+    snapshots = subparsers.add_parser(
+        const.CLI_SNAPSHOTS,
+        help='generate report for changed buckets found by fingerprints'
+    )
+    snapshots.add_argument('first_file')
+    snapshots.add_argument('second_file')
+    snapshots.add_argument('output_file')
+    snapshots.add_argument('-k', '--key', required=True,
+                           help='name of key field')
+    add_settings_arguments(snapshots)
+
+    append = subparsers.add_parser(
+        const.CLI_APPEND,
+        help='generate report only for rows appended since the last run'
+    )
+    append.add_argument('first_file')
+    append.add_argument('second_file')
+    append.add_argument('output_file')
+    append.add_argument('-k', '--key', required=True, help='name of key field')
+    add_settings_arguments(append)
+
+    batch_files = subparsers.add_parser(
+        const.CLI_BATCH,
+        help='compare pairs of files from manifest or baseline with '
+             'candidates and save summary'
+    )
+    batch_files.add_argument('summary_file')
+    batch_files.add_argument('-k', '--key', required=True,
+                             help='name of key field')
+    group = batch_files.add_mutually_exclusive_group(required=True)
+    group.add_argument('--manifest',
+                       help='csv file with columns first_file, second_file '
+                            'and optional output_file')
+    group.add_argument('--baseline', help='file compared with candidates')
+    batch_files.add_argument('--candidates', nargs='+', default=[],
+                             help='files compared with baseline')
+    batch_files.add_argument('--output-dir', default='.',
+                             help='directory of reports without output_file')
+    batch_files.add_argument('--processes', type=int, default=os.cpu_count(),
+                             help='count of processes to compare pairs')
+    add_settings_arguments(batch_files)
+    add_rules_arguments(batch_files)
+
+    stats = subparsers.add_parser(
+        const.CLI_STATS,
+        help='count rows only in one file, changed rows and changes of '
+             'every field and save them in json file'
+    )
+    stats.add_argument('first_file')
+    stats.add_argument('second_file')
+    stats.add_argument('output_file')
+    stats.add_argument('-k', '--key', required=True, help='name of key field')
+    add_settings_arguments(stats)
+    add_rules_arguments(stats)
+
+    changes_files = subparsers.add_parser(
+        const.CLI_CHANGES,
+        help='save inserts, updates and deletes from the first file to the '
+             'second file in JSON Lines (.jsonl) or csv file'
+    )
+    changes_files.add_argument('first_file')
+    changes_files.add_argument('second_file')
+    changes_files.add_argument('output_file')
+    changes_files.add_argument('-k', '--key', required=True,
+                               help='name of key field')
+    changes_files.add_argument('--fields-1', nargs='+',
+                               help='names of fields of the first file '
+                                    '(default - all)')
+    changes_files.add_argument('--fields-2', nargs='+',
+                               help='names of fields of the second file '
+                                    '(default - all)')
+
+    apply = subparsers.add_parser(
+        const.CLI_APPLY,
+        help='rebuild the second file from the first file and changes'
+    )
+    apply.add_argument('first_file')
+    apply.add_argument('changes_file')
+    apply.add_argument('output_file')
+    apply.add_argument('-k', '--key', required=True, help='name of key field')
+
+    serve = subparsers.add_parser(
+        const.CLI_SERVE,
+        help='run local service which compares files from json jobs'
+    )
+    serve.add_argument('--socket', help='path of Unix socket')
+    serve.add_argument('--host', default=const.LOCALHOST,
+                       help='host if socket is not set, jobs must have '
+                            'token from environment variable '
+                            f'{const.TOKEN_VARIABLE}')
+    serve.add_argument('--port', type=int, default=const.SERVICE_PORT,
+                       help='port if socket is not set')
+    serve.add_argument('--workers', type=int, default=os.cpu_count(),
+                       help='count of workers to run jobs')
+    serve.add_argument('--root', default=os.curdir,
+                       help='directory with all files of jobs')
+
+    return parser
+
+
+def add_settings_arguments(parser):
+    """
+    Add arguments with settings of report like in the settings of GUI
+    """
+    parser.add_argument('--fields-1', nargs='+',
+                        help='names of fields of the first file '
+                             '(default - all)')
+    parser.add_argument('--fields-2', nargs='+',
+                        help='names of fields of the second file '
+                             '(default - all)')
+    for name, variants in const.CLI_SETTINGS.items():
+        parser.add_argument(
+            f'--{name.replace("_", "-")}', type=int, default=0,
+            choices=range(len(variants)),
+            help='; '.join(f'{x} - {y}' for x, y in enumerate(variants))
+        )
+    parser.add_argument('--no-different-fields', action='store_true',
+                        help="do not include field 'different_fields'")
+
+
+def add_rules_arguments(parser):
+    """
+    Add arguments with filters of rows and normalizers of columns
+    """
+    parser.add_argument(
+        '--filter', action='append', default=[], dest='filters',
+        metavar='RULE',
+        help='keep only rows where field==value, field!=value, field~regex '
+             'or field!~regex (all filters must be true)'
+    )
+    parser.add_argument(
+        '--normalize', action='append', default=[], dest='normalizers',
+        metavar='FIELD=NAMES',
+        help='normalize values of field before comparison, names are '
+             f'separated by comma: {", ".join(const.VARIANTS_NORMALIZERS)} '
+             '(if keys become equal, the last row wins)'
+    )
+
+
+def get_settings(args):
+    """
+    Create settings of report from arguments of command line.
+    Return settings
+    """
+    result = {name: getattr(args, name) for name in const.CLI_SETTINGS}
+    result[const.FILTERS] = getattr(args, const.FILTERS, [])
+    result[const.NORMALIZERS] = {}
+    for item in getattr(args, const.NORMALIZERS, []):
+        field, _, names = item.partition('=')
+        result[const.NORMALIZERS].setdefault(field, []).extend(
+            x for x in names.split(',') if x
+        )
+    result[const.DIFFERENT_FIELDS] = not args.no_different_fields
+    result[const.FIELDS] = [
+        [args.key] + args.fields_1 if args.fields_1 else None,
+        [args.key] + args.fields_2 if args.fields_2 else None
+    ]
+    return result
+
+
+def run_equal(args):
+    """
+    Check if files are equal and print the first different key.
+    Return exit code: 0 - equal, 1 - different, 2 - error
+    """
+    result, different_key, error = utils.is_equal_files(
+        [args.first_file, args.second_file], args.key,
+        [args.key] + args.fields if args.fields else None
+    )
+
+    if error is not None:
+        print(error, file=sys.stderr)
+        return 2
+
+    if result:
+        print(const.FILES_EQUAL)
+        return 0
+
+    print(f'{const.FILES_DIFFERENT}{different_key}')
+    return 1
+
+
+def run_report(args):
+    """
+    Generate report and save it in the output file.
+    Return exit code: 0 - success, 2 - error
+    """
+    if args.resume:
+        _, error = checkpoint.compare_files_resumable(
+            [args.first_file, args.second_file], args.output_file,
+            get_settings(args), args.key,
+            memory_budget=args.memory_budget * 1024 * 1024,
+            processes=args.processes
+        )
+    else:
+        _, error = engines.compare_files(
+            [args.first_file, args.second_file], args.output_file,
+            get_settings(args), args.key,
+            memory_budget=args.memory_budget * 1024 * 1024,
+            engine=args.engine, processes=args.processes
+        )
+
+    if error is not None:
+        print(error, file=sys.stderr)
+        return 2
+
+    return 0
+
+
+def run_sort(args):
+    """
+    Sort file by key field and save it in the output file.
+    Return exit code: 0 - success, 2 - error
+    """
+    error = sorting.sort_file(args.input_file, args.output_file, args.key,
+                              args.run_rows, args.processes)
+
+    if error is not None:
+        print(error, file=sys.stderr)
+        return 2
+
+    return 0
+
+
+def run_find(args):
+    """
+    Find rows by keys and print them as csv.
+    Return exit code: 0 - all keys are found, 1 - not all keys are found,
+    2 - error
+    """
+    result, error = key_index.find_keys(
+        args.input_file, args.key, args.keys,
+        [args.key] + args.fields if args.fields else None
+    )
+
+    if error is not None:
+        print(error, file=sys.stderr)
+        return 2
+
+    writer = csv.writer(sys.stdout)
+    if result:
+        writer.writerow(next(iter(result.values())))
+    for record in result.values():
+        writer.writerow(record.values())
+
+    return 0 if len(result) == len(set(args.keys)) else 1
+
+
+def run_fingerprint(args):
+    """
+    Build fingerprint of the file.
+    Return exit code: 0 - success, 2 - error
+    """
+    error = fingerprint.build_fingerprint(args.input_file, args.key,
+                                          args.buckets)
+
+    if error is not None:
+        print(error, file=sys.stderr)
+        return 2
+
+    return 0
+
+
+def run_snapshots(args):
+    """
+    Compare files by fingerprints and save report in the output file.
+    Return exit code: 0 - equal, 1 - different, 2 - error
+    """
+    result, error = fingerprint.compare_snapshots(
+        [args.first_file, args.second_file], args.output_file,
+        get_settings(args), args.key
+    )
+
+    if error is not None:
+        print(error, file=sys.stderr)
+        return 2
+
+    return 1 if result else 0
+
+
+def run_append(args):
+    """
+    Compare rows appended to files and save report in the output file.
+    Return exit code: 0 - success, 2 - error
+    """
+    _, error = incremental.compare_appended(
+        [args.first_file, args.second_file], args.output_file,
+        get_settings(args), args.key
+    )
+
+    if error is not None:
+        print(error, file=sys.stderr)
+        return 2
+
+    return 0
+
+
+def run_batch(args):
+    """
+    Compare pairs of files and save reports and summary.
+    Return exit code: 0 - success, 2 - error in any pair
+    """
+    summary = None
+    if args.manifest:
+        pairs, error = batch.load_manifest(args.manifest, args.output_dir)
+    else:
+        pairs, error = batch.get_pairs(args.baseline, args.candidates,
+                                       args.output_dir)
+
+    if error is None:
+        summary, error = batch.compare_batch(
+            pairs, args.summary_file, get_settings(args), args.key,
+            args.processes
+        )
+
+    if error is not None:
+        print(error, file=sys.stderr)
+        return 2
+
+    for item in summary[const.PAIRS]:
+        if item[const.ERROR] is not None:
+            print(item[const.ERROR], file=sys.stderr)
+
+    return 2 if summary[const.FAILED] else 0
+
+
+def run_stats(args):
+    """
+    Count statistics of differences, save them in the output file and print
+    counts of rows.
+    Return exit code: 0 - equal, 1 - different, 2 - error
+    """
+    result, error = batch.compare_statistics(
+        [args.first_file, args.second_file], args.output_file,
+        get_settings(args), args.key
+    )
+
+    if error is not None:
+        print(error, file=sys.stderr)
+        return 2
+
+    counts = {x: y for x, y in result.items() if x != const.DIFFERENT_FIELDS}
+    print(', '.join(f'{x}: {y}' for x, y in counts.items()))
+    return 1 if any(y for x, y in counts.items()
+                    if x != const.ROWS_IN_BOTH) else 0
+
+
+def run_changes(args):
+    """
+    Save changes between files and print their counts.
+    Return exit code: 0 - equal, 1 - different, 2 - error
+    """
+    lists_fields = [
+        [args.key] + args.fields_1 if args.fields_1 else None,
+        [args.key] + args.fields_2 if args.fields_2 else None
+    ]
+    result, error = changes.save_changes(
+        [args.first_file, args.second_file], args.output_file, args.key,
+        lists_fields
+    )
+
+    if error is not None:
+        print(error, file=sys.stderr)
+        return 2
+
+    print(', '.join(f'{x}: {y}' for x, y in result.items()))
+    return 1 if any(result.values()) else 0
+
+
+def run_apply(args):
+    """
+    Apply changes to the first file and save the result in the output file.
+    Return exit code: 0 - success, 2 - error
+    """
+    error = changes.apply_changes(args.first_file, args.changes_file,
+                                  args.output_file, args.key)
+
+    if error is not None:
+        print(error, file=sys.stderr)
+        return 2
+
+    return 0
+
+
+def run_serve(args):
+    """
+    Run the service until it is interrupted.
+    Return exit code: 0 - stopped, 2 - error
+    """
+    compare_service = service.CompareService(
+        args.workers, root=args.root,
+        token=os.environ.get(const.TOKEN_VARIABLE)
+    )
+    logging.info('%s', compare_service)
+
+    try:
+        asyncio.run(compare_service.serve(args.socket, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    except (OSError, ValueError) as err:
+        print(err, file=sys.stderr)
+        return 2
+    finally:
+        compare_service.close()
+
+    return 0
+
+
+def main(argv=None):
+    """
+    Parse arguments and run the selected command.
+    Return exit code
+    """
+    logging.basicConfig(format='%(message)s', level=logging.INFO)
+    args = create_parser().parse_args(argv)
+    commands = {
+        const.CLI_EQUAL: run_equal,
+        const.CLI_REPORT: run_report,
+        const.CLI_SORT: run_sort,
+        const.CLI_FIND: run_find,
+        const.CLI_FINGERPRINT: run_fingerprint,
+        const.CLI_SNAPSHOTS: run_snapshots,
+        const.CLI_APPEND: run_append,
+        const.CLI_BATCH: run_batch,
+        const.CLI_STATS: run_stats,
+        const.CLI_CHANGES: run_changes,
+        const.CLI_APPLY: run_apply,
+        const.CLI_SERVE: run_serve,
+    }
+
+    return commands[args.command](args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
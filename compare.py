@@ -11,15 +11,30 @@ import os
 from PyQt5.QtWidgets import (  # pylint: disable=E0611
     QMainWindow, QWidget, QAction, QDesktopWidget, QApplication, QMessageBox,
     QFileDialog, QDialog, QPushButton, QHBoxLayout, QVBoxLayout, QLabel,
-    QGridLayout, QGroupBox, QStyleFactory, QTableView, QComboBox
+    QGridLayout, QGroupBox, QStyleFactory, QTableView, QComboBox, QListView,
+    QLineEdit, QInputDialog
+)
+from PyQt5.QtCore import (  # pylint: disable=E0611
+    Qt, pyqtSignal, QAbstractTableModel, QSortFilterProxyModel,
+    QStandardPaths
+)
+from PyQt5.QtGui import (  # pylint: disable=E0611
+    QIcon, QStandardItemModel, QStandardItem
 )
-from PyQt5.QtCore import Qt, pyqtSignal, QAbstractTableModel  # pylint: disable=E0611
-from PyQt5.QtGui import QIcon  # pylint: disable=E0611
 
+import sorting
 import utils
 import const
 
 
+def get_history_path():
+    """
+    Return path of settings history in the settings directory of the app
+    """
+    return os.path.join(QStandardPaths.writableLocation(
+        QStandardPaths.AppConfigLocation), const.HISTORY_FILE)
+
+
 class Main(QMainWindow):
     """
     Class to show main window with Status Bar space for workspace and Tool Bar
@@ -33,6 +48,7 @@ class Main(QMainWindow):
         self.generate_action = None
         self.undo_action = None
         self.redo_action = None
+        self.history_action = None
         self.initUI()
 
     def initUI(self):  # pylint: disable=C0103
@@ -76,7 +92,7 @@ class Main(QMainWindow):
                                    const.UNDO_REDO[0], self)
         self.undo_action.setShortcut('Ctrl+Z')
         self.undo_action.triggered.connect(self.board.set_settings)
-        self.undo_action.setDisabled(True)
+        self.undo_action.setDisabled(not self.board.cache_settings.is_undo())
 
         self.redo_action = QAction(QIcon(const.IMAGE_REDO),
                                    const.UNDO_REDO[1], self)
@@ -84,6 +100,15 @@ class Main(QMainWindow):
         self.redo_action.triggered.connect(self.board.set_settings)
         self.redo_action.setDisabled(True)
 
+        sort_action = QAction(const.SORT_FILE, self)
+        sort_action.triggered.connect(self.board.sort_file)
+
+        self.history_action = QAction(const.KEEP_HISTORY, self)
+        self.history_action.setCheckable(True)
+        self.history_action.setChecked(
+            os.path.exists(self.board.history_path)
+        )
+
         toolbar = self.addToolBar('Main Menu')
         toolbar.addAction(open_first_file)
         toolbar.addAction(self.clear_first_file)
@@ -92,6 +117,8 @@ class Main(QMainWindow):
         toolbar.addAction(self.generate_action)
         toolbar.addAction(self.undo_action)
         toolbar.addAction(self.redo_action)
+        toolbar.addAction(sort_action)
+        toolbar.addAction(self.history_action)
         toolbar.addAction(exit_action)
 
         screen = QDesktopWidget().screenGeometry()
@@ -106,11 +133,19 @@ class Main(QMainWindow):
     def closeEvent(self, event):  # pylint: disable=C0103
         """
         Before close main window ask 'Are you sure to quit?'
+        Settings history is saved only if user keeps it, else the saved
+        history is removed
         """
         reply = QMessageBox.question(self, 'Message', 'Are you sure to quit?',
                                      QMessageBox.Yes | QMessageBox.No,
                                      QMessageBox.No)
         if reply == QMessageBox.Yes:
+            path = self.board.history_path
+            if self.history_action.isChecked():
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                self.board.cache_settings.save(path)
+            elif os.path.exists(path):
+                os.remove(path)
             event.accept()
         else:
             event.ignore()
@@ -156,13 +191,16 @@ class ChoiceFields(QDialog):
     processing in dialog window
     """
 
-    def __init__(self, parent, data, index, path, key_field):
+    def __init__(self, parent, header, index, path, key_field):
         super().__init__()
         self.parent = parent
-        self.data = data
+        self.header = header
         self.index = index
         self.path = path
-        self.buttons_field = []
+        self.model_fields = None
+        self.proxy_fields = None
+        self.filter_edit = None
+        self.regex_edit = None
         self.key = None
         self.is_close = None
         self.choice_key = None
@@ -175,28 +213,57 @@ class ChoiceFields(QDialog):
         """
         Init UI of dialog window to select fields from CSV-file
         """
-        if self.key_field and self.key_field not in self.data[0]:
+        if self.key_field and self.key_field not in self.header:
             self.is_close = False
             self.close()
 
         key_label = QLabel('Choice key field:')
         self.choice_key = QComboBox(self)
         if self.key_field is None:
-            for item in self.data[0]:
-                self.choice_key.addItem(item)
+            self.choice_key.addItems(self.header)
             self.choice_key.activated[str].connect(self.on_activated)
         else:
             self.choice_key.addItem(self.key_field)
             self.choice_key.setDisabled(True)
 
         fields_label = QLabel('Choice field for report (default - all:')
-        for item in self.data[0]:
-            btn = QPushButton(item, self)
-            if item == self.choice_key.currentText():
-                btn.setDisabled(True)
-            btn.setCheckable(True)
-            btn.setChecked(True)
-            self.buttons_field.append(btn)
+        self.model_fields = QStandardItemModel(self)
+        for item in self.header:
+            field = QStandardItem(item)
+            field.setCheckable(True)
+            field.setCheckState(Qt.Checked)
+            field.setEditable(False)
+            self.model_fields.appendRow(field)
+        self.on_activated(self.choice_key.currentText())
+
+        self.proxy_fields = QSortFilterProxyModel(self)
+        self.proxy_fields.setSourceModel(self.model_fields)
+        self.proxy_fields.setFilterCaseSensitivity(Qt.CaseInsensitive)
+
+        list_fields = QListView(self)
+        list_fields.setModel(self.proxy_fields)
+        list_fields.setUniformItemSizes(True)
+
+        self.filter_edit = QLineEdit(self)
+        self.filter_edit.setPlaceholderText('Filter fields')
+        self.filter_edit.textChanged.connect(
+            self.proxy_fields.setFilterFixedString
+        )
+
+        btn_all = QPushButton('Select all', self)
+        btn_all.clicked.connect(lambda: self.set_checked_shown(True))
+        btn_none = QPushButton('Select none', self)
+        btn_none.clicked.connect(lambda: self.set_checked_shown(False))
+
+        self.regex_edit = QLineEdit(self)
+        self.regex_edit.setPlaceholderText('Regular expression')
+        btn_regex = QPushButton('Select by regex', self)
+        btn_regex.clicked.connect(self.regex_clicked)
+
+        btn_save_profile = QPushButton('Save profile', self)
+        btn_save_profile.clicked.connect(self.save_profile_clicked)
+        btn_load_profile = QPushButton('Load profile', self)
+        btn_load_profile.clicked.connect(self.load_profile_clicked)
 
         self.btn_accept = QPushButton('Accept', self)
         self.btn_accept.clicked.connect(self.accept_clicked)
@@ -215,26 +282,29 @@ class ChoiceFields(QDialog):
         hbox_central.addWidget(fields_label)
         hbox_central.addStretch(1)
 
+        hbox_filter = QHBoxLayout()
+        hbox_filter.addWidget(self.filter_edit)
+        hbox_filter.addWidget(btn_all)
+        hbox_filter.addWidget(btn_none)
+
+        hbox_regex = QHBoxLayout()
+        hbox_regex.addWidget(self.regex_edit)
+        hbox_regex.addWidget(btn_regex)
+
         hbox_down = QHBoxLayout()
+        hbox_down.addWidget(btn_save_profile)
+        hbox_down.addWidget(btn_load_profile)
         hbox_down.addStretch(1)
         hbox_down.addWidget(self.btn_accept)
         hbox_down.addWidget(self.btn_cancel)
         hbox_down.addStretch(1)
 
-        grid = QGridLayout()
-        rows = int(len(self.data[0]) / 6) + 1
-        positions = [(i, j) for i in range(rows) for j in range(6)]
-        for position, button in zip(positions, self.buttons_field):
-            grid.addWidget(button, *position)
-
         vbox = QVBoxLayout()
         vbox.addLayout(hbox_top)
-        vbox.addStretch(50)
-        vbox.addStretch(1)
         vbox.addLayout(hbox_central)
-        vbox.addLayout(grid)
-        vbox.addStretch(1)
-        vbox.addStretch(50)
+        vbox.addLayout(hbox_filter)
+        vbox.addLayout(hbox_regex)
+        vbox.addWidget(list_fields)
         vbox.addLayout(hbox_down)
 
         self.setLayout(vbox)
@@ -268,26 +338,83 @@ class ChoiceFields(QDialog):
             )
             event.accept()
 
-    def accept_clicked(self):
+    def get_checked_fields(self):
         """
-        Accept selected fields and close dialog window
+        Return list of fields with key-field first and checked fields
         """
-        if self.key_field is None:
-            self.parent.key_field = self.choice_key.currentText()
+        key = self.choice_key.currentText()
+        result = [key]
+        for row in range(self.model_fields.rowCount()):
+            item = self.model_fields.item(row)
+            if item.checkState() == Qt.Checked and item.text() != key:
+                result.append(item.text())
+        return result
+
+    def set_checked(self, item, is_checked):
+        """
+        Check or uncheck the field if it is not key-field
+        """
+        if item.isEnabled():
+            item.setCheckState(Qt.Checked if is_checked else Qt.Unchecked)
 
-        lists_fields = [self.choice_key.currentText()]
-        for item in self.buttons_field:
-            if (item.isChecked() and
-                    item.text() != self.choice_key.currentText()):
-                lists_fields.append(item.text())
-        self.parent.lists_fields[self.index] = lists_fields
+    def set_checked_shown(self, is_checked):
+        """
+        Check or uncheck all fields shown after filter
+        """
+        for row in range(self.proxy_fields.rowCount()):
+            index = self.proxy_fields.mapToSource(
+                self.proxy_fields.index(row, 0)
+            )
+            self.set_checked(self.model_fields.itemFromIndex(index),
+                             is_checked)
 
-        self.parent.dicts[self.index], error = utils.convert_csv_to_dict(
-            self.data, self.choice_key.currentText(), lists_fields
-        )
+    def regex_clicked(self):
+        """
+        Check only fields which match the regular expression
+        """
+        pattern, error = utils.compile_regex(self.regex_edit.text())
         self.parent.handle_error(error)
         if error is None:
-            self.parent.generate_table(self.index, self.path)
+            for row in range(self.model_fields.rowCount()):
+                item = self.model_fields.item(row)
+                self.set_checked(item, bool(pattern.search(item.text())))
+
+    def save_profile_clicked(self):
+        """
+        Save key-field and checked fields as profile
+        """
+        path = self.parent.file_dialog(
+            directory=os.path.dirname(self.path), for_open=False,
+            fmt=const.JSON, file_name=utils.get_profile_path(self.path)
+        )
+        if path:
+            self.parent.handle_error(
+                utils.save_profile(path, self.get_checked_fields())
+            )
+
+    def load_profile_clicked(self):
+        """
+        Load profile and check fields from it
+        """
+        path = self.parent.file_dialog(fmt=const.JSON)
+        lists_fields, error = utils.load_profile(path)
+        self.parent.handle_error(error)
+        if not lists_fields:
+            return
+
+        if self.key_field is None and lists_fields[0] in self.header:
+            self.choice_key.setCurrentText(lists_fields[0])
+            self.on_activated(lists_fields[0])
+        for row in range(self.model_fields.rowCount()):
+            item = self.model_fields.item(row)
+            self.set_checked(item, item.text() in lists_fields)
+
+    def accept_clicked(self):
+        """
+        Accept selected fields and close dialog window
+        """
+        self.parent.load_fields(self.index, self.path,
+                                self.get_checked_fields())
 
         self.is_close = True
         self.close()
@@ -296,12 +423,13 @@ class ChoiceFields(QDialog):
         """
         Choose one field as key-field
         """
-        for item in self.buttons_field:
+        for row in range(self.model_fields.rowCount()):
+            item = self.model_fields.item(row)
             if item.text() == text:
-                item.setChecked(True)
-                item.setDisabled(True)
+                item.setCheckState(Qt.Checked)
+                item.setEnabled(False)
             else:
-                item.setDisabled(False)
+                item.setEnabled(True)
 
 
 class Compare(QWidget):
@@ -320,6 +448,7 @@ class Compare(QWidget):
         self.btn_if1 = None
         self.btn_if2 = None
         self.btn_gen = None
+        self.find_edit = None
         self.right_group_box = None
         self.item_combo_box = None
         self.different_fields = None
@@ -335,7 +464,17 @@ class Compare(QWidget):
         self.tables = []
         self.models = []
         self.settings = {}
-        self.cache_settings = utils.CacheData()
+        self.cache_settings = utils.CacheData(
+            max_count=const.MAX_COUNT_CACHE
+        )
+        self.history_path = get_history_path()
+        if os.path.exists(self.history_path):
+            self.cache_settings.load(self.history_path)
+        self.report_cache = utils.ReportCache()
+        self.values_tables = {}
+        self.checksums = [None, None]
+        self.identical_fields = set()
+        self.data_versions = [0, 0]
         self.initUI()
 
     def initUI(self):  # pylint: disable=C0103
@@ -364,7 +503,7 @@ class Compare(QWidget):
     def create_top_group_box(self):
         """
         Create group box with 3 buttons "Open First File", "Open Second File"
-        and "Generate report"
+        and "Generate report" and box to find key in both files
         """
         self.top_group_box = QGroupBox('Input / Output')
 
@@ -380,6 +519,15 @@ class Compare(QWidget):
         hbox.addWidget(self.btn_if1)
         hbox.addWidget(self.btn_if2)
         hbox.addWidget(self.btn_gen)
+
+        self.find_edit = QLineEdit(self)
+        self.find_edit.setPlaceholderText('Key')
+        self.find_edit.returnPressed.connect(self.find_key)
+        btn_find = QPushButton(const.FIND_KEY, self)
+        btn_find.clicked.connect(self.find_key)
+        hbox.addWidget(self.find_edit)
+        hbox.addWidget(btn_find)
+
         self.top_group_box.setLayout(hbox)
 
     def create_tables_group_box(self):
@@ -484,7 +632,8 @@ class Compare(QWidget):
             new_settings = self.cache_settings.redo()
 
         if new_settings:
-            self.settings = new_settings
+            self.settings = dict(new_settings)
+            self.settings[const.FIELDS] = self.lists_fields
 
             self.item_combo_box.setCurrentIndex(
                 self.settings[const.ITEMS])
@@ -543,7 +692,7 @@ class Compare(QWidget):
         if self.small_dicts[0] and self.small_dicts[1]:
             self.set_result()
 
-    def file_dialog(self, directory='', for_open=True, fmt=''):
+    def file_dialog(self, directory='', for_open=True, fmt='', file_name=''):
         """
         Show and serving dialog window to work with files.
         Return path of selected file
@@ -568,7 +717,7 @@ class Compare(QWidget):
                 file_filter = [f'{x} (*.{x})' for x in fmt.split(', ')]
             else:
                 file_filter = [f'{fmt} (*.{fmt})']
-            dialog.setDefaultSuffix(fmt)
+            dialog.setDefaultSuffix(fmt.split(', ')[0])
             dialog.setNameFilters(file_filter)
 
         # SET THE STARTING DIRECTORY
@@ -577,6 +726,9 @@ class Compare(QWidget):
         else:
             dialog.setDirectory(str(self.current_dir))
 
+        if file_name:
+            dialog.selectFile(file_name)
+
         if dialog.exec_() == QDialog.Accepted:
             path = dialog.selectedFiles()[0]  # returns a list
 
@@ -589,11 +741,26 @@ class Compare(QWidget):
         Generate table on workspace with 11 items from result
         """
         if data is None:
-            data = utils.generate_report(self.small_dicts, self.settings,
-                                         self.key_field)
+            data = self.get_report(self.small_dicts, const.PREVIEW)
         self.models[-1] = TableModel(data)
         self.tables[-1].setModel(self.models[-1])
 
+    def get_report(self, dicts, kind):
+        """
+        Get report for current settings from Report Cache or generate it and
+        append to Report Cache.
+        Return report
+        """
+        key = self.report_cache.get_key(self.settings, self.key_field,
+                                        self.data_versions, kind)
+        result = self.report_cache.get(key)
+        if result is None:
+            result = utils.generate_report(dicts, self.settings,
+                                           self.key_field,
+                                           self.identical_fields)
+            self.report_cache.append(key, result)
+        return result
+
     def handle_error(self, error=None, no_error=const.COMPLETED):
         """
         Show error in Status Bar on main window after action if there is an
@@ -610,6 +777,11 @@ class Compare(QWidget):
         call set_result() to generate table with 11 items from result if
         there are data in both dictionaries
         """
+        self.data_versions[index] += 1
+        self.report_cache.clear()
+        self.identical_fields = utils.get_identical_fields(self.dicts,
+                                                           self.checksums)
+
         if path:
             self.small_dicts = utils.create_small_dicts(self.dicts)
             data = utils.dict_to_table(self.small_dicts[index],
@@ -648,23 +820,29 @@ class Compare(QWidget):
 
         if sender.text().strip('&') in (const.BUTTONS[0], const.BUTTONS[1]):
             index = 0 if sender.text().strip('&') == const.BUTTONS[0] else 1
-            path = self.file_dialog(fmt=f'{const.CSV}')
-            input_data, error = utils.load_data(path)
+            path = self.file_dialog(fmt=const.INPUT_FORMATS)
+            header, error = utils.load_header(path)
             self.handle_error(error)
 
-            if input_data:
-                self.choice_window = ChoiceFields(self, input_data, index,
+            lists_fields = None
+            if header:
+                lists_fields, _ = utils.load_profile(
+                    utils.get_profile_path(path)
+                )
+            if lists_fields and (self.key_field is None or
+                                 self.key_field == lists_fields[0]):
+                self.load_fields(index, path, lists_fields)
+            elif header:
+                self.choice_window = ChoiceFields(self, header, index,
                                                   path, self.key_field)
 
         elif sender.text().strip('&') == const.BUTTONS[2]:
-            path = self.file_dialog(for_open=False, fmt=const.CSV)
+            path = self.file_dialog(for_open=False, fmt=const.INPUT_FORMATS)
             if not path:
                 self.handle_error(const.ERROR_PATH)
                 return
 
-            self.output_data = utils.generate_report(
-                self.dicts, self.settings, self.key_field
-            )
+            self.output_data = self.get_report(self.dicts, const.REPORT)
             if len(self.output_data) > 1:
                 error = utils.save_data(path, self.output_data)
                 self.handle_error(error)
@@ -683,6 +861,68 @@ class Compare(QWidget):
             if self.small_dicts[0] and self.small_dicts[1]:
                 self.set_result()
 
+    def load_fields(self, index, path, lists_fields):
+        """
+        Load selected fields of the file on the path and show them in the
+        table on workspace. The first field is key-field
+        """
+        if self.key_field is None:
+            self.key_field = lists_fields[0]
+        self.lists_fields[index] = lists_fields
+
+        input_data, error = utils.load_data(path, lists_fields)
+        if error is None:
+            self.checksums[index] = {}
+            self.dicts[index], error = utils.convert_csv_to_dict(
+                input_data, lists_fields[0], lists_fields, self.values_tables,
+                self.checksums[index]
+            )
+        self.handle_error(error)
+        if error is None:
+            self.generate_table(index, path)
+
+    def find_key(self):
+        """
+        Find the key in dictionaries of both loaded files and show result of
+        comparison of found rows in the table of result on workspace
+        """
+        key = self.find_edit.text()
+        if not (key and self.dicts[0] and self.dicts[1]):
+            return
+
+        dicts = [{}, {}]
+        for index, dict_item in enumerate(self.dicts):
+            if key in (dict_item or {}):
+                dicts[index] = {key: dict_item[key]}
+        self.set_result(utils.generate_report(
+            dicts, dict(self.settings, **{const.ITEMS: 1}), self.key_field
+        ))
+
+    def sort_file(self):
+        """
+        Sort selected file by key-field with external sort and save it
+        """
+        path = self.file_dialog(fmt=const.INPUT_FORMATS)
+        header, error = utils.load_header(path)
+        self.handle_error(error)
+        if not header:
+            return
+
+        current = header.index(self.key_field) \
+            if self.key_field in header else 0
+        key, is_ok = QInputDialog.getItem(self, const.SORT_FILE,
+                                          'Choice key field:', header,
+                                          current, False)
+        if not is_ok:
+            return
+
+        output = self.file_dialog(for_open=False, fmt=const.CSV_FORMATS)
+        if not output:
+            self.handle_error(const.ERROR_PATH)
+            return
+
+        self.handle_error(sorting.sort_file(path, output, key))
+
     def clear_data(self):
         """
         Clear one of the dictionaries and show empty table on workspace
@@ -691,13 +931,16 @@ class Compare(QWidget):
 
         index = 0 if sender.text() == const.CLEAR_BUTTONS[0] else 1
         self.dicts[index] = None
+        self.checksums[index] = None
         self.generate_table(index, '')
 
         if not (self.dicts[0] or self.dicts[1]):
             self.key_field = None
+            self.values_tables = {}
 
 
 if __name__ == '__main__':
     app = QApplication([])
+    app.setApplicationName(const.APP_NAME)
     compare = Main()
     sys.exit(app.exec_())
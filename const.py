@@ -42,6 +42,11 @@ DASH = '-'
 NOTHING = ' '
 
 COMPLETED = 'Completed'
+SAVE_HISTORY = 'Save history'
+SAVE_PROFILE = 'Save profile'
+LOAD_PROFILE = 'Load profile'
+COMPILE_REGEX = 'Compile regular expression'
+LOAD_HISTORY = 'Load history'
 LOAD_DATA = 'Load data'
 SAVE_DATA = 'Save data'
 CSV_TO_DICT = 'Convert Csv to Dict'
@@ -50,5 +55,200 @@ ERROR_PATH = 'Path to file did not set or set not correctly'
 ERROR_READ_FILE = 'Format of read file does not known'
 
 CSV = 'csv'
+JSON = 'json'
+PROFILE_EXTENSION = '.fields.json'
+KEY = 'key'
 
 LEN_SMALL_DICTS = 10
+MAX_COUNT_CACHE = 1000
+DELTA_FULL = 'full'
+DELTA_DICT = 'dict'
+COUNT = 'count'
+DATA = 'data'
+APP_NAME = 'compare-csv'
+HISTORY_FILE = 'history.json'
+KEEP_HISTORY = 'Keep settings history'
+MAX_SIZE_REPORT_CACHE = 10000000
+MAX_SIZE_VALUES_TABLE = 100000
+MASK = 2 ** 64 - 1
+PREVIEW = 'preview'
+REPORT = 'report'
+
+ROWS_IN_BOTH = 'rows_in_both'
+ROWS_ONLY_FIRST = 'rows_only_first'
+ROWS_ONLY_SECOND = 'rows_only_second'
+ROWS_CHANGED = 'rows_changed'
+SAVE_STATISTICS = 'Save statistics'
+COMPARE_STATISTICS = 'Compare statistics'
+CLI_STATS = 'stats'
+EQUAL_FILES = 'Check equal files'
+
+CHUNK_SIZE = 1024 * 1024
+
+CLI_EQUAL = 'equal'
+CLI_REPORT = 'report'
+CLI_SETTINGS = {
+    ITEMS: VARIANTS_ITEMS,
+    VALUES_DIFFERENT: VARIANTS_VAL,
+    DELIMITER: VARIANTS_DELIMIT,
+    VALUES_MATH: VARIANTS_VAL_MATH,
+    ABSENT: VARIANTS_KEY_ABSENT,
+    COLUMNS: VARIANTS_COLUMNS,
+}
+FILES_EQUAL = 'Files are equal'
+FILES_DIFFERENT = 'Files are different, the first different key: '
+
+GZIP = '.gz'
+BZIP2 = '.bz2'
+XZ = '.xz'
+ZSTD = '.zst'
+COMPRESSIONS = [GZIP, BZIP2, XZ, ZSTD]
+CSV_FORMATS = ', '.join([CSV] + [CSV + x for x in COMPRESSIONS])
+PARQUET = '.parquet'
+ARROW = '.arrow'
+FEATHER = '.feather'
+COLUMNAR_FORMATS = [PARQUET, ARROW, FEATHER]
+SQLITE = '.sqlite'
+INPUT_FORMATS = ', '.join([CSV_FORMATS] + [x[1:] for x in COLUMNAR_FORMATS] +
+                          [SQLITE[1:]])
+ERROR_PYARROW = 'Package "pyarrow" is needed to read or write Parquet, ' \
+                'Arrow IPC or Feather files'
+ERROR_ZSTANDARD = 'Package "zstandard" is needed to read or write zst-files'
+
+QUEUE_SIZE = 8
+COLUMNAR_BATCH_ROWS = 65536
+QUEUE_TIMEOUT = 0.1
+
+SAMPLE_ROWS = 1000
+COMPRESSION_RATIO = 5
+CELL_SIZE = 100
+MEMORY_BUDGET = 1024 * 1024 * 1024
+MAX_PARTITIONS = 256
+HEADER = 'header'
+ROWS = 'rows'
+UNIQUE_KEYS = 'unique_keys'
+IS_SORTED = 'is_sorted'
+MEMORY = 'memory'
+PARTITIONS = 'partitions'
+PROCESSES = 'processes'
+SETTINGS = 'settings'
+ENGINE = 'engine'
+REASON = 'reason'
+ENGINE_MEMORY = 'memory'
+ENGINE_MERGE = 'merge'
+ENGINE_PARTITIONS = 'partitions'
+ENGINE_BLOOM = 'bloom'
+ENGINE_SQLITE = 'sqlite'
+ENGINES = [ENGINE_MEMORY, ENGINE_MERGE, ENGINE_PARTITIONS, ENGINE_BLOOM,
+           ENGINE_SQLITE]
+KEYS = 'keys'
+BLOOM_PROBABILITY = 0.01
+BLOOM_MIN_KEYS = 1024
+COMPARE_FILES = 'Compare files'
+ERROR_NOT_SORTED = 'Keys are not sorted in file '
+
+SORT_RUN_ROWS = 100000
+MAX_MERGE_RUNS = 64
+SORTED_EXTENSION = '.sorted.json'
+SIZE = 'size'
+MTIME = 'mtime_ns'
+SORT_FILE = 'Sort file'
+CLI_SORT = 'sort'
+CLI_FIND = 'find'
+
+ENCODING = 'utf-8'
+INDEX_EXTENSION = '.idx'
+BUILD_INDEX = 'Build index'
+FIND_KEYS = 'Find keys'
+FIND_KEY = 'Find key'
+ERROR_INDEX_FORMAT = 'Index can be built only for not compressed csv-file'
+
+FINGERPRINT_EXTENSION = '.fp.sqlite'
+FINGERPRINT_BUCKETS = 4096
+TREE = 'tree'
+OFFSETS = 'offsets'
+BUILD_FINGERPRINT = 'Build fingerprint'
+LOAD_FINGERPRINT = 'Load fingerprint'
+COMPARE_SNAPSHOTS = 'Compare snapshots'
+ERROR_FINGERPRINT_BUCKETS = 'Fingerprints have different count of buckets'
+CLI_FINGERPRINT = 'fingerprint'
+CLI_SNAPSHOTS = 'snapshots'
+
+APPEND_EXTENSION = '.append.sqlite'
+COMPARISON = 'comparison'
+HASH = 'hash'
+COMPARE_APPENDED = 'Compare appended rows'
+CLI_APPEND = 'append'
+ERROR_APPEND_FORMAT = ('Appended rows can be read only from not compressed '
+                       'csv-file')
+
+FIRST_FILE = 'first_file'
+SECOND_FILE = 'second_file'
+OUTPUT_FILE = 'output_file'
+MANIFEST_HEADER = [FIRST_FILE, SECOND_FILE, OUTPUT_FILE]
+REPORT_EXTENSION = '.report.csv'
+ERROR_REPORT_NAMES = 'Reports have the same names: '
+STATISTICS = 'statistics'
+ERROR = 'error'
+PAIRS = 'pairs'
+TOTAL = 'total'
+FAILED = 'failed'
+GET_PAIRS = 'Get pairs'
+LOAD_MANIFEST = 'Load manifest'
+COMPARE_PAIR = 'Compare pair'
+COMPARE_BATCH = 'Compare batch'
+CLI_BATCH = 'batch'
+
+MAX_SIZE_DATASET_CACHE = 100000000
+LOCALHOST = '127.0.0.1'
+SERVICE_PORT = 8765
+PATHS = 'paths'
+COUNT_ROWS = 1000
+RUN_JOB = 'Run job'
+SOCKET_MODE = 0o600
+TOKEN = 'token'
+TOKEN_VARIABLE = 'COMPARE_CSV_TOKEN'
+ERROR_TOKEN = 'Token of job is wrong'
+ERROR_SERVICE_TOKEN = 'Token is needed to start service on TCP port'
+ERROR_OUTSIDE_ROOT = 'Path is outside of root directory of service: '
+SEND_JOB = 'Send job'
+CLI_SERVE = 'serve'
+
+SQLITE_TABLE = 'report'
+SQLITE_CACHE_SIZE = 64 * 1024
+
+CHECKPOINT_EXTENSION = '.checkpoint.json'
+PARTS_EXTENSION = '.parts'
+MIN_CHECKPOINT_PARTITIONS = 16
+INPUTS = 'inputs'
+DONE = 'done'
+OFFSET = 'offset'
+COMPARE_RESUMABLE = 'Compare files with checkpoints'
+ERROR_CHECKPOINT_FORMAT = 'Report can be resumed only in not compressed ' \
+                          'csv-file'
+
+JSONL = '.jsonl'
+OPERATION = 'op'
+INSERT = 'insert'
+UPDATE = 'update'
+DELETE = 'delete'
+RECORD = 'record'
+CHANGES = 'changes'
+FIELD = 'field'
+OLD = 'old'
+NEW = 'new'
+CHANGES_HEADER = [OPERATION, KEY, FIELD, OLD, NEW]
+SAVE_CHANGES = 'Save changes'
+APPLY_CHANGES = 'Apply changes'
+CLI_CHANGES = 'changes'
+CLI_APPLY = 'apply'
+
+FILTERS = 'filters'
+NORMALIZERS = 'normalizers'
+VARIANTS_NORMALIZERS = ['strip', 'lower', 'upper', 'casefold', 'spaces',
+                        'thousands']
+FILTER_OPERATORS = ['==', '!=', '!~', '~']
+ERROR_FILTER = 'Wrong filter (use field==value, field!=value, ' \
+               'field~regex or field!~regex): '
+ERROR_NORMALIZER = 'Unknown normalizer: '
+ERROR_FILTER_FIELD = 'Field of filter is absent in file: '
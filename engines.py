@@ -0,0 +1,571 @@
+#!/usr/bin/env python3
+"""
+Planner and engines of comparison from file engines.py used in file cli.py.
+The planner chooses how to compare two files: in memory with dictionaries,
+by streaming merge of files sorted by key-field or by partitions on disk.
+SQLite engine is used only if it is selected by user
+"""
+
+
+import csv
+import hashlib
+import itertools
+import json
+import logging
+import math
+import os
+import sqlite3
+import tempfile
+import zlib
+
+import pipeline
+import sorting
+import utils
+import const
+
+
+logger = logging.getLogger(__name__)
+
+
+def sample_file(path, name_key_field, count=const.SAMPLE_ROWS):
+    """
+    Read the first rows of the file on the path to estimate width of row,
+    count of rows and part of unique keys. Only the key-field of the first
+    rows is read from files in columnar format, and count of rows is taken
+    from their metadata. The file is sorted only if it has marker of sorting.
+    Return dictionary with estimations
+    """
+    if utils.is_columnar(path):
+        header, count_rows, keys = utils.load_columnar_sample(
+            path, name_key_field, count
+        )
+    else:
+        rows = utils.iter_rows(path)
+        header = next(rows, [])
+        key_field = header.index(name_key_field)
+        size = os.path.getsize(path)
+        keys = []
+        width = 0
+
+        for row in itertools.islice(rows, count):
+            keys.append(row[key_field])
+            width += len(','.join(row)) + 1
+
+        if utils.get_compression(path)[0] is not None:
+            size *= const.COMPRESSION_RATIO
+        count_rows = size * len(keys) // width if width else 0
+
+    return {
+        const.HEADER: header,
+        const.ROWS: count_rows,
+        const.UNIQUE_KEYS: len(set(keys)) / len(keys) if keys else 1,
+        const.IS_SORTED: sorting.is_sorted_by(path, name_key_field),
+    }
+
+
+def resolve_fields(settings, headers):
+    """
+    Replace lists of fields which are not set in settings by all fields from
+    headers of files.
+    Return new settings
+    """
+    fields = settings.get(const.FIELDS) or [None, None]
+    return dict(settings, **{const.FIELDS: [
+        list(fields[index]) if fields[index] else list(headers[index])
+        for index in range(2)
+    ]})
+
+
+def plan_engine(paths, settings, key_field,
+                memory_budget=const.MEMORY_BUDGET, processes=1):
+    """
+    Choose engine of comparison by sizes of files, estimated memory for
+    dictionaries of both files, order of keys and the memory budget.
+    Merge is not chosen if the key-field is normalized, because normalized
+    keys can be out of order of the file.
+    Partitions are compared in processes at once, so the memory budget is
+    shared between them.
+    Return plan as dictionary with engine, reason, count of partitions,
+    count of processes and settings with all lists of fields
+    """
+    samples = [sample_file(path, key_field) for path in paths]
+    settings = resolve_fields(settings, [x[const.HEADER] for x in samples])
+    memory = sum(
+        int(sample[const.ROWS] * sample[const.UNIQUE_KEYS] *
+            (len(settings[const.FIELDS][index]) + 1) * const.CELL_SIZE)
+        for index, sample in enumerate(samples)
+    )
+    plan = {
+        const.MEMORY: memory,
+        const.PARTITIONS: 1,
+        const.PROCESSES: processes,
+        const.SETTINGS: settings,
+    }
+
+    if any(utils.is_columnar(path) for path in paths):
+        plan[const.ENGINE] = const.ENGINE_MEMORY
+        plan[const.REASON] = 'files in columnar format are read as a whole'
+
+    elif memory <= memory_budget:
+        plan[const.ENGINE] = const.ENGINE_MEMORY
+        plan[const.REASON] = f'estimated memory {memory} bytes fits in ' \
+                             f'budget {memory_budget} bytes'
+
+    elif (all(x[const.IS_SORTED] for x in samples) and
+          key_field not in (settings.get(const.NORMALIZERS) or {})):
+        plan[const.ENGINE] = const.ENGINE_MERGE
+        plan[const.REASON] = f'estimated memory {memory} bytes exceeds ' \
+                             f'budget {memory_budget} bytes and both ' \
+                             f'files are sorted by key'
+
+    elif settings.get(const.ITEMS) in (2, 3):
+        plan[const.ENGINE] = const.ENGINE_BLOOM
+        plan[const.KEYS] = samples[3 - settings[const.ITEMS]][const.ROWS]
+        plan[const.ROWS] = samples[settings[const.ITEMS] - 2][const.ROWS]
+        plan[const.REASON] = f'estimated memory {memory} bytes exceeds ' \
+                             f'budget {memory_budget} bytes and items are ' \
+                             f'only from one file'
+
+    else:
+        plan[const.ENGINE] = const.ENGINE_PARTITIONS
+        plan[const.PARTITIONS] = min(
+            const.MAX_PARTITIONS,
+            memory * max(processes, 1) // memory_budget * 2 + 1
+        )
+        plan[const.REASON] = f'estimated memory {memory} bytes exceeds ' \
+                             f'budget {memory_budget} bytes and files ' \
+                             f'are not sorted by normalized key'
+
+    logger.info('Plan of comparison: engine "%s", partitions %s, reason: %s',
+                plan[const.ENGINE], plan[const.PARTITIONS],
+                plan[const.REASON])
+
+    return plan
+
+
+def iter_report_memory(paths, settings, key_field):
+    """
+    Compare files with dictionaries in memory.
+    Return generator of rows of result without header
+    """
+    dicts = []
+    tables = {}
+    checksums = [{}, {}]
+    for index, path in enumerate(paths):
+        input_data, error = utils.load_data(path,
+                                            settings[const.FIELDS][index],
+                                            settings)
+        if error is not None:
+            raise ValueError(error)
+        dict_item, error = utils.convert_csv_to_dict(
+            input_data, key_field, settings[const.FIELDS][index], tables,
+            checksums[index]
+        )
+        if error is not None:
+            raise ValueError(error)
+        dicts.append(dict_item)
+
+    yield from utils.generate_report(
+        dicts, settings, key_field,
+        utils.get_identical_fields(dicts, checksums)
+    )[1:]
+
+
+def iter_sorted_records(path, name_key_field, list_field, rules=None):
+    """
+    Read records from the file sorted by key-field. If the key repeats, the
+    last record is used like in convert_csv_to_dict.
+    Return generator of tuples (key, record)
+    """
+    previous = None
+    for record in utils.iter_records(path, name_key_field, list_field,
+                                     rules):
+        if previous is not None:
+            if record[0] < previous[0]:
+                raise ValueError(f'{const.ERROR_NOT_SORTED}{path}')
+            if record[0] != previous[0]:
+                yield previous
+        previous = record
+
+    if previous is not None:
+        yield previous
+
+
+def iter_report_merge(paths, settings, key_field):
+    """
+    Compare files sorted by key-field with streaming merge of both files.
+    Both files are read in separate threads.
+    Return generator of rows of result without header
+    """
+    list_field = utils.prepare_columns(settings, key_field)
+    stages = [pipeline.ThreadStage(iter_sorted_records(
+        path, key_field, settings[const.FIELDS][index], settings
+    )) for index, path in enumerate(paths)]
+    with stages[0], stages[1]:
+        readers = [iter(x) for x in stages]
+        record_1 = next(readers[0], None)
+        record_2 = next(readers[1], None)
+
+        while record_1 is not None or record_2 is not None:
+            if record_2 is None or (record_1 is not None and
+                                    record_1[0] < record_2[0]):
+                key, dict_1, dict_2 = record_1[0], record_1[1], None
+                record_1 = next(readers[0], None)
+            elif record_1 is None or record_2[0] < record_1[0]:
+                key, dict_1, dict_2 = record_2[0], None, record_2[1]
+                record_2 = next(readers[1], None)
+            else:
+                key, dict_1, dict_2 = record_1[0], record_1[1], record_2[1]
+                record_1 = next(readers[0], None)
+                record_2 = next(readers[1], None)
+
+            if utils.is_key_in_report(settings, dict_1, dict_2):
+                row = utils.process(list_field, dict_1, dict_2, key,
+                                    settings)
+                if len(row) > 0:
+                    yield row
+
+
+class BloomFilter():
+    """
+    The class used to check if the key is in the set of keys with a few bits
+    per key. The check can give false positive answer with the probability,
+    but never gives false negative answer
+    """
+
+    def __init__(self, count, probability=const.BLOOM_PROBABILITY):
+        count = max(count, const.BLOOM_MIN_KEYS)
+        self.size = int(-count * math.log(probability) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / count * math.log(2)))
+        self.bits = bytearray(self.size // 8 + 1)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __repr__(self):
+        return f"BloomFilter('count': {self.count}, 'size': {self.size}, " \
+               f"'hashes': {self.hashes})"
+
+    def __str__(self):
+        return repr(self)
+
+    def positions(self, key):
+        """
+        Return positions of bits for the key
+        """
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little')
+        return [(first + number * second) % self.size
+                for number in range(self.hashes)]
+
+    def add(self, key):
+        """
+        Add the key to the filter
+        """
+        for position in self.positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7))
+                   for position in self.positions(key))
+
+
+def iter_report_bloom(paths, settings, key_field, plan):
+    """
+    Compare files if items are only from one (primary) file. Keys of other
+    file are streamed to Bloom filter, then primary file is streamed twice.
+    In the first pass keys which are probably in other file or probably
+    repeated are deferred: they are saved to temporary SQLite table and to
+    one more Bloom filter. In the second pass rows with keys which are not
+    deferred are in the report at once, and the last record of every
+    deferred key is saved to the table like in convert_csv_to_dict. Deferred
+    keys which are in other file are removed by one more pass of other file,
+    and the rest are in the report. Memory is limited by Bloom filters,
+    deferred keys and records are on disk.
+    Return generator of rows of result without header
+    """
+    list_field = utils.prepare_columns(settings, key_field)
+    primary = 0 if settings[const.ITEMS] == 2 else 1
+    fields = settings[const.FIELDS]
+    other = 1 - primary
+
+    def get_row(key, record):
+        records = [None, None]
+        records[primary] = record
+        return utils.process(list_field, *records, key, settings)
+
+    bloom = BloomFilter(plan.get(const.KEYS, 0))
+    for key, _ in utils.iter_records(paths[other], key_field, fields[other],
+                                     settings):
+        bloom.add(key)
+
+    seen = BloomFilter(plan.get(const.ROWS, 0))
+    deferred = BloomFilter(plan.get(const.KEYS, 0))
+
+    def iter_deferred():
+        for key, _ in utils.iter_records(paths[primary], key_field,
+                                         fields[primary], settings):
+            if key in bloom or key in seen:
+                deferred.add(key)
+                yield (key,)
+            seen.add(key)
+
+    def iter_found():
+        for key, _ in utils.iter_records(paths[other], key_field,
+                                         fields[other], settings):
+            if key in deferred:
+                yield (key,)
+
+    with tempfile.TemporaryDirectory() as directory:
+        connection = sqlite3.connect(os.path.join(directory, 'deferred.db'))
+        try:
+            connection.execute('PRAGMA journal_mode = OFF')
+            connection.execute('PRAGMA synchronous = OFF')
+            connection.execute('CREATE TABLE deferred '
+                               '(key TEXT PRIMARY KEY, record TEXT) '
+                               'WITHOUT ROWID')
+            connection.executemany(
+                'INSERT OR IGNORE INTO deferred (key) VALUES (?)',
+                iter_deferred()
+            )
+
+            for key, record in utils.iter_records(paths[primary], key_field,
+                                                  fields[primary], settings):
+                if key in deferred and connection.execute(
+                        'UPDATE deferred SET record = ? WHERE key = ?',
+                        (json.dumps(record), key)).rowcount:
+                    continue
+                row = get_row(key, record)
+                if len(row) > 0:
+                    yield row
+
+            connection.executemany('DELETE FROM deferred WHERE key = ?',
+                                   iter_found())
+            for key, record in connection.execute(
+                    'SELECT key, record FROM deferred'):
+                row = get_row(key, json.loads(record))
+                if len(row) > 0:
+                    yield row
+        finally:
+            connection.close()
+
+
+def get_partition(key, partitions):
+    """
+    Return number of partition for the key
+    """
+    return zlib.crc32(key.encode()) % partitions
+
+
+def split_file(path, name_key_field, list_field, directory, partitions,
+               rules=None):
+    """
+    Split records of the file to csv-files of partitions by hash of key.
+    Records are read in a separate thread while partitions are written.
+    Return list of paths of partitions
+    """
+    os.makedirs(directory, exist_ok=True)
+    result = [os.path.join(directory, f'{x}.csv') for x in range(partitions)]
+    files = [utils.open_file(x, 'w') for x in result]
+    try:
+        writers = [csv.writer(x) for x in files]
+        names = None
+        with pipeline.ThreadStage(utils.iter_records(
+                path, name_key_field, list_field, rules)) as records:
+            for key, record in records:
+                if names is None:
+                    names = list(record)
+                    for writer in writers:
+                        writer.writerow([const.KEY] + names)
+                writers[get_partition(key, partitions)].writerow(
+                    [key] + list(record.values())
+                )
+    finally:
+        for item in files:
+            item.close()
+
+    return result
+
+
+def load_partition(path):
+    """
+    Load dictionary from csv-file of partition
+    """
+    result = {}
+    rows = utils.iter_rows(path)
+    names = next(rows, [const.KEY])[1:]
+    for row in rows:
+        result[row[0]] = dict(zip(names, row[1:]))
+    return result
+
+
+def compare_partitions(task):
+    """
+    Compare pair of partitions from the task (paths of partitions, settings
+    and key-field) with dictionaries in memory.
+    Return rows of result without header
+    """
+    part_1, part_2, settings, key_field = task
+    dicts = [load_partition(part_1), load_partition(part_2)]
+    return utils.generate_report(dicts, settings, key_field)[1:]
+
+
+def iter_report_partitions(paths, settings, key_field, plan):
+    """
+    Compare files by partitions: records of both files are split to
+    partitions on disk by hash of key and pairs of partitions are compared
+    with dictionaries in memory in the pool of processes.
+    Return generator of rows of result without header
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        parts = [split_file(path, key_field, settings[const.FIELDS][index],
+                            os.path.join(directory, str(index)),
+                            plan[const.PARTITIONS], settings)
+                 for index, path in enumerate(paths)]
+
+        for rows in pipeline.iter_in_processes(
+                compare_partitions,
+                [(x, y, settings, key_field) for x, y in zip(*parts)],
+                plan.get(const.PROCESSES, 1)):
+            yield from rows
+
+
+JOIN = 'FROM file_{0} LEFT JOIN file_{1} ON file_{0}.key = file_{1}.key'
+QUERIES = [
+    'SELECT file_1.key, file_1.record, file_2.record FROM file_1 '
+    'JOIN file_2 ON file_1.key = file_2.key ORDER BY file_1.key',
+    'SELECT * FROM ('
+    f'SELECT file_1.key, file_1.record, file_2.record {JOIN.format(1, 2)} '
+    'UNION ALL '
+    f'SELECT file_2.key, NULL, file_2.record {JOIN.format(2, 1)} '
+    'WHERE file_1.key IS NULL) ORDER BY 1',
+    f'SELECT file_1.key, file_1.record, NULL {JOIN.format(1, 2)} '
+    'WHERE file_2.key IS NULL ORDER BY file_1.key',
+    f'SELECT file_2.key, NULL, file_2.record {JOIN.format(2, 1)} '
+    'WHERE file_1.key IS NULL ORDER BY file_2.key',
+]
+
+
+def load_table(connection, number, path, name_key_field, list_field,
+               rules=None):
+    """
+    Load records of file to table file_<number> with key as primary key.
+    If the key repeats, the last record is kept like in convert_csv_to_dict
+    """
+    connection.execute(f'CREATE TABLE file_{number} '
+                       '(key TEXT PRIMARY KEY, record TEXT) WITHOUT ROWID')
+    connection.executemany(
+        f'INSERT OR REPLACE INTO file_{number} VALUES (?, ?)',
+        ((key, json.dumps(record))
+         for key, record in utils.iter_records(path, name_key_field,
+                                               list_field, rules))
+    )
+    connection.commit()
+
+
+def iter_report_sqlite(paths, settings, key_field):
+    """
+    Compare files in temporary SQLite database: both files are loaded to
+    tables indexed by key, keys for ITEMS are selected with SQL joins in
+    order of keys, and rows are created by process.
+    Return generator of rows of result without header
+    """
+    list_field = utils.prepare_columns(settings, key_field)
+
+    with tempfile.TemporaryDirectory() as directory:
+        connection = sqlite3.connect(os.path.join(directory, 'compare.db'))
+        try:
+            connection.execute('PRAGMA journal_mode = OFF')
+            connection.execute('PRAGMA synchronous = OFF')
+            connection.execute('PRAGMA temp_store = FILE')
+            connection.execute(
+                f'PRAGMA cache_size = -{const.SQLITE_CACHE_SIZE}'
+            )
+            for index, path in enumerate(paths):
+                load_table(connection, index + 1, path, key_field,
+                           settings[const.FIELDS][index], settings)
+
+            for key, record_1, record_2 in connection.execute(
+                    QUERIES[settings.get(const.ITEMS) or 0]):
+                dict_1 = json.loads(record_1) if record_1 else None
+                dict_2 = json.loads(record_2) if record_2 else None
+                row = utils.process(list_field, dict_1, dict_2, key, settings)
+                if len(row) > 0:
+                    yield row
+        finally:
+            connection.close()
+
+
+ENGINES = {
+    const.ENGINE_MEMORY: iter_report_memory,
+    const.ENGINE_MERGE: iter_report_merge,
+    const.ENGINE_PARTITIONS: iter_report_partitions,
+    const.ENGINE_BLOOM: iter_report_bloom,
+    const.ENGINE_SQLITE: iter_report_sqlite,
+}
+PLANNED_ENGINES = [const.ENGINE_PARTITIONS, const.ENGINE_BLOOM]
+
+
+def iter_report(paths, settings, key_field, plan):
+    """
+    Run engine from the plan. Only engines from PLANNED_ENGINES use the plan
+    (count of partitions, processes and keys), other engines get only files
+    and settings.
+    Return generator of rows of result without header
+    """
+    if plan[const.ENGINE] in PLANNED_ENGINES:
+        return ENGINES[plan[const.ENGINE]](paths, settings, key_field, plan)
+    return ENGINES[plan[const.ENGINE]](paths, settings, key_field)
+
+
+def iter_checked(rows, errors):
+    """
+    Iterate rows of result and keep the error of the engine in the list of
+    errors instead of raising it, so it is not reported as error of saving.
+    Return generator of rows
+    """
+    try:
+        yield from rows
+    except Exception as err:  # pylint: disable=W0703
+        errors.append(err)
+
+
+def compare_files(paths, output_path, settings, key_field,
+                  memory_budget=const.MEMORY_BUDGET, engine=None,
+                  processes=1):
+    """
+    Compare two files with engine from the planner (or with the selected
+    engine) and save result on the output path. Rows of result are created
+    in a separate thread while previous rows are written. If the engine
+    fails, the partly saved result is removed.
+    Return plan and error or None as tuple
+    """
+    plan = None
+    error = None
+    errors = []
+
+    try:
+        plan = plan_engine(paths, settings, key_field, memory_budget,
+                           processes)
+        if engine is not None:
+            plan[const.ENGINE] = engine
+            plan[const.REASON] = 'engine is selected by user'
+        settings = plan[const.SETTINGS]
+        with pipeline.ThreadStage(iter_report(paths, settings, key_field,
+                                              plan)) as rows:
+            error = utils.save_data(output_path, itertools.chain(
+                [utils.prepare_columns(settings, key_field)],
+                iter_checked(rows, errors)
+            ))
+        if errors:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            raise errors[0]
+
+    except Exception as err:  # pylint: disable=W0703
+        error = f'{const.COMPARE_FILES}{const.FAILED_ERROR}{err}'
+
+    return plan, error
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Fingerprints of csv-files from file fingerprint.py used in file cli.py.
+Rows of the file are grouped to buckets by hash of key, and the fingerprint
+keeps hashes of every column in every bucket and a small tree of hashes of
+buckets. Two snapshots are compared by their fingerprints, and only rows of
+buckets with differences are loaded to generate the report.
+
+The fingerprint is saved near the file in SQLite database: table meta has
+json with key-field, identity of the file, header and the tree, table
+columns has hashes of every column packed to bytes, and table rows has
+bucket, hash of key and byte offset of every row. Hashes of columns are
+loaded only for compared fields, and rows of buckets with differences are
+read by their offsets
+"""
+
+
+import json
+import os
+import sqlite3
+import struct
+
+import engines
+import key_index
+import utils
+import const
+
+
+def get_fingerprint_path(path):
+    """
+    Return path of fingerprint for file on the path
+    """
+    return f'{path}{const.FINGERPRINT_EXTENSION}'
+
+
+def has_offsets(path):
+    """
+    Check if rows of file on the path can be read by byte offsets: only not
+    compressed csv-file can be read in such way.
+    Return True or False
+    """
+    return not (utils.get_compression(path)[0] or utils.is_columnar(path) or
+                utils.is_sqlite(path))
+
+
+def iter_located_rows(path):
+    """
+    Read rows of file on the path with their byte offsets. Offsets are
+    found only if has_offsets is True, else they are None.
+    Return generator of tuples (offset, row), the first row is header
+    """
+    if has_offsets(path):
+        for offset, row, _ in key_index.iter_offsets(path):
+            yield offset, row
+    else:
+        for row in utils.iter_rows(path):
+            yield None, row
+
+
+def get_key_hash(key):
+    """
+    Return hash of key which fits in signed integer of SQLite
+    """
+    return utils.get_hash(key) >> 1
+
+
+def pack_hashes(hashes):
+    """
+    Return bytes of list of hashes
+    """
+    return struct.pack(f'<{len(hashes)}Q', *hashes)
+
+
+def unpack_hashes(data):
+    """
+    Return list of hashes from bytes
+    """
+    return list(struct.unpack(f'<{len(data) // 8}Q', data))
+
+
+def build_tree(hashes):
+    """
+    Build tree of hashes: every level has hashes of pairs of nodes from the
+    previous level, the last level has the root.
+    Return list of levels
+    """
+    result = [hashes]
+    while len(result[-1]) > 1:
+        level = result[-1]
+        result.append([
+            utils.get_hash(*[str(x) for x in level[number:number + 2]])
+            for number in range(0, len(level), 2)
+        ])
+    return result
+
+
+def add_row(columns, row, key_field, sign=1):
+    """
+    Add hashes of pairs (key, value) of the row to hashes of columns in the
+    bucket of the key, or subtract them if sign is -1.
+    Return number of the bucket
+    """
+    key = row[key_field]
+    bucket = engines.get_partition(key, len(columns[0]))
+    for index, value in enumerate(row):
+        columns[index][bucket] = (columns[index][bucket] + sign *
+                                  utils.get_hash(key, value)) & const.MASK
+    return bucket
+
+
+def create_fingerprint(fingerprint_path):
+    """
+    Create empty database of fingerprint on the path.
+    Return connection
+    """
+    if os.path.exists(fingerprint_path):
+        os.remove(fingerprint_path)
+    connection = sqlite3.connect(fingerprint_path)
+    connection.execute('PRAGMA journal_mode = OFF')
+    connection.execute('PRAGMA synchronous = OFF')
+    connection.execute('CREATE TABLE meta (data TEXT)')
+    connection.execute('CREATE TABLE columns '
+                       '(number INTEGER PRIMARY KEY, hashes BLOB)')
+    connection.execute('CREATE TABLE rows '
+                       '(bucket INTEGER, key INTEGER, offset INTEGER)')
+    return connection
+
+
+def build_fingerprint(path, name_key_field, buckets=const.FINGERPRINT_BUCKETS):
+    """
+    Read file on the path and save its fingerprint with size, time of
+    modification and hash of content of the file.
+    Hash of column in bucket is the sum of hashes of pairs (key, value), so it
+    does not depend on order of rows. If the key repeats, only the last row
+    is counted like in convert_csv_to_dict: hashes of keys are kept in the
+    database, repeated ones are found by query after the first pass and
+    their rows are replaced by the last ones in the second pass.
+    Return error or None
+    """
+    error = None
+    connection = None
+
+    try:
+        stat = os.stat(path)
+        hash_file = utils.get_hash_file(path)
+        rows = iter_located_rows(path)
+        header = next(rows, (None, []))[1]
+        key_field = header.index(name_key_field)
+        columns = [[0] * buckets for _ in header]
+
+        connection = create_fingerprint(get_fingerprint_path(path))
+        connection.executemany('INSERT INTO rows VALUES (?, ?, ?)', (
+            (add_row(columns, row, key_field), get_key_hash(row[key_field]),
+             offset)
+            for offset, row in rows if row
+        ))
+
+        repeated = {x for (x,) in connection.execute(
+            'SELECT key FROM rows GROUP BY key HAVING COUNT(*) > 1'
+        )}
+        if repeated:
+            last = {}
+            rows = utils.iter_rows(path)
+            next(rows, None)
+            for row in rows:
+                if row and get_key_hash(row[key_field]) in repeated:
+                    add_row(columns, row, key_field, -1)
+                    last[row[key_field]] = row
+            for row in last.values():
+                add_row(columns, row, key_field)
+
+        connection.execute('CREATE INDEX rows_bucket ON rows (bucket)')
+        connection.executemany('INSERT INTO columns VALUES (?, ?)', (
+            (number, pack_hashes(hashes))
+            for number, hashes in enumerate(columns)
+        ))
+        tree = build_tree([utils.get_hash(*[str(x[bucket]) for x in columns])
+                           for bucket in range(buckets)])
+        connection.execute('INSERT INTO meta VALUES (?)', (json.dumps({
+            const.KEY: name_key_field,
+            const.SIZE: stat.st_size,
+            const.MTIME: stat.st_mtime_ns,
+            const.HASH: hash_file,
+            const.HEADER: header,
+            const.TREE: tree,
+            const.OFFSETS: has_offsets(path),
+        }),))
+        connection.commit()
+
+    except Exception as err:  # pylint: disable=W0703
+        error = f'{const.BUILD_FINGERPRINT}{const.FAILED_ERROR}{err}'
+
+    finally:
+        if connection is not None:
+            connection.close()
+
+    return error
+
+
+def is_actual(fingerprint, path, name_key_field):
+    """
+    Check if the fingerprint is built for key-field and the file on the path
+    is not changed: size is the same, and hash of content is the same (it is
+    not counted again if time of modification is not changed too).
+    Return True or False
+    """
+    stat = os.stat(path)
+    if not (fingerprint.get(const.KEY) == name_key_field and
+            fingerprint.get(const.SIZE) == stat.st_size and
+            const.HASH in fingerprint):
+        return False
+    return (fingerprint.get(const.MTIME) == stat.st_mtime_ns or
+            fingerprint[const.HASH] == utils.get_hash_file(path))
+
+
+def read_meta(path):
+    """
+    Read metadata of fingerprint of file on the path (see build_fingerprint)
+    without hashes of columns and offsets of rows.
+    Return dictionary or None if there is no fingerprint
+    """
+    if not os.path.exists(get_fingerprint_path(path)):
+        return None
+
+    connection = sqlite3.connect(get_fingerprint_path(path))
+    try:
+        row = connection.execute('SELECT data FROM meta').fetchone()
+    except sqlite3.DatabaseError:
+        row = None
+    finally:
+        connection.close()
+    return json.loads(row[0]) if row is not None else None
+
+
+def load_fingerprint(path, name_key_field):
+    """
+    Load metadata of fingerprint of file on the path. The fingerprint is
+    built if it is absent or it is not actual.
+    Return fingerprint and error or None as tuple
+    """
+    result = None
+    error = None
+
+    try:
+        result = read_meta(path)
+        if result is not None and not is_actual(result, path,
+                                                name_key_field):
+            result = None
+
+        if result is None:
+            error = build_fingerprint(path, name_key_field)
+            if error is None:
+                result = read_meta(path)
+
+    except Exception as err:  # pylint: disable=W0703
+        error = f'{const.LOAD_FINGERPRINT}{const.FAILED_ERROR}{err}'
+
+    return result, error
+
+
+def load_columns(path, numbers):
+    """
+    Load hashes of columns with numbers from fingerprint of file on the path.
+    Return dictionary {number: list of hashes of buckets}
+    """
+    connection = sqlite3.connect(get_fingerprint_path(path))
+    try:
+        return {number: unpack_hashes(hashes) for number, hashes in (
+            connection.execute('SELECT number, hashes FROM columns '
+                               'WHERE number = ?', (number,)).fetchone()
+            for number in set(numbers)
+        )}
+    finally:
+        connection.close()
+
+
+def get_different_buckets(paths, fingerprints, name_key_field, lists_fields):
+    """
+    Compare fingerprints of two files. If roots of trees are equal, files
+    are equal. Else hashes of key-field and fields which are selected in both
+    lists of fields are loaded and compared for every bucket.
+    Return set of numbers of buckets with differences
+    """
+    if len(fingerprints[0][const.TREE][0]) != \
+            len(fingerprints[1][const.TREE][0]):
+        raise ValueError(const.ERROR_FINGERPRINT_BUCKETS)
+
+    trees = [x[const.TREE] for x in fingerprints]
+    if (fingerprints[0][const.HEADER] == fingerprints[1][const.HEADER] and
+            trees[0][-1] == trees[1][-1]):
+        return set()
+
+    positions = [{name: number for number, name in enumerate(x[const.HEADER])}
+                 for x in fingerprints]
+    names = [name_key_field] + [
+        x for x in lists_fields[0]
+        if x in lists_fields[1] and x in positions[0] and x in positions[1]
+    ]
+    columns = [load_columns(path, [position[x] for x in names])
+               for path, position in zip(paths, positions)]
+
+    result = set()
+    for name in names:
+        for bucket, (hash_1, hash_2) in enumerate(zip(
+                columns[0][positions[0][name]],
+                columns[1][positions[1][name]])):
+            if hash_1 != hash_2:
+                result.add(bucket)
+    return result
+
+
+def iter_bucket_records(path, header, buckets, name_key_field, list_field):
+    """
+    Read rows of buckets from csv-file on the path by offsets from its
+    fingerprint. Rows are read in order of the file, so the last row of
+    repeated key is the last one like in convert_csv_to_dict.
+    Return generator of tuples (key, record)
+    """
+    key_field, fields = utils.get_indexes_fields(header, name_key_field,
+                                                 list_field)
+    connection = sqlite3.connect(get_fingerprint_path(path))
+    try:
+        offsets = sorted(
+            offset for bucket in buckets
+            for (offset,) in connection.execute(
+                'SELECT offset FROM rows WHERE bucket = ?', (bucket,)
+            )
+        )
+    finally:
+        connection.close()
+
+    with open(path, 'rb') as csv_file:
+        for offset in offsets:
+            row = key_index.read_row(csv_file, offset)
+            yield row[key_field], {item[1]: row[item[0]] for item in fields}
+
+
+def compare_snapshots(paths, output_path, settings, key_field):
+    """
+    Compare two snapshots by fingerprints and save report for rows of
+    buckets with differences on the output path. Files are not read if
+    there are no differences. Rows of not compressed csv-files are read by
+    offsets only from buckets with differences, other files are read to the
+    end and rows of other buckets are skipped.
+    Return count of buckets with differences and error or None as tuple
+    """
+    result = None
+    error = None
+
+    try:
+        fingerprints = []
+        for path in paths:
+            fingerprint, error = load_fingerprint(path, key_field)
+            if error is not None:
+                return result, error
+            fingerprints.append(fingerprint)
+
+        settings = engines.resolve_fields(
+            settings, [x[const.HEADER] for x in fingerprints]
+        )
+        different = get_different_buckets(paths, fingerprints, key_field,
+                                          settings[const.FIELDS])
+        result = len(different)
+        buckets = len(fingerprints[0][const.TREE][0])
+
+        dicts = [{}, {}]
+        for index, path in enumerate(paths):
+            if not different:
+                break
+            if fingerprints[index][const.OFFSETS]:
+                records = iter_bucket_records(
+                    path, fingerprints[index][const.HEADER], different,
+                    key_field, settings[const.FIELDS][index]
+                )
+            else:
+                records = (
+                    (key, record) for key, record in utils.iter_records(
+                        path, key_field, settings[const.FIELDS][index])
+                    if engines.get_partition(key, buckets) in different
+                )
+            dicts[index].update(records)
+
+        error = utils.save_data(output_path, utils.generate_report(
+            dicts, settings, key_field
+        ))
+
+    except Exception as err:  # pylint: disable=W0703
+        error = f'{const.COMPARE_SNAPSHOTS}{const.FAILED_ERROR}{err}'
+
+    return result, error
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Incremental comparison of append-only csv-files from file incremental.py
+used in file cli.py. States of the file are saved near the file in SQLite
+database, one state for every comparison (other file, key-field and fields):
+offset of the end of the last complete row, hash of the file before the
+offset, header and table of records like from convert_csv_to_dict indexed by
+key. If the file was only appended, only rows after the offset are read,
+only records of their keys are updated and the report has only their keys
+"""
+
+
+import hashlib
+import json
+import os
+import sqlite3
+
+import engines
+import key_index
+import utils
+import const
+
+
+def get_state_path(path):
+    """
+    Return path of state of incremental comparison for file on the path
+    """
+    return f'{path}{const.APPEND_EXTENSION}'
+
+
+def get_comparison(other_path, name_key_field, list_field):
+    """
+    Return identifier of comparison with the other file by key-field and
+    fields, so the file has separate states for different comparisons
+    """
+    return hashlib.sha256(json.dumps([
+        os.path.realpath(other_path), name_key_field, list_field
+    ]).encode()).hexdigest()
+
+
+def open_state(path, comparison):
+    """
+    Open state of file on the path for the comparison (see get_comparison).
+    The state is cleared if the file was changed before the saved offset.
+    Changes of the state are saved only when the connection is committed.
+    Return connection, state and hash object of the file before the offset
+    as tuple
+    """
+    connection = sqlite3.connect(get_state_path(path))
+    connection.execute('CREATE TABLE IF NOT EXISTS state '
+                       '(comparison TEXT PRIMARY KEY, offset INTEGER, '
+                       'hash TEXT, header TEXT)')
+    connection.execute('CREATE TABLE IF NOT EXISTS records '
+                       '(comparison TEXT, key TEXT, record TEXT, '
+                       'PRIMARY KEY (comparison, key)) WITHOUT ROWID')
+
+    state = {const.COMPARISON: comparison, const.SIZE: 0,
+             const.HEADER: None}
+    row = connection.execute(
+        'SELECT offset, hash, header FROM state WHERE comparison = ?',
+        (comparison,)
+    ).fetchone()
+    if row is not None and row[0] <= os.path.getsize(path):
+        hash_file = utils.update_hash_file(hashlib.sha256(), path, row[0])
+        if hash_file.hexdigest() == row[1]:
+            state.update({const.SIZE: row[0],
+                          const.HEADER: json.loads(row[2])})
+            return connection, state, hash_file
+
+    connection.execute('DELETE FROM state WHERE comparison = ?',
+                       (comparison,))
+    connection.execute('DELETE FROM records WHERE comparison = ?',
+                       (comparison,))
+    return connection, state, hashlib.sha256()
+
+
+def load_state(path, comparison):
+    """
+    Load state of file on the path for the comparison without changes.
+    Return state or None
+    """
+    if not os.path.exists(get_state_path(path)):
+        return None
+
+    connection, state, _ = open_state(path, comparison)
+    connection.close()
+    return state if state[const.HEADER] is not None else None
+
+
+def update_state(connection, state, hash_file, path, name_key_field):
+    """
+    Read complete rows of file on the path after the offset from its state
+    and replace records of their keys in the state. The offset and the hash
+    are moved to the end of the last complete row.
+    Return set of keys of read rows
+    """
+    keys = set()
+    start = state[const.SIZE]
+
+    def iter_records(rows, key_field, fields):
+        for _, row, end in rows:
+            state[const.SIZE] = end
+            if row:
+                keys.add(row[key_field])
+                yield state[const.COMPARISON], row[key_field], json.dumps({
+                    item[1]: row[item[0]] for item in fields
+                })
+
+    rows = key_index.iter_offsets(path, start, True)
+    if state[const.HEADER] is None:
+        _, state[const.HEADER], state[const.SIZE] = next(
+            rows, (0, [], state[const.SIZE])
+        )
+    key_field, fields = utils.get_indexes_fields(state[const.HEADER],
+                                                 name_key_field, None)
+    if key_field is None:
+        raise KeyError(name_key_field)
+
+    connection.executemany('INSERT OR REPLACE INTO records VALUES (?, ?, ?)',
+                           iter_records(rows, key_field, fields))
+    utils.update_hash_file(hash_file, path, state[const.SIZE], start)
+
+    connection.execute('INSERT OR REPLACE INTO state VALUES (?, ?, ?, ?)', (
+        state[const.COMPARISON], state[const.SIZE], hash_file.hexdigest(),
+        json.dumps(state[const.HEADER])
+    ))
+    return keys
+
+
+def load_records(connection, comparison, keys, list_field):
+    """
+    Load records of keys from the state for the comparison with only fields
+    from the list.
+    Return dictionary like from convert_csv_to_dict
+    """
+    result = {}
+    for key in keys:
+        row = connection.execute(
+            'SELECT record FROM records WHERE comparison = ? AND key = ?',
+            (comparison, key)
+        ).fetchone()
+        if row is not None:
+            record = json.loads(row[0])
+            result[key] = {x: record[x] for x in list_field if x in record}
+    return result
+
+
+def compare_appended(paths, output_path, settings, key_field):
+    """
+    Read appended rows of two files, save report for keys of these rows on
+    the output path and save states of files.
+    Return count of keys in the report and error or None as tuple
+    """
+    result = None
+    error = None
+    connections = {}
+
+    try:
+        for path in paths:
+            if utils.get_compression(path)[0] or utils.is_columnar(path):
+                raise ValueError(const.ERROR_APPEND_FORMAT)
+
+        states = {}
+        keys = set()
+        for index, path in enumerate(paths):
+            if path not in connections:
+                comparison = get_comparison(
+                    paths[1 - index], key_field,
+                    (settings.get(const.FIELDS) or [None, None])[index]
+                )
+                connections[path], states[path], hash_file = open_state(
+                    path, comparison
+                )
+                keys.update(update_state(connections[path], states[path],
+                                         hash_file, path, key_field))
+
+        settings = engines.resolve_fields(
+            settings, [states[x][const.HEADER] for x in paths]
+        )
+        dicts = [load_records(connections[path],
+                              states[path][const.COMPARISON],
+                              keys, fields)
+                 for path, fields in zip(paths, settings[const.FIELDS])]
+
+        error = utils.save_data(output_path, utils.generate_report(
+            dicts, settings, key_field
+        ))
+        if error is None:
+            for connection in connections.values():
+                connection.commit()
+            result = len(keys)
+
+    except Exception as err:  # pylint: disable=W0703
+        error = f'{const.COMPARE_APPENDED}{const.FAILED_ERROR}{err}'
+
+    finally:
+        for connection in connections.values():
+            connection.close()
+
+    return result, error
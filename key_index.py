@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Sidecar index of csv-file from file key_index.py used in files compare.py
+and cli.py. The index keeps sorted keys with byte offsets of their rows, so
+rows of a big file can be found without reading of the whole file.
+
+Format of the index file:
+magic, length and json of metadata (key-field, size and time of
+modification of csv-file), count of keys, sorted entries (position of key
+from the start of keys, offset of row in csv-file) and keys with their
+lengths
+"""
+
+
+import bisect
+import csv
+import io
+import itertools
+import json
+import mmap
+import operator
+import os
+import shutil
+import struct
+import tempfile
+
+import sorting
+import utils
+import const
+
+
+MAGIC = b'CSVIDX2\n'
+LENGTH = struct.Struct('<I')
+COUNT = struct.Struct('<Q')
+ENTRY = struct.Struct('<QQ')
+
+
+def get_index_path(path):
+    """
+    Return path of sidecar index for csv-file on the path
+    """
+    return f'{path}{const.INDEX_EXTENSION}'
+
+
+def iter_offsets(path, start=0, is_complete=False):
+    """
+    Read csv-file on the path from the start offset and find byte offsets
+    of every row. Rows with line breaks in quoted values are joined. If
+    is_complete is set, the last row is read only if it is ended with line
+    break, because it can be still written.
+    Return generator of tuples (offset, row, offset of the end of the row)
+    """
+    with open(path, 'rb') as open_file:
+        open_file.seek(start)
+        offset = start
+        lines = []
+        quotes = 0
+        for line in open_file:
+            lines.append(line)
+            quotes += line.count(b'"')
+            if quotes % 2 == 0 and (not is_complete or line.endswith(b'\n')):
+                text = b''.join(lines).decode(const.ENCODING)
+                end = offset + sum(len(x) for x in lines)
+                yield offset, next(csv.reader(io.StringIO(text, newline='')),
+                                   []), end
+                offset = end
+                lines = []
+                quotes = 0
+
+
+def read_row(csv_file, offset):
+    """
+    Return row of csv-file opened in binary mode which starts from the offset
+    """
+    csv_file.seek(offset)
+    text = io.TextIOWrapper(csv_file, encoding=const.ENCODING, newline='')
+    try:
+        return next(csv.reader(text), [])
+    finally:
+        text.detach()
+
+
+def get_identity(path):
+    """
+    Return size and time of modification of file on the path
+    """
+    stat = os.stat(path)
+    return {const.SIZE: stat.st_size, const.MTIME: stat.st_mtime_ns}
+
+
+def iter_last_entries(path):
+    """
+    Read entries (key, offset) from csv-file on the path sorted by key.
+    If the key repeats, the last entry is used.
+    Return generator of tuples (key, offset)
+    """
+    with utils.open_file(path, 'r') as read_file:
+        for key, entries in itertools.groupby(csv.reader(read_file),
+                                              operator.itemgetter(0)):
+            *_, last = entries
+            yield key, int(last[1])
+
+
+def build_index(path, name_key_field, run_rows=const.SORT_RUN_ROWS):
+    """
+    Scan csv-file on the path once and save sidecar index of key-field.
+    Pairs of key and offset are sorted on disk with external merge sort, so
+    keys are not kept in memory. If the key repeats, the last row is indexed
+    like in convert_csv_to_dict.
+    Return error or None
+    """
+    error = None
+
+    try:
+        if utils.get_compression(path)[0] or utils.is_columnar(path):
+            raise ValueError(const.ERROR_INDEX_FORMAT)
+
+        meta = json.dumps(dict(get_identity(path), **{
+            const.KEY: name_key_field
+        })).encode()
+        rows = iter_offsets(path)
+        header = next(rows, (0, [], 0))[1]
+        key_field = header.index(name_key_field)
+
+        with tempfile.TemporaryDirectory() as directory:
+            entries = os.path.join(directory, 'entries.csv')
+            sorting.sort_rows(((row[key_field], offset)
+                               for offset, row, _ in rows if row),
+                              0, entries, directory, run_rows=run_rows)
+
+            keys_path = os.path.join(directory, 'keys.bin')
+            count = 0
+            position = 0
+            with open(get_index_path(path), 'wb') as my_file, \
+                    open(keys_path, 'wb') as keys_file:
+                my_file.write(MAGIC + LENGTH.pack(len(meta)) + meta)
+                my_file.write(COUNT.pack(0))
+                for key, offset in iter_last_entries(entries):
+                    data = key.encode(const.ENCODING)
+                    my_file.write(ENTRY.pack(position, offset))
+                    keys_file.write(LENGTH.pack(len(data)) + data)
+                    position += LENGTH.size + len(data)
+                    count += 1
+
+                keys_file.close()
+                with open(keys_path, 'rb') as open_file:
+                    shutil.copyfileobj(open_file, my_file)
+                my_file.seek(len(MAGIC) + LENGTH.size + len(meta))
+                my_file.write(COUNT.pack(count))
+
+    except Exception as err:  # pylint: disable=W0703
+        error = f'{const.BUILD_INDEX}{const.FAILED_ERROR}{err}'
+
+    return error
+
+
+class KeyIndex():
+    """
+    The class used to find rows of csv-file by sidecar index.
+    The index is mapped to memory, so keys are found by binary search
+    without loading of the whole index
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.csv_file = None
+        self.index_file = open(get_index_path(path), 'rb')
+        self.map = mmap.mmap(self.index_file.fileno(), 0,
+                             access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(const.ERROR_INDEX_FORMAT)
+
+        length = LENGTH.unpack_from(self.map, len(MAGIC))[0]
+        start = len(MAGIC) + LENGTH.size
+        self.meta = json.loads(self.map[start:start + length])
+        self.count = COUNT.unpack_from(self.map, start + length)[0]
+        self.start = start + length + COUNT.size
+        self.keys_start = self.start + ENTRY.size * self.count
+        self.csv_file = open(path, 'rb')
+        self.header = next(iter_offsets(path), (0, [], 0))[1]
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, number):
+        if not 0 <= number < self.count:
+            raise IndexError(number)
+        return self.key(number)
+
+    def __repr__(self):
+        return f"KeyIndex(path: {self.path!r}, 'count': {self.count})"
+
+    def __str__(self):
+        return repr(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def is_actual(self, name_key_field):
+        """
+        Check if the index is built for key-field and csv-file is not changed
+        (size and time of modification are the same).
+        Return True or False
+        """
+        identity = get_identity(self.path)
+        return (self.meta[const.KEY] == name_key_field and
+                all(self.meta.get(x) == y for x, y in identity.items()))
+
+    def entry(self, number):
+        """
+        Return position of key in the index and offset of row in csv-file
+        """
+        return ENTRY.unpack_from(self.map, self.start + ENTRY.size * number)
+
+    def key(self, number):
+        """
+        Return key with the number in sorted keys
+        """
+        position = self.keys_start + self.entry(number)[0]
+        length = LENGTH.unpack_from(self.map, position)[0]
+        position += LENGTH.size
+        return self.map[position:position + length].decode(const.ENCODING)
+
+    def read_row(self, offset):
+        """
+        Return row of csv-file which starts from the offset
+        """
+        return read_row(self.csv_file, offset)
+
+    def to_record(self, row, list_field):
+        """
+        Return key and record like values of dictionary from
+        convert_csv_to_dict
+        """
+        key_field, fields = utils.get_indexes_fields(
+            self.header, self.meta[const.KEY], list_field
+        )
+        return row[key_field], {item[1]: row[item[0]] for item in fields}
+
+    def find(self, keys, list_field=None):
+        """
+        Find rows of keys.
+        Return dictionary like from convert_csv_to_dict
+        """
+        result = {}
+        for key in keys:
+            number = bisect.bisect_left(self, key)
+            if number < self.count and self.key(number) == key:
+                row = self.read_row(self.entry(number)[1])
+                result.update([self.to_record(row, list_field)])
+        return result
+
+    def find_range(self, low, high, list_field=None):
+        """
+        Find rows of keys from low to high inclusive.
+        Return dictionary like from convert_csv_to_dict
+        """
+        result = {}
+        number = bisect.bisect_left(self, low)
+        while number < self.count and self.key(number) <= high:
+            row = self.read_row(self.entry(number)[1])
+            result.update([self.to_record(row, list_field)])
+            number += 1
+        return result
+
+    def close(self):
+        """
+        Close the index and csv-file
+        """
+        self.map.close()
+        self.index_file.close()
+        if self.csv_file is not None:
+            self.csv_file.close()
+
+
+def open_index(path, name_key_field):
+    """
+    Open sidecar index of csv-file on the path. The index is built if it is
+    absent or it is not actual.
+    Return KeyIndex and error or None
+    """
+    key_index = None
+    error = None
+
+    if os.path.exists(get_index_path(path)):
+        try:
+            key_index = KeyIndex(path)
+        except ValueError:
+            key_index = None
+        if key_index is not None and not key_index.is_actual(name_key_field):
+            key_index.close()
+            key_index = None
+
+    if key_index is None:
+        error = build_index(path, name_key_field)
+        if error is None:
+            key_index = KeyIndex(path)
+
+    return key_index, error
+
+
+def find_keys(path, name_key_field, keys, list_field=None):
+    """
+    Find rows of keys in csv-file on the path by sidecar index.
+    Return dictionary like from convert_csv_to_dict and error or None
+    """
+    result = None
+    error = None
+
+    try:
+        key_index, error = open_index(path, name_key_field)
+        if key_index is not None:
+            with key_index:
+                result = key_index.find(keys, list_field)
+
+    except Exception as err:  # pylint: disable=W0703
+        error = f'{const.FIND_KEYS}{const.FAILED_ERROR}{err}'
+
+    return result, error
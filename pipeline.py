@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Stages of pipeline from file pipeline.py used in files engines.py and
+utils.py.
+Stages are connected by bounded queues, so reading, comparison and writing
+of data overlap, and memory is limited by sizes of queues
+"""
+
+
+import concurrent.futures
+import functools
+import io
+import itertools
+import queue
+import threading
+
+import const
+
+
+class ThreadStage():
+    """
+    The class used to iterate items of iterable in a separate thread.
+    Items are put to the bounded queue in chunks, so the producer works
+    while the consumer handles previous chunks. If the consumer stops
+    iteration early or closes the stage, the producer is stopped and the
+    iterable is closed, so its resources are freed at once
+    """
+
+    def __init__(self, iterable, chunk_size=const.COUNT_ROWS,
+                 queue_size=const.QUEUE_SIZE):
+        self.iterable = iterable
+        self.chunk_size = chunk_size
+        self.queue = queue.Queue(queue_size)
+        self.stop = threading.Event()
+        self.error = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def __repr__(self):
+        return f"ThreadStage(iterable: {self.iterable!r}, " \
+               f"'chunk_size': {self.chunk_size})"
+
+    def __str__(self):
+        return repr(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __iter__(self):
+        try:
+            while True:
+                chunk = self.queue.get()
+                if not chunk:
+                    break
+                yield from chunk
+            if self.error is not None:
+                raise self.error
+        finally:
+            self.close()
+
+    def run(self):
+        """
+        Put chunks of items to the queue.
+        The empty chunk means the end of items
+        """
+        try:
+            items = iter(self.iterable)
+            while not self.stop.is_set():
+                chunk = list(itertools.islice(items, self.chunk_size))
+                self.put(chunk)
+                if not chunk:
+                    break
+        except Exception as err:  # pylint: disable=W0703
+            self.error = err
+            self.put([])
+
+    def put(self, chunk):
+        """
+        Put the chunk to the queue while iteration is not stopped
+        """
+        while not self.stop.is_set():
+            try:
+                self.queue.put(chunk, timeout=const.QUEUE_TIMEOUT)
+                break
+            except queue.Full:
+                continue
+
+    def close(self):
+        """
+        Stop the producer, wait for its thread and close the iterable if it
+        is a generator or has method close
+        """
+        self.stop.set()
+        self.thread.join()
+        if hasattr(self.iterable, 'close'):
+            self.iterable.close()
+
+
+class ThreadReader(io.RawIOBase):
+    """
+    The class used to read a binary file in a separate thread.
+    Chunks of the file are read and decompressed in ThreadStage, so
+    decompression overlaps with parsing of csv-data
+    """
+
+    def __init__(self, raw_file, chunk_size=const.CHUNK_SIZE,
+                 queue_size=const.QUEUE_SIZE):
+        super().__init__()
+        self.raw_file = raw_file
+        self.chunk_size = chunk_size
+        self.stage = ThreadStage(
+            iter(functools.partial(raw_file.read, chunk_size), b''), 1,
+            queue_size
+        )
+        self.chunks = iter(self.stage)
+        self.buffer = b''
+
+    def __repr__(self):
+        return f"ThreadReader(file: {self.raw_file!r}, " \
+               f"'chunk_size': {self.chunk_size})"
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if not self.buffer:
+            self.buffer = next(self.chunks, b'')
+        size = min(len(buffer), len(self.buffer))
+        buffer[:size] = self.buffer[:size]
+        self.buffer = self.buffer[size:]
+        return size
+
+    def close(self):
+        if not self.closed:
+            self.stage.close()
+            self.raw_file.close()
+        super().close()
+
+
+def iter_in_processes(function, items, processes,
+                      queue_size=const.QUEUE_SIZE):
+    """
+    Call the function for every item in the pool of processes. Not more than
+    queue_size results are waited at once, and results are returned in order
+    of items.
+    Return generator of results
+    """
+    if processes <= 1:
+        yield from map(function, items)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+        futures = []
+        for item in items:
+            if len(futures) >= queue_size:
+                yield futures.pop(0).result()
+            futures.append(executor.submit(function, item))
+        for future in futures:
+            yield future.result()
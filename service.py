@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Local compare service from file service.py used in file cli.py.
+The service listens on Unix socket or localhost TCP port and keeps recently
+loaded files in memory, so repeated comparisons do not parse files again.
+
+Protocol: every job is one line of json with keys 'paths', 'key', 'settings'
+(the same keys as in Compare.change_settings) and optional 'output_file'.
+All paths of the job must be in the root directory of the service.
+Unix socket is available only for the owner. TCP port is available for all
+local users, so the service on the port needs token, and every job must
+have the same token in key 'token'.
+The answer is lines of json: header and rows of the report (if the output
+file is not set) and the last line with count of rows or error
+"""
+
+
+import asyncio
+import concurrent.futures
+import hmac
+import json
+import os
+import socket
+import threading
+
+import engines
+import utils
+import const
+
+
+class DatasetCache(utils.ReportCache):
+    """
+    The class used to cache loaded files as tuples (header, dictionary like
+    from convert_csv_to_dict). The least recently used file leaves the cache
+    first, when the total count of cells is more than the maximum size
+    """
+
+    def __repr__(self):
+        return f"DatasetCache(len of 'data': {len(self.data)}, " \
+               f"'size': {self.size}, 'max_size': {self.max_size})"
+
+    @staticmethod
+    def get_size(report):
+        """
+        Return size of the loaded file as count of cells
+        """
+        return sum(len(x) for x in report[1].values()) if report else 0
+
+
+class CompareService():
+    """
+    The class used to run jobs of comparison on the pool of workers with
+    shared caches of loaded files and generated reports
+    """
+
+    def __init__(self, workers=os.cpu_count(),
+                 max_size=const.MAX_SIZE_DATASET_CACHE, root=os.curdir,
+                 token=None):
+        self.root = os.path.realpath(root)
+        self.token = token
+        self.datasets = DatasetCache(max_size)
+        self.reports = utils.ReportCache()
+        self.lock = threading.Lock()
+        self.executor = concurrent.futures.ThreadPoolExecutor(workers)
+
+    def __repr__(self):
+        return f"CompareService('root': {self.root!r}, " \
+               f"'datasets': {self.datasets!r}, " \
+               f"'reports': {self.reports!r})"
+
+    def __str__(self):
+        return repr(self)
+
+    def check_token(self, job):
+        """
+        Check that the job has token of the service if it is set
+        """
+        if self.token and not hmac.compare_digest(
+                str(job.get(const.TOKEN, '')).encode(),
+                self.token.encode()):
+            raise ValueError(const.ERROR_TOKEN)
+
+    def check_path(self, path):
+        """
+        Resolve the path with symbolic links and check that it is in the
+        root directory.
+        Return resolved path
+        """
+        result = os.path.realpath(path)
+        if os.path.commonpath([result, self.root]) != self.root:
+            raise ValueError(f'{const.ERROR_OUTSIDE_ROOT}{path}')
+        return result
+
+    @staticmethod
+    def get_identity(path, name_key_field):
+        """
+        Return identity of file on the path which is changed with the file
+        """
+        stat = os.stat(path)
+        return [os.path.abspath(path), stat.st_mtime_ns, stat.st_size,
+                name_key_field]
+
+    def load(self, path, name_key_field, rules=None):
+        """
+        Get file from the cache or load it with rules (see
+        utils.compile_rules).
+        Return header and dictionary as tuple
+        """
+        rules = rules or {}
+        key = self.datasets.get_key(
+            [rules.get(const.FILTERS), rules.get(const.NORMALIZERS)],
+            *self.get_identity(path, name_key_field)
+        )
+        with self.lock:
+            result = self.datasets.get(key)
+        if result is not None:
+            return result
+
+        data, error = utils.load_data(path, None, rules)
+        if error is not None:
+            raise ValueError(error)
+        dict_item, error = utils.convert_csv_to_dict(data, name_key_field,
+                                                     None)
+        if error is not None:
+            raise ValueError(error)
+
+        result = data[0], dict_item
+        with self.lock:
+            self.datasets.append(key, result)
+        return result
+
+    def run_job(self, job):
+        """
+        Compare files of the job or get the report from the cache.
+        Return the report with header
+        """
+        key_field = job[const.KEY]
+        paths = [self.check_path(x) for x in job[const.PATHS]]
+        key = self.reports.get_key(
+            job.get(const.SETTINGS),
+            *[self.get_identity(x, key_field) for x in paths]
+        )
+        with self.lock:
+            result = self.reports.get(key)
+        if result is not None:
+            return result
+
+        items = [self.load(path, key_field, job.get(const.SETTINGS))
+                 for path in paths]
+        settings = engines.resolve_fields(job.get(const.SETTINGS) or {},
+                                          [x[0] for x in items])
+        result = utils.generate_report([x[1] for x in items], settings,
+                                       key_field)
+
+        with self.lock:
+            self.reports.append(key, result)
+        return result
+
+    async def handle(self, reader, writer):
+        """
+        Read jobs from the connection and write answers
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            async for line in reader:
+                if not line.strip():
+                    continue
+                try:
+                    job = json.loads(line)
+                    self.check_token(job)
+                    if job.get(const.OUTPUT_FILE):
+                        job[const.OUTPUT_FILE] = self.check_path(
+                            job[const.OUTPUT_FILE]
+                        )
+                    report = await loop.run_in_executor(self.executor,
+                                                        self.run_job, job)
+                    if job.get(const.OUTPUT_FILE):
+                        error = utils.save_data(job[const.OUTPUT_FILE],
+                                                report)
+                        if error is not None:
+                            raise ValueError(error)
+                    else:
+                        for number in range(0, len(report), const.COUNT_ROWS):
+                            writer.writelines(
+                                json.dumps(x).encode() + b'\n'
+                                for x in report[number:number +
+                                                const.COUNT_ROWS]
+                            )
+                            await writer.drain()
+                    answer = {const.COUNT: max(len(report) - 1, 0)}
+
+                except Exception as err:  # pylint: disable=W0703
+                    error = f'{const.RUN_JOB}{const.FAILED_ERROR}{err}'
+                    answer = {const.ERROR: error}
+
+                writer.write(json.dumps(answer).encode() + b'\n')
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def start(self, path=None, host=const.LOCALHOST,
+                    port=const.SERVICE_PORT):
+        """
+        Start the service on Unix socket on the path or on the port of host.
+        Unix socket is created with umask, so it is available only for the
+        owner from the start. The service on the port needs token.
+        Return asyncio server
+        """
+        if path:
+            umask = os.umask(0o777 & ~const.SOCKET_MODE)
+            try:
+                return await asyncio.start_unix_server(
+                    self.handle, path, limit=const.CHUNK_SIZE
+                )
+            finally:
+                os.umask(umask)
+        if not self.token:
+            raise ValueError(const.ERROR_SERVICE_TOKEN)
+        return await asyncio.start_server(self.handle, host, port,
+                                          limit=const.CHUNK_SIZE)
+
+    async def serve(self, path=None, host=const.LOCALHOST,
+                    port=const.SERVICE_PORT):
+        """
+        Start the service and serve jobs until it is stopped
+        """
+        server = await self.start(path, host, port)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        """
+        Stop workers and clear caches
+        """
+        self.executor.shutdown()
+        self.datasets.clear()
+        self.reports.clear()
+
+
+def send_job(job, path=None, host=const.LOCALHOST, port=const.SERVICE_PORT,
+             token=None):
+    """
+    Send the job to the service on Unix socket on the path or on the port of
+    host with the token (if it is set) and read the answer.
+    Return the report (empty if the output file is set) and error or None as
+    tuple
+    """
+    result = []
+    error = None
+
+    try:
+        if token:
+            job = dict(job, **{const.TOKEN: token})
+        if path:
+            connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            connection.connect(path)
+        else:
+            connection = socket.create_connection((host, port))
+
+        with connection, connection.makefile('rb') as open_file:
+            connection.sendall(json.dumps(job).encode() + b'\n')
+            for line in open_file:
+                item = json.loads(line)
+                if isinstance(item, list):
+                    result.append(item)
+                else:
+                    error = item.get(const.ERROR)
+                    break
+
+    except Exception as err:  # pylint: disable=W0703
+        error = f'{const.SEND_JOB}{const.FAILED_ERROR}{err}'
+
+    return result, error
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+External merge sort of csv-files by key-field from file sorting.py used in
+files compare.py, cli.py and engines.py
+"""
+
+
+import concurrent.futures
+import csv
+import heapq
+import itertools
+import json
+import operator
+import os
+import tempfile
+
+import utils
+import const
+
+
+def get_marker_path(path):
+    """
+    Return path of marker which says that file on the path is sorted
+    """
+    return f'{path}{const.SORTED_EXTENSION}'
+
+
+def is_sorted_by(path, name_key_field):
+    """
+    Check marker of the file on the path: the file is sorted by key-field,
+    if the marker is for this key-field and size of the file is not changed.
+    Return True or False
+    """
+    try:
+        with open(get_marker_path(path), 'r') as open_file:
+            marker = json.load(open_file)
+        return (marker[const.KEY] == name_key_field and
+                marker[const.SIZE] == os.path.getsize(path))
+    except Exception:  # pylint: disable=W0703
+        return False
+
+
+def save_marker(path, name_key_field):
+    """
+    Save marker which says that file on the path is sorted by key-field
+    """
+    with open(get_marker_path(path), 'w') as my_file:
+        json.dump({const.KEY: name_key_field,
+                   const.SIZE: os.path.getsize(path)}, my_file)
+
+
+def write_run(rows, key_field, path):
+    """
+    Sort rows by key-field and write them in csv-file on the path.
+    Return the path
+    """
+    rows.sort(key=operator.itemgetter(key_field))
+    with utils.open_file(path, 'w') as my_file:
+        csv.writer(my_file).writerows(rows)
+    return path
+
+
+def merge_runs(paths, key_field, output, header=None):
+    """
+    Merge sorted csv-files on the paths to one sorted csv-file on the output
+    path. If header is set, it is written as the first row
+    """
+    files = [utils.open_file(path, 'r') for path in paths]
+    try:
+        with utils.open_file(output, 'w') as my_file:
+            writer = csv.writer(my_file)
+            if header is not None:
+                writer.writerow(header)
+            writer.writerows(heapq.merge(
+                *[csv.reader(x) for x in files],
+                key=operator.itemgetter(key_field)
+            ))
+    finally:
+        for item in files:
+            item.close()
+
+
+def create_runs(rows, key_field, directory, run_rows, processes):
+    """
+    Split rows to runs of run_rows rows, sort them in processes and write
+    to csv-files in the directory.
+    Return list of paths of runs
+    """
+    result = []
+    chunks = enumerate(iter(lambda: list(itertools.islice(rows, run_rows)),
+                            []))
+
+    if processes <= 1:
+        for number, chunk in chunks:
+            result.append(write_run(
+                chunk, key_field, os.path.join(directory, f'run_{number}.csv')
+            ))
+        return result
+
+    with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+        futures = []
+        for number, chunk in chunks:
+            if len(futures) >= processes:
+                result.append(futures.pop(0).result())
+            futures.append(executor.submit(
+                write_run, chunk, key_field,
+                os.path.join(directory, f'run_{number}.csv')
+            ))
+        result.extend(x.result() for x in futures)
+
+    return result
+
+
+def sort_rows(rows, key_field, output, directory, header=None,
+              run_rows=const.SORT_RUN_ROWS, processes=1):
+    """
+    Sort rows by the column key_field with external merge sort and save
+    them in csv-file on the output path. Runs of run_rows rows are sorted in
+    processes and written to the directory, then they are merged with k-way
+    merge (in several passes if there are a lot of runs). Rows with equal
+    keys keep their order. If header is set, it is written as the first row
+    """
+    runs = create_runs(rows, key_field, directory, run_rows, processes)
+    number = 0
+    while len(runs) > const.MAX_MERGE_RUNS:
+        merged = os.path.join(directory, f'merge_{number}.csv')
+        merge_runs(runs[:const.MAX_MERGE_RUNS], key_field, merged)
+        runs = [merged] + runs[const.MAX_MERGE_RUNS:]
+        number += 1
+    merge_runs(runs, key_field, output, header)
+
+
+def sort_file(path, output, name_key_field, run_rows=const.SORT_RUN_ROWS,
+              processes=os.cpu_count()):
+    """
+    Sort file on the path by key-field with external merge sort (see
+    sort_rows) and save the result in csv-file on the output path with
+    marker of sorting.
+    Return error or None
+    """
+    error = None
+
+    try:
+        rows = utils.iter_rows(path)
+        header = next(rows, [])
+        key_field = header.index(name_key_field)
+
+        with tempfile.TemporaryDirectory() as directory:
+            sort_rows(rows, key_field, output, directory, header, run_rows,
+                      processes)
+
+        save_marker(output, name_key_field)
+
+    except Exception as err:  # pylint: disable=W0703
+        error = f'{const.SORT_FILE}{const.FAILED_ERROR}{err}'
+
+    return error
@@ -1,5 +1,6 @@
 import pytest
 
+import sorting
 import utils
 import const
 
@@ -258,3 +259,116 @@ values_for_dict_to_table = [
         CSV_DATA_2
     ]
 ]
+
+values_for_generate_statistics = [
+    [
+        values_for_generate_report[1][0],
+        values_for_generate_report[1][1],
+        'key_f',
+        {
+            const.ROWS_IN_BOTH: 2,
+            const.ROWS_ONLY_FIRST: 1,
+            const.ROWS_ONLY_SECOND: 0,
+            const.ROWS_CHANGED: 0,
+            const.DIFFERENT_FIELDS: {'field_3': 0}
+        }
+    ],
+    [
+        values_for_generate_report[0][0],
+        dict(values_for_generate_report[0][1], columns=0),
+        'key_f',
+        {
+            const.ROWS_IN_BOTH: 1,
+            const.ROWS_ONLY_FIRST: 1,
+            const.ROWS_ONLY_SECOND: 1,
+            const.ROWS_CHANGED: 1,
+            const.DIFFERENT_FIELDS: {'field_1': 0, 'field_2': 1}
+        }
+    ],
+]
+
+values_for_is_equal_files = [
+    [FILE_DATA_1, FILE_DATA_1, ['key_f', 'field_1'], (True, None, None)],
+    [
+        'key_f,field_1,field_2,field_3\nkey_2,1,,\nkey_1,1,2,3\n',
+        FILE_DATA_1, None, (True, None, None)
+    ],
+    [
+        FILE_DATA_1, 'key_f,field_1,field_2,field_3\nkey_1,1,2,3\nkey_2,2,,\n',
+        ['key_f', 'field_1'], (False, 'key_2', None)
+    ],
+    [
+        FILE_DATA_1, 'key_f,field_1,field_2,field_3\nkey_1,1,2,3\nkey_2,2,,\n',
+        ['key_f', 'field_2'], (True, None, None)
+    ],
+    [
+        FILE_DATA_1, 'key_f,field_1,field_2,field_3\nkey_1,1,2,3\n',
+        None, (False, 'key_2', None)
+    ],
+    [
+        'key_f,field_1\nk,a1\nk,a2\n', 'key_f,field_1\nk,a2\n',
+        None, (True, None, None)
+    ],
+    [
+        'key_f,field_1\nk,a1\nk,a2\n', 'key_f,field_1\nk,a2\nk,a1\n',
+        None, (False, 'k', None)
+    ],
+]
+
+values_for_create_small_dicts_aligned = [
+    [
+        [
+            {f'key_{x}': {'f': x} for x in range(100)},
+            {f'key_{x}': {'f': x if x < 90 else -x} for x in range(50, 150)}
+        ],
+        4,
+        [
+            ['key_90', 'key_91', 'key_0', 'key_1'],
+            ['key_90', 'key_91', 'key_100', 'key_101']
+        ]
+    ],
+    [
+        [
+            {f'key_{x}': {'f': x} for x in range(10)},
+            {f'key_{x}': {'f': -x} for x in range(20)}
+        ],
+        3,
+        [
+            ['key_1', 'key_2'],
+            ['key_1', 'key_2', 'key_10']
+        ]
+    ],
+]
+
+SETTINGS_REPORT = {
+    'items': 1, 'different_fields': True, 'values_different': 0,
+    'delimiter': 1, 'values_math': 0, 'absent': 0, 'columns': 1,
+    'fields': [None, None]
+}
+
+
+@pytest.fixture()
+def sorted_files(tmpdir):
+    file_1 = tmpdir.join('sorted_1.csv')
+    file_2 = tmpdir.join('sorted_2.csv')
+    file_1.write('key,a,b\n' + ''.join(
+        f'k{x:04},{x},{x % 3}\n' for x in range(0, 300)
+    ))
+    file_2.write('key,a,c\n' + ''.join(
+        f'k{x:04},{x if x % 7 else -x},{x % 5}\n' for x in range(100, 400)
+    ))
+    for path in (file_1, file_2):
+        sorting.save_marker(path.strpath, 'key')
+    return [file_1.strpath, file_2.strpath]
+
+
+@pytest.fixture()
+def unsorted_files(tmpdir, sorted_files):
+    paths = []
+    for index, path in enumerate(sorted_files):
+        with open(path) as open_file:
+            lines = open_file.readlines()
+        new_path = tmpdir.join(f'unsorted_{index}.csv')
+        new_path.write(lines[0] + ''.join(reversed(lines[1:])))
+        paths.append(new_path.strpath)
+    return paths
@@ -0,0 +1,89 @@
+import pytest
+
+import batch
+import conftest
+import engines
+import utils
+import const
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_compare_batch(tmpdir, sorted_files, unsorted_files, processes):
+    settings = conftest.SETTINGS_REPORT
+    pairs, error = batch.get_pairs(sorted_files[0],
+                                   [sorted_files[1], unsorted_files[1]],
+                                   tmpdir.strpath)
+    assert error is None
+    pairs.append((unsorted_files[0], sorted_files[0],
+                  tmpdir.join('same.csv').strpath))
+    summary_path = tmpdir.join('summary.json').strpath
+
+    summary, error = batch.compare_batch(pairs, summary_path, settings, 'key',
+                                         processes)
+    assert error is None
+    assert summary[const.FAILED] == 0
+    assert summary[const.TOTAL] == {
+        const.ROWS_IN_BOTH: 700, const.ROWS_ONLY_FIRST: 200,
+        const.ROWS_ONLY_SECOND: 200, const.ROWS_CHANGED: 56,
+    }
+    assert [x[const.OUTPUT_FILE] for x in summary[const.PAIRS]] == \
+        [x[2] for x in pairs]
+
+    expected = tmpdir.join('expected.csv').strpath
+    engines.compare_files(sorted_files, expected, settings, 'key')
+    data = [utils.load_data(x)[0] for x in (expected, pairs[0][2],
+                                            pairs[1][2])]
+    assert data[0][0] == data[1][0] == data[2][0]
+    assert sorted(data[0][1:]) == sorted(data[1][1:]) == sorted(data[2][1:])
+
+
+def test_load_manifest(tmpdir, sorted_files):
+    path = tmpdir.join('manifest.csv')
+    path.write('first_file,second_file,output_file\n'
+               f'{sorted_files[0]},{sorted_files[1]},out.csv\n'
+               f'{sorted_files[0]},{sorted_files[1]},\n')
+    assert batch.load_manifest(path.strpath, 'reports') == ([
+        (sorted_files[0], sorted_files[1], 'out.csv'),
+        (sorted_files[0], sorted_files[1], 'reports/sorted_2.csv.report.csv'),
+    ], None)
+
+    res = batch.load_manifest(tmpdir.join('absent.csv').strpath, '')
+    assert res[0] is None
+
+
+def test_get_pairs_same_names(tmpdir):
+    paths = [tmpdir.join('a', 'test.csv').strpath,
+             tmpdir.join('b', 'c', 'test.csv').strpath]
+    pairs, error = batch.get_pairs('base.csv', paths, 'reports')
+    assert error is None
+    assert [x[2] for x in pairs] == [
+        'reports/a_test.csv.report.csv', 'reports/b_c_test.csv.report.csv'
+    ]
+
+    res = batch.get_pairs('base.csv', [paths[0], paths[0]], 'reports')
+    assert res[0] is None
+    assert res[1].startswith(const.GET_PAIRS)
+    assert const.ERROR_REPORT_NAMES in res[1]
+
+    path = tmpdir.join('manifest.csv')
+    path.write('first_file,second_file,output_file\n'
+               f'base.csv,{paths[0]},\nbase.csv,{paths[1]},\n'
+               f'base.csv,{paths[0]},out.csv\n')
+    assert batch.load_manifest(path.strpath, 'reports')[0] == [
+        ('base.csv', paths[0], 'reports/a_test.csv.report.csv'),
+        ('base.csv', paths[1], 'reports/b_c_test.csv.report.csv'),
+        ('base.csv', paths[0], 'out.csv'),
+    ]
+
+
+def test_compare_batch_error(tmpdir, sorted_files):
+    pairs, _ = batch.get_pairs(sorted_files[0],
+                               [tmpdir.join('absent.csv').strpath],
+                               tmpdir.strpath)
+    summary, error = batch.compare_batch(
+        pairs, tmpdir.join('summary.json').strpath, conftest.SETTINGS_REPORT,
+        'key', 1
+    )
+    assert error is None
+    assert summary[const.FAILED] == 1
+    assert summary[const.PAIRS][0][const.ERROR].startswith(const.COMPARE_PAIR)
@@ -0,0 +1,58 @@
+import pytest
+
+import changes
+import utils
+import const
+
+
+def load_dict(path):
+    data, error = utils.load_data(path)
+    assert error is None
+    return data[0], utils.convert_csv_to_dict(data, 'key', None)[0]
+
+
+@pytest.mark.parametrize('name', ['changes.jsonl', 'changes.csv',
+                                  'changes.jsonl.gz'])
+def test_save_apply_changes(tmpdir, sorted_files, name):
+    output = tmpdir.join(name).strpath
+    rebuilt = tmpdir.join('rebuilt.csv').strpath
+
+    res = changes.save_changes(sorted_files, output, 'key')
+    assert res == ({const.INSERT: 100, const.UPDATE: 200,
+                    const.DELETE: 100}, None)
+    assert changes.apply_changes(sorted_files[0], output, rebuilt,
+                                 'key') is None
+    assert load_dict(rebuilt) == load_dict(sorted_files[1])
+
+
+def test_iter_changes():
+    dicts = [{'1': {'key': '1', 'a': 'x', 'b': 'y'},
+              '2': {'key': '2', 'a': 'x', 'b': 'y'},
+              '3': {'key': '3', 'a': 'x', 'b': 'y'}},
+             {'1': {'key': '1', 'a': 'x', 'c': 'y'},
+              '3': {'key': '3', 'a': 'z', 'c': ''},
+              '4': {'key': '4', 'a': 'w', 'c': ''}}]
+    res = list(changes.iter_changes(dicts, [['key', 'a', 'b'],
+                                            ['key', 'a', 'c']], 'key'))
+    assert res == [
+        {'op': 'header', 'record': ['key', 'a', 'c']},
+        {'op': 'update', 'key': '1',
+         'changes': {'b': ['y', None], 'c': [None, 'y']}},
+        {'op': 'delete', 'key': '2',
+         'record': {'key': '2', 'a': 'x', 'b': 'y'}},
+        {'op': 'update', 'key': '3',
+         'changes': {'a': ['x', 'z'], 'b': ['y', None], 'c': [None, '']}},
+        {'op': 'insert', 'key': '4',
+         'record': {'key': '4', 'a': 'w', 'c': ''}},
+    ]
+    assert changes.change_to_rows(res[3]) == [
+        ['update', '3', 'a', 'x', 'z'], ['update', '3', 'b', 'y', None],
+        ['update', '3', 'c', None, '']
+    ]
+
+
+def test_apply_changes_error(tmpdir, sorted_files):
+    res = changes.apply_changes(sorted_files[0],
+                                tmpdir.join('absent.jsonl').strpath,
+                                tmpdir.join('output.csv').strpath, 'key')
+    assert res.startswith(const.APPLY_CHANGES)
@@ -0,0 +1,82 @@
+import os
+
+import pytest
+
+import checkpoint
+import conftest
+import engines
+import utils
+import const
+
+
+def load_report(path):
+    data, error = utils.load_data(path)
+    assert error is None
+    return data[0], sorted(data[1:])
+
+
+def test_compare_files_resumable(tmpdir, unsorted_files, monkeypatch):
+    settings = conftest.SETTINGS_REPORT
+    expected = tmpdir.join('expected.csv').strpath
+    output = tmpdir.join('output.csv').strpath
+    engines.compare_files(unsorted_files, expected, settings, 'key',
+                          engine=const.ENGINE_MEMORY)
+
+    compare_partitions = engines.compare_partitions
+    tasks = []
+    is_stopped = [False]
+
+    def compare_with_error(task):
+        tasks.append(task)
+        if len(tasks) == 5 and not is_stopped[0]:
+            is_stopped[0] = True
+            raise MemoryError('stopped')
+        return compare_partitions(task)
+
+    monkeypatch.setattr(engines, 'compare_partitions', compare_with_error)
+    plan, error = checkpoint.compare_files_resumable(unsorted_files, output,
+                                                     settings, 'key')
+    assert error.endswith('stopped')
+    assert plan[const.PARTITIONS] == const.MIN_CHECKPOINT_PARTITIONS
+    res = checkpoint.load_checkpoint(output)
+    assert res[const.DONE] == 4
+    assert res[const.OFFSET] == os.path.getsize(output)
+
+    tasks.clear()
+    with open(output, 'a') as my_file:
+        my_file.write('part of row')
+    plan, error = checkpoint.compare_files_resumable(unsorted_files, output,
+                                                     settings, 'key')
+    assert error is None
+    assert plan[const.REASON] == 'resumed from partition 4'
+    assert len(tasks) == const.MIN_CHECKPOINT_PARTITIONS - 4
+    assert load_report(output) == load_report(expected)
+    assert checkpoint.load_checkpoint(output) is None
+    assert not os.path.exists(f'{output}{const.PARTS_EXTENSION}')
+
+
+def test_compare_files_resumable_changed(tmpdir, unsorted_files,
+                                         monkeypatch):
+    settings = conftest.SETTINGS_REPORT
+    output = tmpdir.join('output.csv').strpath
+    monkeypatch.setattr(engines, 'compare_partitions', None)
+    _, error = checkpoint.compare_files_resumable(unsorted_files, output,
+                                                  settings, 'key')
+    assert error is not None
+    assert checkpoint.load_checkpoint(output)[const.DONE] == 0
+
+    monkeypatch.undo()
+    plan, error = checkpoint.compare_files_resumable(
+        unsorted_files, output, dict(settings, items=0), 'key'
+    )
+    assert error is None
+    assert not plan[const.REASON].startswith('resumed')
+
+
+@pytest.mark.parametrize('name', ['output.csv.gz', 'output.parquet'])
+def test_compare_files_resumable_error(tmpdir, unsorted_files, name):
+    _, error = checkpoint.compare_files_resumable(
+        unsorted_files, tmpdir.join(name).strpath,
+        conftest.SETTINGS_REPORT, 'key'
+    )
+    assert error.endswith(const.ERROR_CHECKPOINT_FORMAT)
@@ -0,0 +1,127 @@
+import json
+
+import cli
+import conftest
+import const
+import utils
+
+
+def test_equal(tmpdir, capsys):
+    file_1 = tmpdir.join('test_1.csv')
+    file_2 = tmpdir.join('test_2.csv')
+    file_1.write(conftest.FILE_DATA_1)
+    file_2.write(conftest.FILE_DATA_1)
+
+    assert cli.main([const.CLI_EQUAL, file_1.strpath, file_2.strpath,
+                     '-k', 'key_f']) == 0
+    assert capsys.readouterr().out.strip() == const.FILES_EQUAL
+
+    file_2.write('key_f,field_1,field_2,field_3\nkey_1,1,2,4\n')
+    assert cli.main([const.CLI_EQUAL, file_1.strpath, file_2.strpath,
+                     '-k', 'key_f', '-f', 'field_3']) == 1
+    assert capsys.readouterr().out.strip() == \
+        f'{const.FILES_DIFFERENT}key_1'
+
+
+def test_equal_error(tmpdir):
+    path = tmpdir.join('absent.csv').strpath
+    assert cli.main([const.CLI_EQUAL, path, path, '-k', 'key_f']) == 2
+
+
+def test_report(tmpdir, sorted_files):
+    output = tmpdir.join('output.csv')
+    assert cli.main([const.CLI_REPORT, *sorted_files, output.strpath,
+                     '-k', 'key', '--fields-1', 'a', '--fields-2', 'a',
+                     '--items', '0', '--values-different', '5',
+                     '--no-different-fields']) == 0
+    assert output.read().splitlines()[0] == 'key,a'
+    assert len(output.read().splitlines()) == 201 - 200 // 7
+
+
+def test_report_rules(tmpdir, sorted_files):
+    output = tmpdir.join('output.csv')
+    assert cli.main([const.CLI_REPORT, *sorted_files, output.strpath,
+                     '-k', 'key', '--filter', 'key~0$', '--filter', 'a!=x',
+                     '--normalize', 'a=strip,thousands',
+                     '--normalize', 'key=upper']) == 0
+    lines = output.read().splitlines()
+    assert len(lines) == 21
+    assert all(x.startswith('K') and x.split(',')[0].endswith('0')
+               for x in lines[1:])
+
+    args = cli.create_parser().parse_args([
+        const.CLI_REPORT, 'a', 'b', 'c', '-k', 'key',
+        '--normalize', 'a=strip,lower', '--normalize', 'a=upper'
+    ])
+    assert cli.get_settings(args)[const.NORMALIZERS] == \
+        {'a': ['strip', 'lower', 'upper']}
+
+
+def test_find(unsorted_files, capsys):
+    assert cli.main([const.CLI_FIND, unsorted_files[1], 'k0105', 'k0399',
+                     '-k', 'key', '-f', 'c']) == 0
+    assert capsys.readouterr().out.splitlines() == \
+        ['key,c', 'k0105,0', 'k0399,4']
+    assert cli.main([const.CLI_FIND, unsorted_files[1], 'absent',
+                     '-k', 'key']) == 1
+
+
+def test_snapshots(tmpdir, unsorted_files, capsys):
+    output = tmpdir.join('report.csv').strpath
+    assert cli.main([const.CLI_FINGERPRINT, unsorted_files[0], '-k', 'key',
+                     '--buckets', '16']) == 0
+    assert cli.main([const.CLI_SNAPSHOTS, unsorted_files[0], unsorted_files[0],
+                     output, '-k', 'key']) == 0
+    assert cli.main([const.CLI_SNAPSHOTS, *unsorted_files, output,
+                     '-k', 'key']) == 2
+    assert const.ERROR_FINGERPRINT_BUCKETS in capsys.readouterr().err
+
+
+def test_append(tmpdir, unsorted_files):
+    output = tmpdir.join('report.csv').strpath
+    assert cli.main([const.CLI_APPEND, *unsorted_files, output,
+                     '-k', 'key']) == 0
+    assert cli.main([const.CLI_APPEND, *unsorted_files, output,
+                     '-k', 'key']) == 0
+    assert utils.load_data(output)[0] == [['key', 'different_fields', 'a']]
+
+
+def test_batch(tmpdir, sorted_files, unsorted_files):
+    summary = tmpdir.join('summary.json').strpath
+    assert cli.main([const.CLI_BATCH, summary, '-k', 'key',
+                     '--baseline', sorted_files[0],
+                     '--candidates', *unsorted_files,
+                     '--output-dir', tmpdir.strpath, '--processes', '1']) == 0
+    assert tmpdir.join('unsorted_1.csv.report.csv').check()
+    assert cli.main([const.CLI_BATCH, summary, '-k', 'key',
+                     '--manifest', tmpdir.join('absent.csv').strpath]) == 2
+
+
+def test_stats(tmpdir, sorted_files, capsys):
+    output = tmpdir.join('stats.json')
+    assert cli.main([const.CLI_STATS, *sorted_files, output.strpath,
+                     '-k', 'key', '--fields-1', 'a', '--fields-2', 'a']) == 1
+    statistics = json.loads(output.read())
+    assert statistics[const.ROWS_IN_BOTH] == 200
+    assert statistics[const.ROWS_CHANGED] == 28
+    assert statistics[const.DIFFERENT_FIELDS] == {'a': 28}
+    assert f'{const.ROWS_ONLY_FIRST}: 100' in capsys.readouterr().out
+
+    assert cli.main([const.CLI_STATS, sorted_files[0], sorted_files[0],
+                     output.strpath, '-k', 'key']) == 0
+    assert cli.main([const.CLI_STATS, sorted_files[0],
+                     tmpdir.join('absent.csv').strpath, output.strpath,
+                     '-k', 'key']) == 2
+    assert capsys.readouterr().err.startswith(const.COMPARE_STATISTICS)
+
+
+def test_changes(tmpdir, sorted_files, capsys):
+    output = tmpdir.join('changes.csv').strpath
+    rebuilt = tmpdir.join('rebuilt.csv').strpath
+    assert cli.main([const.CLI_CHANGES, *sorted_files, output,
+                     '-k', 'key']) == 1
+    assert 'update: 200' in capsys.readouterr().out
+    assert cli.main([const.CLI_APPLY, sorted_files[0], output, rebuilt,
+                     '-k', 'key']) == 0
+    assert cli.main([const.CLI_CHANGES, sorted_files[1], rebuilt, output,
+                     '-k', 'key']) == 0
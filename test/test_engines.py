@@ -0,0 +1,248 @@
+import pytest
+
+import conftest
+import engines
+import sorting
+import utils
+import const
+
+
+def load_report(path):
+    data, error = utils.load_data(path)
+    assert error is None
+    return data[0], sorted(data[1:])
+
+
+def test_plan_engine(sorted_files, unsorted_files):
+    settings = conftest.SETTINGS_REPORT
+
+    plan = engines.plan_engine(sorted_files, settings, 'key')
+    assert plan[const.ENGINE] == const.ENGINE_MEMORY
+    assert plan[const.SETTINGS][const.FIELDS] == [['key', 'a', 'b'],
+                                                  ['key', 'a', 'c']]
+
+    plan = engines.plan_engine(sorted_files, settings, 'key', 1000)
+    assert plan[const.ENGINE] == const.ENGINE_MERGE
+
+    plan = engines.plan_engine(unsorted_files, settings, 'key', 1000)
+    assert plan[const.ENGINE] == const.ENGINE_PARTITIONS
+    assert 1 < plan[const.PARTITIONS] <= const.MAX_PARTITIONS
+
+    plan = engines.plan_engine(unsorted_files, dict(settings, items=3),
+                               'key', 1000)
+    assert plan[const.ENGINE] == const.ENGINE_BLOOM
+    assert plan[const.KEYS] > 0
+    assert plan[const.ROWS] > 0
+
+
+def test_bloom_filter():
+    bloom = engines.BloomFilter(1000)
+    for number in range(1000):
+        bloom.add(f'key_{number}')
+    assert len(bloom) == 1000
+    assert all(f'key_{x}' in bloom for x in range(1000))
+    assert sum(f'other_{x}' in bloom for x in range(10000)) < 300
+
+
+@pytest.mark.parametrize('items', range(4))
+@pytest.mark.parametrize('engine', const.ENGINES)
+def test_compare_files(tmpdir, sorted_files, unsorted_files, items, engine):
+    if engine == const.ENGINE_BLOOM and items not in (2, 3):
+        pytest.skip('Bloom filter is used only for items from one file')
+
+    settings = dict(conftest.SETTINGS_REPORT, items=items)
+    expected = tmpdir.join('expected.csv').strpath
+    output = tmpdir.join('output.csv').strpath
+
+    plan, error = engines.compare_files(sorted_files, expected, settings,
+                                        'key', engine=const.ENGINE_MEMORY)
+    assert error is None
+    assert plan[const.ENGINE] == const.ENGINE_MEMORY
+
+    files = sorted_files if engine == const.ENGINE_MERGE else unsorted_files
+    plan, error = engines.compare_files(files, output, settings, 'key', 1000,
+                                        engine=engine)
+    assert error is None
+    assert plan[const.ENGINE] == engine
+    assert load_report(output) == load_report(expected)
+
+
+def test_compare_files_processes(tmpdir, unsorted_files):
+    settings = conftest.SETTINGS_REPORT
+    expected = tmpdir.join('expected.csv').strpath
+    output = tmpdir.join('output.csv').strpath
+    engines.compare_files(unsorted_files, expected, settings, 'key',
+                          engine=const.ENGINE_MEMORY)
+
+    plan, error = engines.compare_files(unsorted_files, output, settings,
+                                        'key', 200000, processes=2)
+    assert error is None
+    assert plan[const.ENGINE] == const.ENGINE_PARTITIONS
+    assert plan[const.PROCESSES] == 2
+    assert plan[const.PARTITIONS] > engines.plan_engine(
+        unsorted_files, settings, 'key', 200000
+    )[const.PARTITIONS]
+    assert load_report(output) == load_report(expected)
+
+
+@pytest.mark.parametrize('items', range(4))
+def test_compare_files_sqlite(tmpdir, unsorted_files, items):
+    settings = dict(conftest.SETTINGS_REPORT, items=items)
+    expected = tmpdir.join('expected.csv').strpath
+    output = tmpdir.join('output.sqlite').strpath
+    engines.compare_files(unsorted_files, expected, settings, 'key',
+                          engine=const.ENGINE_MEMORY)
+
+    plan, error = engines.compare_files(unsorted_files, output, settings,
+                                        'key', engine=const.ENGINE_SQLITE)
+    assert error is None
+    assert plan[const.ENGINE] == const.ENGINE_SQLITE
+    data, error = utils.load_data(output)
+    assert error is None
+    assert data[1:] == sorted(data[1:])
+    assert (data[0], sorted(data[1:])) == load_report(expected)
+
+
+@pytest.mark.parametrize('engine', const.ENGINES)
+def test_compare_files_rules(tmpdir, sorted_files, engine):
+    settings = dict(conftest.SETTINGS_REPORT,
+                    items=2 if engine == const.ENGINE_BLOOM else 1,
+                    filters=['key~[05]$'], normalizers={'a': ['thousands']})
+    expected = tmpdir.join('expected.csv').strpath
+    output = tmpdir.join('output.csv').strpath
+    engines.compare_files(sorted_files, expected, dict(
+        settings, filters=[], normalizers={}
+    ), 'key', engine=const.ENGINE_MEMORY)
+
+    _, error = engines.compare_files(sorted_files, output, settings, 'key',
+                                     engine=engine)
+    assert error is None
+    header, rows = load_report(output)
+    assert header == load_report(expected)[0]
+    assert rows == [x for x in load_report(expected)[1]
+                    if x[0][-1] in '05']
+
+
+def test_compare_files_not_sorted(tmpdir, unsorted_files):
+    output = tmpdir.join('output.csv')
+    _, error = engines.compare_files(
+        unsorted_files, output.strpath, conftest.SETTINGS_REPORT, 'key',
+        engine=const.ENGINE_MERGE
+    )
+    assert error.startswith(const.COMPARE_FILES)
+    assert const.ERROR_NOT_SORTED in error
+    assert not output.exists()
+
+
+def test_compare_files_partly_sorted(tmpdir, sorted_files):
+    path = tmpdir.join('partly_sorted.csv')
+    path.write('key,a,b\n' + ''.join(
+        f'k{x if x < 1200 else 2700 - x:04},{x},{x % 3}\n'
+        for x in range(1500)
+    ))
+    paths = [path.strpath, sorted_files[1]]
+    expected = tmpdir.join('expected.csv').strpath
+    output = tmpdir.join('output.csv').strpath
+    engines.compare_files(paths, expected, conftest.SETTINGS_REPORT, 'key',
+                          engine=const.ENGINE_MEMORY)
+
+    plan, error = engines.compare_files(paths, output,
+                                        conftest.SETTINGS_REPORT, 'key', 1000)
+    assert error is None
+    assert plan[const.ENGINE] == const.ENGINE_PARTITIONS
+    assert load_report(output) == load_report(expected)
+
+
+@pytest.fixture()
+def case_files(tmpdir):
+    paths = [tmpdir.join('case_1.csv').strpath,
+             tmpdir.join('case_2.csv').strpath]
+    for path, text in zip(paths, ['key,a\nA,1\nB,2\na,3\nb,4\n',
+                                  'key,a\na,3\nb,5\nc,6\n']):
+        with open(path, 'w') as open_file:
+            open_file.write(text)
+        sorting.save_marker(path, 'key')
+    return paths
+
+
+def test_compare_files_normalized_key(tmpdir, case_files):
+    settings = dict(conftest.SETTINGS_REPORT, fields=[['key', 'a'],
+                                                      ['key', 'a']])
+    plan = engines.plan_engine(case_files, settings, 'key', 1)
+    assert plan[const.ENGINE] == const.ENGINE_MERGE
+
+    settings = dict(settings, normalizers={'key': ['lower']})
+    plan = engines.plan_engine(case_files, settings, 'key', 1)
+    assert plan[const.ENGINE] == const.ENGINE_PARTITIONS
+
+    output = tmpdir.join('output.csv').strpath
+    plan, error = engines.compare_files(case_files, output, settings, 'key', 1)
+    assert error is None
+    assert plan[const.ENGINE] == const.ENGINE_PARTITIONS
+    assert load_report(output) == (['key', 'different_fields', 'a'], [
+        ['a', '', ' '], ['b', 'a', '4 / 5'], ['c', '', '6']
+    ])
+
+
+@pytest.mark.parametrize('engine', [const.ENGINE_MEMORY,
+                                    const.ENGINE_PARTITIONS,
+                                    const.ENGINE_SQLITE])
+def test_compare_files_equal_normalized_keys(tmpdir, case_files, engine):
+    settings = dict(conftest.SETTINGS_REPORT, fields=[['key', 'a'],
+                                                      ['key', 'a']],
+                    normalizers={'key': ['lower']})
+    output = tmpdir.join('output.csv').strpath
+    _, error = engines.compare_files(case_files, output, settings, 'key',
+                                     engine=engine)
+    assert error is None
+    assert load_report(output)[1] == [['a', '', ' '], ['b', 'a', '4 / 5'],
+                                      ['c', '', '6']]
+
+
+@pytest.mark.parametrize('extension', const.COLUMNAR_FORMATS)
+def test_sample_file_columnar(tmpdir, sorted_files, extension):
+    pytest.importorskip('pyarrow')
+    path = tmpdir.join(f'test{extension}').strpath
+    data, _ = utils.load_data(sorted_files[0])
+    utils.save_data(path, data)
+
+    res = engines.sample_file(path, 'key', 10)
+    assert res == {const.HEADER: ['key', 'a', 'b'], const.ROWS: 300,
+                   const.UNIQUE_KEYS: 1, const.IS_SORTED: False}
+    with pytest.raises(ValueError):
+        engines.sample_file(path, 'absent')
+
+
+@pytest.mark.parametrize('items', [2, 3])
+def test_compare_files_bloom_repeated_keys(tmpdir, items):
+    paths = [tmpdir.join('a.csv'), tmpdir.join('b.csv')]
+    paths[0].write('key,a\nk1,1\nk2,2\nk3,1\nk2,3\n')
+    paths[1].write('key,a\nk3,1\nk4,4\nk4,5\nk1,1\n')
+    paths = [x.strpath for x in paths]
+    settings = dict(conftest.SETTINGS_REPORT, items=items,
+                    fields=[['key', 'a'], ['key', 'a']])
+    expected = tmpdir.join('expected.csv').strpath
+    output = tmpdir.join('output.csv').strpath
+    engines.compare_files(paths, expected, settings, 'key',
+                          engine=const.ENGINE_MEMORY)
+
+    _, error = engines.compare_files(paths, output, settings, 'key',
+                                     engine=const.ENGINE_BLOOM)
+    assert error is None
+    assert load_report(output) == load_report(expected)
+    assert len(load_report(output)[1]) == 1
+
+
+def test_bloom_false_positives(tmpdir, unsorted_files, monkeypatch):
+    settings = dict(conftest.SETTINGS_REPORT, items=2)
+    expected = tmpdir.join('expected.csv').strpath
+    output = tmpdir.join('output.csv').strpath
+    engines.compare_files(unsorted_files, expected, settings, 'key',
+                          engine=const.ENGINE_MEMORY)
+
+    monkeypatch.setattr(engines.BloomFilter, '__contains__',
+                        lambda self, key: True)
+    _, error = engines.compare_files(unsorted_files, output, settings, 'key',
+                                     engine=const.ENGINE_BLOOM)
+    assert error is None
+    assert load_report(output) == load_report(expected)
@@ -0,0 +1,101 @@
+import conftest
+import fingerprint
+import utils
+import const
+
+
+def load_report(path):
+    data, error = utils.load_data(path)
+    assert error is None
+    return data[0], sorted(data[1:])
+
+
+def test_build_fingerprint(sorted_files, unsorted_files):
+    assert fingerprint.build_fingerprint(sorted_files[0], 'key', 8) is None
+    res, error = fingerprint.load_fingerprint(sorted_files[0], 'key')
+    assert error is None
+    assert res[const.HEADER] == ['key', 'a', 'b']
+    assert [len(x) for x in res[const.TREE]] == [8, 4, 2, 1]
+
+    res_2, error = fingerprint.load_fingerprint(unsorted_files[0], 'key')
+    assert error is None
+    assert len(res_2[const.TREE][0]) == const.FINGERPRINT_BUCKETS
+
+    error = fingerprint.build_fingerprint(unsorted_files[0], 'key', 8)
+    res_2, _ = fingerprint.load_fingerprint(unsorted_files[0], 'key')
+    identity = [const.SIZE, const.MTIME, const.HASH]
+    assert {x: y for x, y in res_2.items() if x not in identity} == \
+        {x: y for x, y in res.items() if x not in identity}
+    assert fingerprint.get_different_buckets(
+        [sorted_files[0], unsorted_files[0]], [res, res_2], 'key',
+        [['key', 'a'], ['key', 'a']]
+    ) == set()
+    assert res[const.OFFSETS] is True
+    assert len(fingerprint.load_columns(sorted_files[0], [0, 2])[2]) == 8
+
+
+def test_compare_snapshots(tmpdir, unsorted_files):
+    settings = conftest.SETTINGS_REPORT
+    path = tmpdir.join('changed.csv')
+    with open(unsorted_files[0]) as open_file:
+        path.write(open_file.read().replace('k0005,5,', 'k0005,-5,'))
+    paths = [unsorted_files[0], path.strpath]
+    output = tmpdir.join('report.csv').strpath
+
+    res = fingerprint.compare_snapshots(paths, output, settings, 'key')
+    assert res == (1, None)
+    header, rows = load_report(output)
+    assert header == ['key', 'different_fields', 'a', 'b']
+    assert rows == [['k0005', 'a', '5 / -5', ' ']]
+
+    settings = dict(settings, fields=[['key', 'b'], ['key', 'b']])
+    res = fingerprint.compare_snapshots(paths, output, settings, 'key')
+    assert res == (0, None)
+    assert load_report(output) == (['key', 'different_fields', 'b'], [])
+
+
+def test_compare_snapshots_offsets(tmpdir, monkeypatch, unsorted_files):
+    path = tmpdir.join('changed.csv')
+    with open(unsorted_files[0]) as open_file:
+        path.write(open_file.read().replace('k0005,5,', 'k0005,-5,') +
+                   'k0009,9,1\nk0009,8,1\n')
+    paths = [unsorted_files[0], path.strpath]
+    output = tmpdir.join('report.csv').strpath
+
+    def fail(*args):
+        raise AssertionError(args)
+
+    monkeypatch.setattr(utils, 'iter_records', fail)
+    res = fingerprint.compare_snapshots(paths, output,
+                                        conftest.SETTINGS_REPORT, 'key')
+    assert res[1] is None
+    assert load_report(output)[1] == [['k0005', 'a', '5 / -5', ' '],
+                                      ['k0009', 'a, b', '9 / 8', '0 / 1']]
+
+
+def test_compare_snapshots_same_size(tmpdir, unsorted_files):
+    path = tmpdir.join('changed.csv')
+    with open(unsorted_files[0]) as open_file:
+        path.write(open_file.read() + 'k0005,5,2\n')
+    paths = [unsorted_files[0], path.strpath]
+    output = tmpdir.join('report.csv').strpath
+
+    res = fingerprint.compare_snapshots(paths, output,
+                                        conftest.SETTINGS_REPORT, 'key')
+    assert res == (0, None)
+
+    path.write(path.read().replace('k0005,5,2\n', 'k0005,7,2\n'))
+    res = fingerprint.compare_snapshots(paths, output,
+                                        conftest.SETTINGS_REPORT, 'key')
+    assert res == (1, None)
+    assert load_report(output)[1] == [['k0005', 'a', '5 / 7', ' ']]
+
+
+def test_compare_snapshots_error(tmpdir, unsorted_files):
+    output = tmpdir.join('report.csv').strpath
+    res = fingerprint.compare_snapshots(
+        [unsorted_files[0], tmpdir.join('absent.csv').strpath], output,
+        conftest.SETTINGS_REPORT, 'key'
+    )
+    assert res[0] is None
+    assert res[1].startswith(const.BUILD_FINGERPRINT)
@@ -0,0 +1,94 @@
+import conftest
+import incremental
+import utils
+import const
+
+
+def get_state(path, other_path, index):
+    return incremental.load_state(path, incremental.get_comparison(
+        other_path, 'key', conftest.SETTINGS_REPORT[const.FIELDS][index]
+    ))
+
+
+def test_compare_appended(tmpdir):
+    settings = conftest.SETTINGS_REPORT
+    file_1 = tmpdir.join('test_1.csv')
+    file_2 = tmpdir.join('test_2.csv')
+    output = tmpdir.join('report.csv').strpath
+    file_1.write('key,a\n1,x\n2,y\n')
+    file_2.write('key,a\n1,x\n2,z\n3,')
+    paths = [file_1.strpath, file_2.strpath]
+
+    assert incremental.compare_appended(paths, output, settings,
+                                        'key') == (2, None)
+    assert sorted(utils.load_data(output)[0][1:]) == [
+        ['1', '', ' '], ['2', 'a', 'y / z']
+    ]
+    state = get_state(file_2.strpath, file_1.strpath, 1)
+    assert state[const.SIZE] == 14
+    assert state[const.HEADER] == ['key', 'a']
+
+    file_1.write('4,w\n', mode='a')
+    file_2.write('w\n4,v\n', mode='a')
+    assert incremental.compare_appended(paths, output, settings,
+                                        'key') == (2, None)
+    assert sorted(utils.load_data(output)[0][1:]) == [
+        ['3', '', 'w'], ['4', 'a', 'w / v']
+    ]
+
+    file_1.write('key,a\n1,x\n2,y\n')
+    assert get_state(file_1.strpath, file_2.strpath, 0) is None
+    assert incremental.compare_appended(paths, output, settings,
+                                        'key') == (2, None)
+    assert sorted(utils.load_data(output)[0][1:]) == [
+        ['1', '', ' '], ['2', 'a', 'y / z']
+    ]
+
+
+def test_compare_appended_pairs(tmpdir):
+    settings = conftest.SETTINGS_REPORT
+    files = [tmpdir.join(f'test_{x}.csv') for x in range(3)]
+    output = tmpdir.join('report.csv').strpath
+    for item in files:
+        item.write('key,a\n1,x\n')
+    paths = [[files[0].strpath, files[1].strpath],
+             [files[0].strpath, files[2].strpath]]
+
+    for item in paths:
+        assert incremental.compare_appended(item, output, settings,
+                                            'key') == (1, None)
+
+    files[0].write('2,y\n', mode='a')
+    assert incremental.compare_appended(paths[0], output, settings,
+                                        'key') == (1, None)
+    assert incremental.compare_appended(paths[1], output, settings,
+                                        'key') == (1, None)
+    assert utils.load_data(output)[0][1:] == [['2', '', 'y']]
+    assert get_state(files[0].strpath, files[2].strpath, 0)[const.SIZE] == 14
+
+
+def test_compare_appended_multiline(tmpdir):
+    settings = conftest.SETTINGS_REPORT
+    file_1 = tmpdir.join('test_1.csv')
+    file_2 = tmpdir.join('test_2.csv')
+    output = tmpdir.join('report.csv').strpath
+    file_1.write('key,a\n1,"x\ny"\n')
+    file_2.write('key,a\n1,"x\n')
+    paths = [file_1.strpath, file_2.strpath]
+
+    assert incremental.compare_appended(paths, output, settings,
+                                        'key') == (1, None)
+    assert utils.load_data(output)[0][1:] == [['1', '', 'x\ny']]
+
+    file_2.write('z"\n', mode='a')
+    assert incremental.compare_appended(paths, output, settings,
+                                        'key') == (1, None)
+    assert utils.load_data(output)[0][1:] == [['1', 'a', 'x\ny / x\nz']]
+
+
+def test_compare_appended_error(tmpdir):
+    path = tmpdir.join('test.csv.gz').strpath
+    utils.save_data(path, [['key'], ['a']])
+    res = incremental.compare_appended([path, path], path, {}, 'key')
+    assert res[0] is None
+    assert res[1].endswith(const.ERROR_APPEND_FORMAT)
@@ -0,0 +1,90 @@
+import os
+
+import key_index
+import utils
+import const
+
+
+def test_find_keys(tmpdir, unsorted_files):
+    assert key_index.build_index(unsorted_files[0], 'key') is None
+
+    with key_index.KeyIndex(unsorted_files[0]) as index:
+        assert len(index) == 300
+        assert index.is_actual('key')
+        assert not index.is_actual('a')
+        assert index.find(['k0005', 'k0299', 'absent'], ['key', 'b']) == {
+            'k0005': {'key': 'k0005', 'b': '2'},
+            'k0299': {'key': 'k0299', 'b': '2'},
+        }
+        assert list(index.find_range('k0010', 'k0012')) == \
+            ['k0010', 'k0011', 'k0012']
+
+    data, _ = utils.load_data(unsorted_files[0])
+    expected, _ = utils.convert_csv_to_dict(data, 'key', data[0])
+    res = key_index.find_keys(unsorted_files[0], 'key', list(expected))
+    assert res == (expected, None)
+
+
+def test_find_keys_quoted(tmpdir):
+    path = tmpdir.join('quoted.csv')
+    path.write('key,text\r\nb,"line 1\r\nline ""2"""\r\na,"x,y"\r\nb,ok\r\n'
+               'c,last')
+    res = key_index.find_keys(path.strpath, 'key', ['a', 'b', 'c'])
+    assert res == ({'a': {'key': 'a', 'text': 'x,y'},
+                    'b': {'key': 'b', 'text': 'ok'},
+                    'c': {'key': 'c', 'text': 'last'}}, None)
+
+    path.write('key,text\nd,"new\nline"\n')
+    res = key_index.find_keys(path.strpath, 'key', ['a', 'd'])
+    assert res == ({'d': {'key': 'd', 'text': 'new\nline'}}, None)
+
+
+def test_iter_offsets_complete(tmpdir):
+    path = tmpdir.join('test.csv')
+    path.write_binary(b'key,a\n1,"x\ny"\n2,z')
+    assert list(key_index.iter_offsets(path.strpath, 6, True)) == [
+        (6, ['1', 'x\ny'], 14)
+    ]
+    assert list(key_index.iter_offsets(path.strpath, 6))[-1] == \
+        (14, ['2', 'z'], 17)
+
+    path.write_binary(b'key,a\n1,"x\n')
+    assert list(key_index.iter_offsets(path.strpath, 6, True)) == []
+
+
+def test_build_index_runs(tmpdir, unsorted_files):
+    path = tmpdir.join('repeated.csv')
+    with open(unsorted_files[0]) as open_file:
+        lines = open_file.readlines()
+    path.write(''.join(lines) + 'k0007,new,1\nk0000,new,2\n')
+    assert key_index.build_index(path.strpath, 'key', 7) is None
+
+    with key_index.KeyIndex(path.strpath) as index:
+        assert len(index) == 300
+        assert list(index) == sorted(index)
+        assert index.find(['k0000', 'k0007', 'k0008'], ['a']) == {
+            'k0000': {'a': 'new'}, 'k0007': {'a': 'new'}, 'k0008': {'a': '8'},
+        }
+
+    stat = os.stat(path.strpath)
+    path.write(path.read().replace('k0007,new', 'k0007,old'))
+    os.utime(path.strpath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+    with key_index.KeyIndex(path.strpath) as index:
+        assert not index.is_actual('key')
+    res = key_index.find_keys(path.strpath, 'key', ['k0007'], ['a'])
+    assert res == ({'k0007': {'a': 'old'}}, None)
+
+    tmpdir.join('repeated.csv.idx').write_binary(b'CSVIDX1\n')
+    res = key_index.find_keys(path.strpath, 'key', ['k0000'], ['a'])
+    assert res == ({'k0000': {'a': 'new'}}, None)
+
+
+def test_build_index_error(tmpdir):
+    path = tmpdir.join('test.csv.gz').strpath
+    utils.save_data(path, [['key'], ['a']])
+    assert key_index.build_index(path, 'key').endswith(
+        const.ERROR_INDEX_FORMAT
+    )
+    res = key_index.find_keys(path, 'key', ['a'])
+    assert res[0] is None
+    assert res[1].startswith(const.BUILD_INDEX)
@@ -0,0 +1,51 @@
+import pytest
+
+import pipeline
+
+
+def iter_items(count, error=None):
+    yield from range(count)
+    if error is not None:
+        raise error
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 1000])
+def test_thread_stage(chunk_size):
+    stage = pipeline.ThreadStage(iter_items(100), chunk_size, 2)
+    assert list(stage) == list(range(100))
+    assert not stage.thread.is_alive()
+
+
+def test_thread_stage_error():
+    stage = pipeline.ThreadStage(iter_items(10, KeyError('key')), 3)
+    with pytest.raises(KeyError):
+        list(stage)
+
+
+def test_thread_stage_early_close():
+    stage = pipeline.ThreadStage(iter_items(100000), 10, 2)
+    items = iter(stage)
+    assert next(items) == 0
+    items.close()
+    assert not stage.thread.is_alive()
+
+
+def test_thread_stage_close_iterable():
+    closed = []
+
+    def iter_closed():
+        try:
+            yield from range(100000)
+        finally:
+            closed.append(True)
+
+    with pipeline.ThreadStage(iter_closed(), 10, 2) as stage:
+        assert next(iter(stage)) == 0
+    assert not stage.thread.is_alive()
+    assert closed == [True]
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_iter_in_processes(processes):
+    res = pipeline.iter_in_processes(str, range(50), processes, 4)
+    assert list(res) == [str(x) for x in range(50)]
@@ -0,0 +1,131 @@
+import asyncio
+import os
+import stat
+import threading
+
+import pytest
+
+import conftest
+import engines
+import service
+import utils
+import const
+
+
+@pytest.fixture()
+def compare_service(tmpdir):
+    compare_service = service.CompareService(2, root=tmpdir.strpath)
+    loop = asyncio.new_event_loop()
+    path = tmpdir.join('service.sock').strpath
+    server = loop.run_until_complete(compare_service.start(path))
+    thread = threading.Thread(target=loop.run_forever)
+    thread.start()
+    yield compare_service, path
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    server.close()
+    loop.run_until_complete(server.wait_closed())
+    loop.close()
+    compare_service.close()
+
+
+def test_send_job(tmpdir, sorted_files, compare_service):
+    compare_service, path = compare_service
+    job = {const.PATHS: sorted_files, const.KEY: 'key',
+           const.SETTINGS: conftest.SETTINGS_REPORT}
+    expected = tmpdir.join('expected.csv').strpath
+    engines.compare_files(sorted_files, expected, conftest.SETTINGS_REPORT,
+                          'key')
+    expected = utils.load_data(expected)[0]
+
+    res, error = service.send_job(job, path)
+    assert error is None
+    assert res[0] == expected[0]
+    assert sorted([['' if x is None else x for x in row]
+                   for row in res[1:]]) == sorted(expected[1:])
+    assert len(compare_service.datasets) == 2
+    assert len(compare_service.reports) == 1
+
+    res, error = service.send_job(dict(job, settings=dict(
+        conftest.SETTINGS_REPORT, items=2
+    )), path)
+    assert error is None
+    assert len(res) == 101
+    assert len(compare_service.datasets) == 2
+    assert len(compare_service.reports) == 2
+
+    output = tmpdir.join('report.csv').strpath
+    res = service.send_job(dict(job, output_file=output), path)
+    assert res == ([], None)
+    assert utils.load_data(output)[0][0] == expected[0]
+
+
+def test_send_job_error(tmpdir, compare_service):
+    _, path = compare_service
+    res, error = service.send_job({const.PATHS: [], const.KEY: 'key'}, path)
+    assert res == []
+    assert error.startswith(const.RUN_JOB)
+
+    res, error = service.send_job({}, tmpdir.join('absent.sock').strpath)
+    assert error.startswith(const.SEND_JOB)
+
+
+def test_send_job_outside_root(tmpdir, sorted_files, compare_service):
+    _, path = compare_service
+    assert stat.S_IMODE(os.stat(path).st_mode) == const.SOCKET_MODE
+
+    link = tmpdir.join('link.csv')
+    link.mksymlinkto(os.devnull)
+    job = {const.PATHS: [sorted_files[0], link.strpath], const.KEY: 'key'}
+    res, error = service.send_job(job, path)
+    assert res == []
+    assert error.startswith(const.RUN_JOB)
+    assert const.ERROR_OUTSIDE_ROOT in error
+
+    output = tmpdir.join('..', 'report.csv').strpath
+    res, error = service.send_job(dict(job, paths=sorted_files,
+                                       output_file=output), path)
+    assert const.ERROR_OUTSIDE_ROOT in error
+    assert not os.path.exists(output)
+
+
+def test_send_job_token(tmpdir, sorted_files):
+    token_service = service.CompareService(1, root=tmpdir.strpath)
+    loop = asyncio.new_event_loop()
+    with pytest.raises(ValueError, match=const.ERROR_SERVICE_TOKEN):
+        loop.run_until_complete(token_service.start(port=0))
+
+    token_service.token = 'secret'
+    server = loop.run_until_complete(token_service.start(port=0))
+    port = server.sockets[0].getsockname()[1]
+    thread = threading.Thread(target=loop.run_forever)
+    thread.start()
+    try:
+        job = {const.PATHS: sorted_files, const.KEY: 'key',
+               const.SETTINGS: conftest.SETTINGS_REPORT}
+        res, error = service.send_job(job, port=port)
+        assert res == []
+        assert const.ERROR_TOKEN in error
+
+        res, error = service.send_job(job, port=port, token='wrong')
+        assert const.ERROR_TOKEN in error
+
+        res, error = service.send_job(job, port=port, token='secret')
+        assert error is None
+        assert res[0][0] == 'key'
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+        loop.close()
+        token_service.close()
+
+
+def test_dataset_cache():
+    cache = service.DatasetCache(5)
+    cache.append('a', (['key', 'a'], {'1': {'key': '1', 'a': '2'}}))
+    cache.append('b', (['key', 'a'], {'2': {'key': '2', 'a': '2'}}))
+    assert cache.size == 4
+    cache.append('c', (['key', 'a'], {'3': {'key': '3', 'a': '2'}}))
+    assert list(cache.data) == ['b', 'c']
@@ -0,0 +1,52 @@
+import json
+import os
+
+import pytest
+
+import engines
+import sorting
+import utils
+import const
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_sort_file(tmpdir, unsorted_files, processes, monkeypatch):
+    monkeypatch.setattr(const, 'MAX_MERGE_RUNS', 3)
+    output = tmpdir.join('sorted.csv.gz').strpath
+    tmpdir.join('quoted.csv').write(
+        'key,text\nb,"line 1\nline 2"\na,"x,y"\nb,second\n'
+    )
+
+    assert sorting.sort_file(unsorted_files[0], output, 'key', 7,
+                             processes) is None
+    data, error = utils.load_data(output)
+    assert error is None
+    assert data[0] == ['key', 'a', 'b']
+    assert data[1:] == sorted(data[1:])
+    assert len(data) == 301
+    assert sorting.is_sorted_by(output, 'key')
+    assert not sorting.is_sorted_by(output, 'a')
+    assert not sorting.is_sorted_by(unsorted_files[0], 'key')
+
+    output = tmpdir.join('quoted_sorted.csv').strpath
+    assert sorting.sort_file(tmpdir.join('quoted.csv').strpath, output,
+                             'key', 2, processes) is None
+    assert utils.load_data(output) == (
+        [['key', 'text'], ['a', 'x,y'], ['b', 'line 1\nline 2'],
+         ['b', 'second']], None
+    )
+
+
+def test_sort_file_error(tmpdir, unsorted_files):
+    error = sorting.sort_file(unsorted_files[0],
+                              tmpdir.join('sorted.csv').strpath, 'absent')
+    assert error.startswith(const.SORT_FILE)
+
+
+def test_sorted_marker_in_plan(unsorted_files):
+    assert not engines.sample_file(unsorted_files[0], 'key')[const.IS_SORTED]
+
+    with open(sorting.get_marker_path(unsorted_files[0]), 'w') as my_file:
+        json.dump({const.KEY: 'key',
+                   const.SIZE: os.path.getsize(unsorted_files[0])}, my_file)
+    assert engines.sample_file(unsorted_files[0], 'key')[const.IS_SORTED]
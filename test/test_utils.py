@@ -1,6 +1,10 @@
+import json
+import re
+
 import pytest
 
 import conftest
+import pipeline
 import utils
 import const
 
@@ -227,3 +231,451 @@ def test_dict_to_table(value):
     assert res[0] == value[2][0]
     for item in res[1:]:
         assert item in value[2]
+
+
+@pytest.mark.parametrize('value', conftest.values_for_generate_statistics)
+def test_generate_statistics(value):
+    res = utils.generate_statistics(value[0], value[1], value[2])
+    assert res == value[3]
+
+
+def test_generate_statistics_wrong_input():
+    assert utils.generate_statistics(None, {}, 'key') is None
+
+
+def test_save_statistics(tmpdir):
+    file_name = tmpdir.join('test.json')
+    statistics = conftest.values_for_generate_statistics[0][3]
+    assert utils.save_statistics(file_name.strpath, statistics) is None
+    assert json.loads(file_name.read()) == statistics
+
+
+@pytest.mark.parametrize('value', conftest.values_for_is_equal_files)
+def test_is_equal_files(tmpdir, value):
+    file_1 = tmpdir.join('test_1.csv')
+    file_2 = tmpdir.join('test_2.csv')
+    file_1.write(value[0])
+    file_2.write(value[1])
+    res = utils.is_equal_files([file_1.strpath, file_2.strpath], 'key_f',
+                               value[2])
+    assert res == value[3]
+
+
+def test_is_equal_files_error(tmpdir):
+    res = utils.is_equal_files([tmpdir.join('absent.csv').strpath,
+                                tmpdir.join('absent.csv').strpath],
+                               'key_f', None)
+    assert res[0] is None
+    assert res[2].startswith(const.EQUAL_FILES)
+
+
+@pytest.mark.parametrize('extension', [const.GZIP, const.BZIP2, const.XZ])
+def test_save_load_compressed_data(tmpdir, extension):
+    file_name = tmpdir.join(f'test.csv{extension}').strpath
+    assert utils.save_data(file_name, conftest.CSV_DATA_1) is None
+    res, error = utils.load_data(file_name)
+    assert error is None
+    assert res == [[str(x) if x is not None else '' for x in row]
+                   for row in conftest.CSV_DATA_1]
+
+
+def test_save_load_zstd_data(tmpdir):
+    pytest.importorskip('zstandard')
+    test_save_load_compressed_data(tmpdir, const.ZSTD)
+
+
+def test_thread_reader_early_close(tmpdir):
+    file_name = tmpdir.join('test.csv.gz').strpath
+    utils.save_data(file_name, [['key', str(x)] for x in range(100000)])
+    thread_reader = pipeline.ThreadReader(utils.open_binary_file(
+        file_name, 'rb', const.GZIP), chunk_size=16)
+    assert thread_reader.read(4) == b'key,'
+    thread_reader.close()
+    assert thread_reader.closed
+    assert not thread_reader.stage.thread.is_alive()
+
+
+@pytest.mark.parametrize('extension', const.COLUMNAR_FORMATS)
+def test_save_load_columnar_data(tmpdir, extension):
+    pytest.importorskip('pyarrow')
+    file_name = tmpdir.join(f'test{extension}').strpath
+    assert utils.save_data(file_name, conftest.CSV_DATA_2) is None
+
+    res, error = utils.load_data(file_name)
+    assert error is None
+    assert res == [[str(x) if x is not None else '' for x in row]
+                   for row in conftest.CSV_DATA_2]
+
+    res, error = utils.load_data(file_name, ['second', 'key', 'absent'])
+    assert error is None
+    assert res == [['key', 'second'], ['key_1', '2'], ['key_2', ''],
+                   ['key_3', '']]
+
+
+@pytest.mark.parametrize('extension', const.COLUMNAR_FORMATS)
+def test_save_columnar_data_batches(tmpdir, extension):
+    pytest.importorskip('pyarrow')
+    file_name = tmpdir.join(f'test{extension}').strpath
+    rows = [['key', 'a']] + [[str(x), x] for x in range(10)]
+    utils.save_columnar_data(file_name, iter(rows), 3)
+
+    res, error = utils.load_data(file_name)
+    assert error is None
+    assert res == [[str(x) for x in row] for row in rows]
+
+
+def test_save_load_sqlite_data(tmpdir):
+    file_name = tmpdir.join('test.sqlite').strpath
+    assert utils.save_data(file_name, iter(conftest.CSV_DATA_2)) is None
+    assert utils.save_data(file_name, conftest.CSV_DATA_2) is None
+
+    res, error = utils.load_data(file_name)
+    assert error is None
+    assert res == [[str(x) if x is not None else '' for x in row]
+                   for row in conftest.CSV_DATA_2]
+    assert utils.load_header(file_name) == (conftest.CSV_DATA_2[0], None)
+
+    res, error = utils.load_data(file_name, ['second', 'key', 'absent'])
+    assert error is None
+    assert res == [['key', 'second'], ['key_1', '2'], ['key_2', ''],
+                   ['key_3', '']]
+    assert utils.load_sqlite_data(file_name, ['key'], 1, 1) == \
+        [['key'], ['key_2']]
+
+
+def test_compile_rules():
+    assert sorted(utils.NORMALIZERS) == sorted(const.VARIANTS_NORMALIZERS)
+    assert utils.compile_rules(['key'], {const.FILTERS: []}) is None
+
+    apply_rules = utils.compile_rules(['key', 'region', 'sum'], {
+        const.FILTERS: ['region==eu', 'key!~^test'],
+        const.NORMALIZERS: {'region': ['strip', 'lower'],
+                            'sum': ['thousands'], 'absent': ['upper']},
+    })
+    assert apply_rules(['1', ' EU ', '1,234,567.5']) == \
+        ['1', 'eu', '1234567.5']
+    assert apply_rules(['2', 'US', '1 000']) is None
+    assert apply_rules(['test_3', 'EU', '10,00']) is None
+    assert apply_rules(['4', 'Eu', "12'345"]) == ['4', 'eu', '12345']
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('region==eu', ('region', '==', 'eu')),
+    ('name~a==b', ('name', '~', 'a==b')),
+    ('x==a~b', ('x', '==', 'a~b')),
+    ('key!~^test', ('key', '!~', '^test')),
+    ('a!=b!~c', ('a', '!=', 'b!~c')),
+    ('key~', ('key', '~', '')),
+])
+def test_parse_filter(text, expected):
+    assert utils.parse_filter(text) == expected
+
+
+@pytest.mark.parametrize('text', ['key', '==eu', '~a==b'])
+def test_parse_filter_error(text):
+    with pytest.raises(ValueError, match=re.escape(const.ERROR_FILTER)):
+        utils.parse_filter(text)
+
+
+@pytest.mark.parametrize('rules, message', [
+    ({const.FILTERS: ['key']}, const.ERROR_FILTER),
+    ({const.FILTERS: ['absent==1']}, const.ERROR_FILTER_FIELD),
+    ({const.NORMALIZERS: {'key': ['absent']}}, const.ERROR_NORMALIZER),
+])
+def test_compile_rules_error(rules, message):
+    with pytest.raises(ValueError, match=re.escape(message)):
+        utils.compile_rules(['key'], rules)
+
+
+@pytest.mark.parametrize('extension', ['.csv', '.csv.gz', '.sqlite'])
+def test_load_data_rules(tmpdir, extension):
+    file_name = tmpdir.join(f'test{extension}').strpath
+    utils.save_data(file_name, [['key', 'region', 'value'],
+                                ['1', 'EU', 'a'], ['2', 'US', 'b'],
+                                ['3', ' eu', 'c']])
+    rules = {const.FILTERS: ['region==eu'],
+             const.NORMALIZERS: {'region': ['strip', 'lower'],
+                                 'value': ['upper']}}
+
+    res, error = utils.load_data(file_name, ['key', 'value'], rules)
+    assert error is None
+    assert res == [['key', 'value'], ['1', 'A'], ['3', 'C']]
+    assert list(utils.iter_records(file_name, 'key', None, rules)) == [
+        ('1', {'key': '1', 'region': 'eu', 'value': 'A'}),
+        ('3', {'key': '3', 'region': 'eu', 'value': 'C'}),
+    ]
+
+    _, error = utils.load_data(file_name, None, {const.FILTERS: ['x']})
+    assert const.ERROR_FILTER in error
+
+
+def test_load_columnar_data_without_pyarrow(tmpdir, monkeypatch):
+    monkeypatch.setattr(utils, 'pyarrow', None)
+    res, error = utils.load_data(tmpdir.join('test.parquet').strpath)
+    assert res is None
+    assert error == f'{const.LOAD_DATA}{const.FAILED_ERROR}' \
+                    f'{const.ERROR_PYARROW}'
+
+
+def test_load_zstd_data_without_zstandard(tmpdir, monkeypatch):
+    monkeypatch.setattr(utils, 'zstandard', None)
+    file_name = tmpdir.join('test.csv.zst').strpath
+    error_zstandard = f'{const.LOAD_DATA}{const.FAILED_ERROR}' \
+                      f'{const.ERROR_ZSTANDARD}'
+    assert utils.load_data(file_name) == (None, error_zstandard)
+    assert utils.load_header(file_name) == (None, error_zstandard)
+
+
+def test_load_header(tmpdir):
+    file_name = tmpdir.join('test.csv.gz').strpath
+    utils.save_data(file_name, conftest.CSV_DATA_1)
+    assert utils.load_header(file_name) == (conftest.CSV_DATA_1[0], None)
+    assert utils.load_header('') == (None, None)
+    assert utils.load_header('test.txt') == (None, const.ERROR_READ_FILE)
+
+
+def test_load_data_columns(tmpdir):
+    file_name = tmpdir.join('test.csv')
+    file_name.write(conftest.FILE_DATA_2)
+    res = utils.load_data(file_name.strpath, ['fourth', 'key', 'absent'])
+    assert res == ([['key', 'fourth'], ['key_1', ''], ['key_2', ''],
+                    ['key_3', '']], None)
+
+
+def test_report_cache():
+    report_cache = utils.ReportCache(max_size=10)
+    settings = conftest.values_for_generate_report[0][1]
+    key_1 = report_cache.get_key(settings, 'key_f', [1, 1])
+    key_2 = report_cache.get_key(dict(reversed(list(settings.items()))),
+                                 'key_f', [1, 1])
+    key_3 = report_cache.get_key(settings, 'key_f', [1, 2])
+    assert key_1 == key_2
+    assert key_1 != key_3
+
+    report_cache.append(key_1, [['a', 'b'], ['c', 'd']])
+    report_cache.append(key_3, [['a', 'b', 'c']])
+    assert len(report_cache) == 2
+    assert report_cache.size == 7
+    assert report_cache.get(key_1) == [['a', 'b'], ['c', 'd']]
+
+    report_cache.append('key', [['a', 'b'], ['c', 'd']])
+    assert str(report_cache) == "ReportCache(len of 'data': 2, " \
+                                "'size': 8, 'max_size': 10)"
+    assert report_cache.get(key_3) is None
+    assert report_cache.get(key_1) is not None
+
+    report_cache.append('big', [list(range(11))])
+    assert report_cache.get('big') is None
+
+    report_cache.clear()
+    assert len(report_cache) == 0
+    assert report_cache.size == 0
+
+
+def test_cache_ring_buffer():
+    cache = utils.CacheData(max_count=3)
+    for index in range(10):
+        cache.append({'a': index, 'fields': ['x', 'y']})
+    assert len(cache) == 3
+    assert cache.count == 3
+    assert cache.data == [{'a': x, 'fields': ['x', 'y']} for x in (7, 8, 9)]
+    assert cache.entry(1)[0] == [const.DELTA_DICT, {'a': 8}, []]
+
+    assert cache.undo() == {'a': 8, 'fields': ['x', 'y']}
+    assert cache.undo() == {'a': 7, 'fields': ['x', 'y']}
+    assert cache.undo() is None
+    assert cache.redo() == {'a': 8, 'fields': ['x', 'y']}
+
+    cache.append({'b': 1})
+    assert cache.data == [{'a': 7, 'fields': ['x', 'y']},
+                          {'a': 8, 'fields': ['x', 'y']}, {'b': 1}]
+    assert cache.undo() == {'a': 8, 'fields': ['x', 'y']}
+    assert cache.get(0) == {'a': 7, 'fields': ['x', 'y']}
+    assert cache.get(3) is None
+
+
+def test_cache_get_from_current():
+    cache = utils.CacheData()
+    items = [{'a': x, 'b': x % 2} for x in range(6)]
+    for item in items:
+        cache.append(item)
+
+    cache.count = 3
+    assert cache.current == items[2]
+    assert [cache.get(x) for x in range(6)] == items
+    cache.count = 5
+    assert cache.current == items[4]
+    assert cache.redo() == items[5]
+    assert cache.data == items
+
+
+def test_cache_save_load(tmpdir):
+    file_name = tmpdir.join('history.json').strpath
+    cache = utils.CacheData()
+    for index in range(5):
+        cache.append({'a': index, 'b': index % 2})
+    cache.undo()
+    assert cache.save(file_name) is None
+
+    new_cache = utils.CacheData()
+    assert new_cache.load(file_name) is None
+    assert new_cache.data == cache.data
+    assert new_cache.count == 4
+    assert new_cache.redo() == {'a': 4, 'b': 0}
+
+    small_cache = utils.CacheData(max_count=2)
+    assert small_cache.load(file_name) is None
+    assert small_cache.data == cache.data[-2:]
+    assert small_cache.count == 1
+
+    assert utils.CacheData().load(tmpdir.join('absent').strpath) \
+        .startswith(const.LOAD_HISTORY)
+
+
+@pytest.mark.parametrize('value',
+                         conftest.values_for_create_small_dicts_aligned)
+def test_create_small_dicts_aligned(value):
+    res = utils.create_small_dicts(value[0], value[1])
+    assert [list(x) for x in res] == value[2]
+
+
+def test_create_small_dicts_without_only_keys():
+    class ReadDict(dict):
+        read = 0
+
+        def items(self):
+            for item in super().items():
+                self.read += 1
+                yield item
+
+    dicts = [ReadDict((str(x), {'key': str(x), 'a': '1'})
+                      for x in range(1000)),
+             {str(x): {'key': str(x), 'a': '2'} for x in range(1000)}]
+    res = utils.create_small_dicts(dicts, 3)
+    assert [list(x) for x in res] == [['0', '1', '2'], ['0', '1', '2']]
+    assert dicts[0].read == 3
+
+
+def test_plan_columns():
+    res = utils.plan_columns(conftest.values_for_prepare_columns[2][0], 'key')
+    assert res == (
+        ['key', const.DIFFERENT_FIELDS, 'field_3'],
+        [[1, None, None], [None, None, 1]]
+    )
+
+    fields = [f'field_{x}' for x in range(3000)]
+    settings = {const.COLUMNS: 1, const.DIFFERENT_FIELDS: False,
+                const.FIELDS: [fields, ['key'] + fields[::-1]]}
+    res = utils.plan_columns(settings, 'key')
+    assert res[0] == ['key'] + fields
+    assert res[1][0] == [None] + list(range(3000))
+    assert res[1][1] == [0] + list(range(3000, 0, -1))
+    assert utils.plan_columns({}, 'key') == ([], [[], []])
+
+
+def test_prepare_columns_ordered():
+    fields = [f'field_{x}' for x in range(3000)]
+    settings = {const.COLUMNS: 1, const.DIFFERENT_FIELDS: True,
+                const.FIELDS: [fields, ['key'] + fields[::-1] + ['extra']]}
+    assert utils.prepare_columns(settings, 'key') == \
+        ['key', const.DIFFERENT_FIELDS] + fields + ['extra']
+
+
+def test_save_load_profile(tmpdir):
+    file_name = utils.get_profile_path(tmpdir.join('test.csv').strpath)
+    assert file_name.endswith(f'test.csv{const.PROFILE_EXTENSION}')
+    assert utils.load_profile(file_name) == (None, None)
+
+    assert utils.save_profile(file_name, ['key', 'field_1', 'field_2']) \
+        is None
+    assert utils.load_profile(file_name) == (['key', 'field_1', 'field_2'],
+                                             None)
+
+    tmpdir.join('wrong.json').write('{}')
+    res = utils.load_profile(tmpdir.join('wrong.json').strpath)
+    assert res[0] is None
+    assert res[1].startswith(const.LOAD_PROFILE)
+
+
+def test_compile_regex():
+    pattern, error = utils.compile_regex(r'^field_\d$')
+    assert error is None
+    assert pattern.search('field_1')
+    assert utils.compile_regex('(')[1].startswith(const.COMPILE_REGEX)
+
+
+def test_convert_csv_to_dict_tables(init_csv, monkeypatch):
+    tables = {}
+    for name in ('white', 'grey'):
+        init_csv.append([name, ''.join(['E', 'UR']), None, '3'])
+    res, error = utils.convert_csv_to_dict(init_csv, 'name', init_csv[0],
+                                           tables)
+    expected, _ = utils.convert_csv_to_dict(init_csv, 'name', init_csv[0])
+    assert error is None
+    assert res == expected
+    assert init_csv[-1][1] is not init_csv[-2][1]
+    assert res['white']['value_1'] is res['grey']['value_1']
+    assert 'name' not in tables
+    assert tables['value_3'] == {'3': '3', '': ''}
+
+    monkeypatch.setattr(const, 'MAX_SIZE_VALUES_TABLE', 1)
+    table = {}
+    assert utils.intern_value(table, 'a') == 'a'
+    assert utils.intern_value(table, 'b') == 'b'
+    assert table == {'a': 'a'}
+
+
+def test_get_identical_fields():
+    csv_1 = [['key', 'a', 'b', 'c'], ['1', 'x', 'y', 'z'],
+             ['2', 'x', 'y', 'z'], ['3', 'only', 'in', 'first']]
+    csv_2 = [['key', 'a', 'b', 'd'], ['2', 'x', 'y', 'z'],
+             ['1', 'x', 'changed', 'z'], ['4', 'only', 'in', 'second']]
+    dicts = []
+    checksums = [{}, {}]
+    for index, csv_data in enumerate((csv_1, csv_2)):
+        dicts.append(utils.convert_csv_to_dict(
+            csv_data, 'key', csv_data[0], checksums=checksums[index]
+        )[0])
+
+    assert dicts[0] == utils.convert_csv_to_dict(csv_1, 'key', csv_1[0])[0]
+    identical = utils.get_identical_fields(dicts, checksums)
+    assert identical == {'key', 'a'}
+    assert utils.get_identical_fields([dicts[0], None], checksums) == set()
+
+    settings = dict(conftest.SETTINGS_REPORT, fields=[csv_1[0], csv_2[0]])
+    assert utils.generate_report(dicts, settings, 'key', identical) == \
+        utils.generate_report(dicts, settings, 'key')
+    assert utils.generate_statistics(dicts, settings, 'key', identical) == \
+        utils.generate_statistics(dicts, settings, 'key')
+
+
+def test_get_checksum_boundary():
+    assert utils.get_checksum('k1', '23') != utils.get_checksum('k12', '3')
+
+
+def test_get_identical_fields_swapped():
+    dicts = [{'k1': {'key': 'k1', 'a': '075526'},
+              'k2': {'key': 'k2', 'a': '457019'}},
+             {'k1': {'key': 'k1', 'a': '457019'},
+              'k2': {'key': 'k2', 'a': '075526'}}]
+    checksums = [{'key': 0, 'a': 0}, {'key': 0, 'a': 0}]
+    for index, dict_item in enumerate(dicts):
+        for key, record in dict_item.items():
+            for name, value in record.items():
+                checksums[index][name] += utils.get_checksum(key, value)
+    assert checksums[0]['a'] != checksums[1]['a']
+
+    assert utils.get_identical_fields(dicts, checksums) == {'key'}
+    assert utils.get_identical_fields(dicts, [{'key': 0, 'a': 0}] * 2) == \
+        {'key'}
+
+
+def test_get_checksum_repeated_keys():
+    assert utils.get_checksum('1', 'x') == 7586524058169547570
+    checksums = [{}, {}]
+    utils.convert_csv_to_dict([['key', 'a'], ['1', 'old'], ['2', 'y'],
+                               ['1', 'x']], 'key', None,
+                              checksums=checksums[0])
+    utils.convert_csv_to_dict([['key', 'a'], ['2', 'y'], ['1', 'x']], 'key',
+                              None, checksums=checksums[1])
+    assert checksums[0] == checksums[1]
@@ -4,35 +4,170 @@ Class CacheData and functions from file utils.py used in main file compare.py
 """
 
 
+import bz2
+import collections
 import csv
-
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import lzma
+import os
+import re
+import sqlite3
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+try:
+    import pyarrow
+    import pyarrow.feather
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+import pipeline
 import const
 
 
+def get_delta(old_item, new_item):
+    """
+    Create delta to get new item from old item. For dictionaries delta
+    contains only changed and removed keys, other items are kept as is.
+    Return delta
+    """
+    if isinstance(old_item, dict) and isinstance(new_item, dict):
+        changed = {key: value for key, value in new_item.items()
+                   if key not in old_item or old_item[key] != value}
+        removed = [key for key in old_item if key not in new_item]
+        return [const.DELTA_DICT, changed, removed]
+
+    return [const.DELTA_FULL, new_item]
+
+
+def apply_delta(item, delta):
+    """
+    Apply delta from get_delta to the item.
+    Return new item
+    """
+    if delta[0] == const.DELTA_DICT:
+        result = dict(item)
+        result.update(delta[1])
+        for key in delta[2]:
+            result.pop(key, None)
+        return result
+
+    return delta[1]
+
+
 class CacheData():
     """
     The class used to cache changes of settings
     The cache queue works according to the LIFA principle - the last change
     will leave the queue first, and the first change will go last.
+    Changes are kept in the ring buffer as deltas between neighbouring
+    changes, only the first change in the buffer is kept in full.
+    Every entry of the buffer is a pair: delta from the previous change and
+    delta back to the previous change.
     """
 
     def __init__(self, data=None, max_count=20):
-        self.data = []
-        self.count = 0
-        self.max_count = max_count
+        self.buffer = []
+        self.start = 0
+        self.length = 0
+        self.current = None
+        self._count = 0
+        self._max_count = max_count
+        self.clear()
         if data:
             self.append(data)
 
     def __len__(self):
-        return len(self.data)
+        return self.length
 
     def __repr__(self):
-        return f"CacheData(len of 'data': {len(self.data)}, " \
+        return f"CacheData(len of 'data': {self.length}, " \
                f"'count': {self.count}, 'max_count': {self.max_count})"
 
     def __str__(self):
         return repr(self)
 
+    @property
+    def count(self):
+        """
+        Counter of the current change
+        """
+        return self._count
+
+    @count.setter
+    def count(self, value):
+        self.current = self.get(value - 1) if value > 0 else None
+        self._count = value
+
+    @property
+    def max_count(self):
+        """
+        Maximum length of the queue
+        """
+        return self._max_count
+
+    @max_count.setter
+    def max_count(self, value):
+        data = self.data[-value:]
+        count = min(self.count, value)
+        self._max_count = value
+        self.clear()
+        for item in data:
+            self.append(item)
+        self.count = count
+
+    @property
+    def data(self):
+        """
+        All changes in the queue from the first to the last
+        """
+        result = []
+        for index in range(self.length):
+            entry = self.buffer[(self.start + index) % self.max_count]
+            if index == 0:
+                result.append(entry[0][1])
+            else:
+                result.append(apply_delta(result[-1], entry[0]))
+        return result
+
+    def entry(self, index):
+        """
+        Return entry of the buffer for the change with the index
+        """
+        return self.buffer[(self.start + index) % self.max_count]
+
+    def get(self, index):
+        """
+        Restore the change with the index in the queue. Deltas are applied
+        from the current change or from the first change in full, whichever
+        is nearer to the index.
+        Return the change or None
+        """
+        if not 0 <= index < self.length:
+            return None
+
+        position = self.count - 1
+        if position < 0 or index < abs(index - position):
+            position = 0
+            result = self.entry(0)[0][1]
+        else:
+            result = self.current
+
+        for number in range(position + 1, index + 1):
+            result = apply_delta(result, self.entry(number)[0])
+        for number in range(position, index, -1):
+            result = apply_delta(result, self.entry(number)[1])
+        return result
+
     def append(self, item):
         """
         Append the change in settings to the end of the queue.
@@ -43,14 +178,27 @@ class CacheData():
         the queue or the queue is empty, then the change is written to the
         end of the queue, and the value of the counter is increased by one.
         """
-        if self.count >= self.max_count:
-            self.data = self.data[1:]
-        elif self.count < len(self.data):
-            self.data = self.data[0:self.count]
-            self.count += 1
+        self.length = self.count
+
+        if self.length >= self.max_count:
+            first = self.entry(0)[0][1]
+            self.buffer[self.start] = None
+            self.start = (self.start + 1) % self.max_count
+            self.length -= 1
+            if self.length > 0:
+                second = apply_delta(first, self.entry(0)[0])
+                self.buffer[self.start] = [[const.DELTA_FULL, second], None]
+
+        if self.length == 0:
+            entry = [[const.DELTA_FULL, item], None]
         else:
-            self.count += 1
-        self.data.append(item)
+            entry = [get_delta(self.current, item),
+                     get_delta(item, self.current)]
+
+        self.buffer[(self.start + self.length) % self.max_count] = entry
+        self.length += 1
+        self._count = self.length
+        self.current = item
 
     def is_undo(self):
         """
@@ -64,7 +212,7 @@ class CacheData():
         Checking the possibility to redo of the change.
         Return True if the counter does not indicate on the last change
         """
-        return bool(self.count < len(self.data))
+        return bool(self.count < self.length)
 
     def undo(self):
         """
@@ -73,8 +221,10 @@ class CacheData():
         """
         result = None
         if self.is_undo():
-            self.count -= 1
-            result = self.data[self.count - 1]
+            self.current = apply_delta(self.current,
+                                       self.entry(self.count - 1)[1])
+            self._count -= 1
+            result = self.current
         return result
 
     def redo(self):
@@ -84,27 +234,389 @@ class CacheData():
         """
         result = None
         if self.is_redo():
-            result = self.data[self.count]
-            self.count += 1
+            self.current = apply_delta(self.current,
+                                       self.entry(self.count)[0])
+            self._count += 1
+            result = self.current
         return result
 
     def clear(self):
         """
         Clear the change
         """
-        self.data = []
-        self.count = 0
+        self.buffer = [None] * self.max_count
+        self.start = 0
+        self.length = 0
+        self._count = 0
+        self.current = None
+
+    def save(self, path):
+        """
+        Save all changes as deltas and the counter in json-file on the path.
+        Return error or None
+        """
+        error = None
+
+        try:
+            entries = [self.entry(index) for index in range(self.length)]
+            with open(path, 'w') as my_file:
+                json.dump({const.COUNT: self.count, const.DATA: entries},
+                          my_file)
+
+        except Exception as err:  # pylint: disable=W0703
+            error = f'{const.SAVE_HISTORY}{const.FAILED_ERROR}{err}'
+
+        return error
+
+    def load(self, path):
+        """
+        Load changes saved by save() from json-file on the path.
+        Only the last changes are kept, if there are more of them than the
+        maximum length of the queue.
+        Return error or None
+        """
+        error = None
+
+        try:
+            with open(path, 'r') as read_file:
+                history = json.load(read_file)
+
+            data = []
+            for index, entry in enumerate(history[const.DATA]):
+                if index == 0:
+                    data.append(entry[0][1])
+                else:
+                    data.append(apply_delta(data[-1], entry[0]))
+
+            count = history[const.COUNT] - max(len(data) - self.max_count, 0)
+            self.clear()
+            for item in data[-self.max_count:]:
+                self.append(item)
+            self.count = max(count, min(len(data), 1))
+
+        except Exception as err:  # pylint: disable=W0703
+            error = f'{const.LOAD_HISTORY}{const.FAILED_ERROR}{err}'
+
+        return error
+
+
+class ReportCache():
+    """
+    The class used to cache generated reports for snapshots of settings.
+    The least recently used report leaves the cache first, when the total
+    size of reports (count of cells) is more than the maximum size
+    """
+
+    def __init__(self, max_size=const.MAX_SIZE_REPORT_CACHE):
+        self.data = collections.OrderedDict()
+        self.size = 0
+        self.max_size = max_size
+
+    def __len__(self):
+        return len(self.data)
+
+    def __repr__(self):
+        return f"ReportCache(len of 'data': {len(self.data)}, " \
+               f"'size': {self.size}, 'max_size': {self.max_size})"
+
+    def __str__(self):
+        return repr(self)
+
+    @staticmethod
+    def get_key(settings, *identities):
+        """
+        Create canonical key from settings and identities of loaded data.
+        Return hex digest of the key
+        """
+        snapshot = json.dumps([settings, identities], sort_keys=True,
+                              default=str)
+        return hashlib.sha256(snapshot.encode()).hexdigest()
+
+    @staticmethod
+    def get_size(report):
+        """
+        Return size of the report as count of cells
+        """
+        return sum(len(row) for row in report) if report else 0
+
+    def get(self, key):
+        """
+        Get the report for the key and mark it as recently used.
+        Return the report or None
+        """
+        result = self.data.get(key)
+        if result is not None:
+            self.data.move_to_end(key)
+        return result
+
+    def append(self, key, report):
+        """
+        Append the report for the key to the cache.
+        The least recently used reports are removed while total size is more
+        than the maximum size. The report, which is bigger than the maximum
+        size, is not cached
+        """
+        size = self.get_size(report)
+        if report is None or size > self.max_size:
+            return
+
+        if key in self.data:
+            self.size -= self.get_size(self.data.pop(key))
+
+        self.data[key] = report
+        self.size += size
+
+        while self.size > self.max_size:
+            _, old_report = self.data.popitem(last=False)
+            self.size -= self.get_size(old_report)
+
+    def clear(self):
+        """
+        Clear the cache
+        """
+        self.data.clear()
+        self.size = 0
+
+
+def get_compression(path):
+    """
+    Get compression of file by extension of the path.
+    Return extension of compression or None and path without this extension
+    """
+    path = str(path)
+    for extension in const.COMPRESSIONS:
+        if path.endswith(extension):
+            return extension, path[:-len(extension)]
+    return None, path
+
+
+def open_binary_file(path, mode, compression):
+    """
+    Open binary file with the compression on the path.
+    Return file object
+    """
+    if compression == const.GZIP:
+        return gzip.open(path, mode)
+    if compression == const.BZIP2:
+        return bz2.open(path, mode)
+    if compression == const.XZ:
+        return lzma.open(path, mode)
+    if zstandard is None:
+        raise ImportError(const.ERROR_ZSTANDARD)
+    return zstandard.open(path, mode)
+
+
+def open_file(path, mode='r'):
+    """
+    Open text file on the path to read ('r') or to write ('w').
+    Compressed files (gz, bz2, xz, zst) are decompressed while reading
+    in a separate thread and compressed while writing.
+    Return file object
+    """
+    compression, _ = get_compression(path)
+
+    if compression is None:
+        return open(path, mode, newline='', buffering=const.CHUNK_SIZE)
+
+    binary_file = open_binary_file(path, mode + 'b', compression)
+    if mode == 'r':
+        binary_file = io.BufferedReader(pipeline.ThreadReader(binary_file),
+                                        const.CHUNK_SIZE)
+
+    return io.TextIOWrapper(binary_file, newline='')
+
+
+def is_columnar(path):
+    """
+    Check if file on the path is in columnar format (Parquet, Arrow IPC or
+    Feather) by extension of the path.
+    Return True or False
+    """
+    return str(path).endswith(tuple(const.COLUMNAR_FORMATS))
+
+
+def check_pyarrow():
+    """
+    Raise ImportError if package "pyarrow" is not installed
+    """
+    if pyarrow is None:
+        raise ImportError(const.ERROR_PYARROW)
+
+
+def load_columnar_header(path):
+    """
+    Load only names of columns from file in columnar format on the path.
+    Return list of names of columns
+    """
+    check_pyarrow()
+    if str(path).endswith(const.PARQUET):
+        return pyarrow.parquet.read_schema(path).names
+    with pyarrow.ipc.open_file(path) as reader:
+        return reader.schema.names
+
+
+def load_columnar_sample(path, column, count):
+    """
+    Load names of columns, count of rows and values of the column from the
+    first rows of file in columnar format on the path. Only the first row
+    group (or record batch) is read and only the column is projected.
+    Return tuple (names of columns, count of rows, values of the column)
+    """
+    check_pyarrow()
+    if str(path).endswith(const.PARQUET):
+        parquet_file = pyarrow.parquet.ParquetFile(path)
+        header = parquet_file.schema_arrow.names
+        header.index(column)
+        rows = parquet_file.metadata.num_rows
+        batch = next(parquet_file.iter_batches(count, columns=[column]), None)
+        values = batch.column(0).to_pylist() if batch is not None else []
+    else:
+        with pyarrow.memory_map(str(path)) as source, \
+                pyarrow.ipc.open_file(source) as reader:
+            header = reader.schema.names
+            index = header.index(column)
+            rows = sum(reader.get_batch(x).num_rows
+                       for x in range(reader.num_record_batches))
+            values = []
+            if reader.num_record_batches:
+                values = reader.get_batch(0).column(index)[:count].to_pylist()
+
+    return header, rows, ['' if x is None else str(x) for x in values]
+
+
+def load_columnar_data(path, columns=None):
+    """
+    Load data from file in columnar format on the path. If columns are set,
+    only these columns are read from the file.
+    Return data as list of rows with header in the first row
+    """
+    check_pyarrow()
+    if columns is not None:
+        columns = [x for x in load_columnar_header(path) if x in columns]
+
+    if str(path).endswith(const.PARQUET):
+        table = pyarrow.parquet.read_table(path, columns=columns)
+    else:
+        table = pyarrow.feather.read_table(path, columns=columns)
+
+    values = [['' if x is None else str(x) for x in column.to_pylist()]
+              for column in table.columns]
+    result = [table.column_names]
+    result.extend(list(row) for row in zip(*values))
+
+    return result
+
+
+def save_columnar_data(path, my_data, batch_rows=const.COLUMNAR_BATCH_ROWS):
+    """
+    Save data in file in columnar format on the path. All values are saved
+    as strings. Rows are written in batches, so data can be a generator and
+    is not loaded to memory at once
+    """
+    check_pyarrow()
+    rows = iter(my_data)
+    schema = pyarrow.schema([(x, pyarrow.string()) for x in next(rows, [])])
+
+    if str(path).endswith(const.PARQUET):
+        writer = pyarrow.parquet.ParquetWriter(path, schema)
+    else:
+        writer = pyarrow.ipc.new_file(path, schema)
+    with writer:
+        for batch in iter(lambda: list(itertools.islice(rows, batch_rows)),
+                          []):
+            writer.write_batch(pyarrow.record_batch([
+                pyarrow.array([None if row[index] is None else str(row[index])
+                               for row in batch], type=pyarrow.string())
+                for index in range(len(schema))
+            ], schema=schema))
+
+
+def is_sqlite(path):
+    """
+    Check if file on the path is SQLite database by extension of the path.
+    Return True or False
+    """
+    return str(path).endswith(const.SQLITE)
+
+
+def quote_name(name):
+    """
+    Return name of column quoted for SQL
+    """
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def save_sqlite_data(path, my_data):
+    """
+    Save data in table of SQLite database on the path with index on the
+    first column, so the table can be queried and paged without loading.
+    Rows are written one by one, the previous table is replaced
+    """
+    rows = iter(my_data)
+    header = next(rows, [])
+    names = ', '.join(f'{quote_name(x)} TEXT' for x in header)
+    table = quote_name(const.SQLITE_TABLE)
+
+    with sqlite3.connect(path) as connection:
+        connection.execute(f'DROP TABLE IF EXISTS {table}')
+        connection.execute(f'CREATE TABLE {table} ({names})')
+        connection.executemany(
+            f'INSERT INTO {table} VALUES ({", ".join("?" * len(header))})',
+            rows
+        )
+        if header:
+            connection.execute(f'CREATE INDEX {quote_name("index_key")} ON '
+                               f'{table} ({quote_name(header[0])})')
+    connection.close()
+
+
+def load_sqlite_data(path, columns=None, offset=0, count=-1):
+    """
+    Load data from table of SQLite database on the path. If columns are set,
+    only these columns are read. Rows are read in order of saving from the
+    offset, count -1 means all rows.
+    Return data as list of rows with header in the first row
+    """
+    table = quote_name(const.SQLITE_TABLE)
+
+    with sqlite3.connect(f'file:{path}?mode=ro', uri=True) as connection:
+        header = [x[1] for x in connection.execute(
+            f'PRAGMA table_info({table})'
+        )]
+        if columns is not None:
+            header = [x for x in header if x in columns]
+        result = [header]
+        result.extend(
+            ['' if x is None else x for x in row]
+            for row in connection.execute(
+                f'SELECT {", ".join(quote_name(x) for x in header)} '
+                f'FROM {table} ORDER BY rowid LIMIT ? OFFSET ?',
+                (count, offset)
+            )
+        )
+    connection.close()
+
+    return result
 
 
 def save_data(path, my_data):
     """
-    Save data in csv-file on the path.
+    Save data in csv-file, file in columnar format or SQLite database on the
+    path.
     Return error or None
     """
     error = None
 
     try:
-        my_file = open(path, 'w')
+        if is_columnar(path):
+            save_columnar_data(path, my_data)
+            return error
+
+        if is_sqlite(path):
+            save_sqlite_data(path, my_data)
+            return error
+
+        my_file = open_file(path, 'w')
         with my_file:
             writer = csv.writer(my_file)
             writer.writerows(my_data)
@@ -115,52 +627,405 @@ def save_data(path, my_data):
     return error
 
 
-def load_data(path):
+def load_header(path):
+    """
+    Load only header from csv-file, file in columnar format or SQLite
+    database on the path.
+    Return result of this action and error or None
+    """
+    result = None
+    error = None
+
+    if not path:
+        return result, error
+
+    try:
+        if is_columnar(path):
+            result = load_columnar_header(path)
+        elif is_sqlite(path):
+            result = load_sqlite_data(path, count=0)[0]
+        elif get_compression(path)[1].endswith(const.CSV):
+            with open_file(path, 'r') as read_file:
+                result = next(csv.reader(read_file), [])
+        else:
+            error = const.ERROR_READ_FILE
+    except Exception as err:  # pylint: disable=W0703
+        error = f'{const.LOAD_DATA}{const.FAILED_ERROR}{err}'
+
+    return result, error
+
+
+def load_data(path, columns=None, rules=None):
     """
-    Load data from csv-file on the path.
+    Load data from csv-file, file in columnar format or SQLite database on
+    the path.
+    If columns are set, only these columns are kept from every row while
+    parsing, and other columns are not stored. If rules are set (see
+    compile_rules), rows are normalized and filtered while parsing.
     Return result of this action and error or None
     """
     result = None
     error = None
 
-    if path:
-        with open(path, 'r') as open_file:
-            try:
-                if path.endswith(const.CSV):
+    if path and (is_columnar(path) or is_sqlite(path)):
+        try:
+            if is_columnar(path):
+                result = load_columnar_data(
+                    path, None if has_rules(rules) else columns
+                )
+            else:
+                result = load_sqlite_data(
+                    path, None if has_rules(rules) else columns
+                )
+            if has_rules(rules):
+                result = list(iter_filtered_rows(result, columns, rules))
+        except Exception as err:  # pylint: disable=W0703
+            error = f'{const.LOAD_DATA}{const.FAILED_ERROR}{err}'
+
+    elif path:
+        try:
+            if get_compression(path)[1].endswith(const.CSV):
+                with open_file(path, 'r') as read_file:
                     result = []
-                    data = csv.reader(open_file)
-                    for item in data:
-                        result.append(item)
-                else:
-                    error = const.ERROR_READ_FILE
-            except Exception as err:  # pylint: disable=W0703
-                error = f'{const.LOAD_DATA}{const.FAILED_ERROR}{err}'
+                    data = csv.reader(read_file)
+                    if has_rules(rules):
+                        result = list(iter_filtered_rows(data, columns,
+                                                         rules))
+                    elif columns is None:
+                        for item in data:
+                            result.append(item)
+                    else:
+                        header = next(data, [])
+                        indexes = [index for index, item in enumerate(header)
+                                   if item in columns]
+                        result.append([header[x] for x in indexes])
+                        for item in data:
+                            result.append([item[x] for x in indexes])
+            else:
+                error = const.ERROR_READ_FILE
+        except Exception as err:  # pylint: disable=W0703
+            error = f'{const.LOAD_DATA}{const.FAILED_ERROR}{err}'
 
     return result, error
 
 
-def convert_csv_to_dict(csv_data, name_key_field, list_field):
+def get_indexes_fields(header, name_key_field, list_field):
+    """
+    Find positions of key-field and selected fields in header of csv-file.
+    If list of fields is None, all fields are selected.
+    Return index of key-field and list of tuples (index, name of field)
+    """
+    key_field = None
+    fields = []
+
+    for index, item in enumerate(header):
+        if item == name_key_field:
+            key_field = index
+        if list_field is None or item in list_field:
+            fields.append((index, item))
+
+    return key_field, fields
+
+
+NORMALIZERS = {
+    'strip': str.strip,
+    'lower': str.lower,
+    'upper': str.upper,
+    'casefold': str.casefold,
+    'spaces': lambda value: ' '.join(value.split()),
+    'thousands': lambda value: re.sub(r"(?<=\d)[,' _\u00a0](?=\d{3}(?!\d))",
+                                      '', value),
+}
+
+
+def has_rules(rules):
+    """
+    Check if there are filters or normalizers in rules (or settings).
+    Return True or False
+    """
+    return bool(rules and (rules.get(const.FILTERS) or
+                           rules.get(const.NORMALIZERS)))
+
+
+def parse_filter(text):
+    """
+    Split filter like 'field==value' to field, operator and value. The
+    filter is split at the first operator, so operators can be in the
+    value; if operators start at the same position, the longest is used
+    ('!~' before '~').
+    Return tuple (field, operator, value)
+    """
+    found = [(text.find(x), -len(x), x) for x in const.FILTER_OPERATORS
+             if x in text]
+    if found:
+        position, _, operator = min(found)
+        if position > 0:
+            return (text[:position], operator,
+                    text[position + len(operator):])
+    raise ValueError(f'{const.ERROR_FILTER}{text}')
+
+
+def compile_rules(header, rules):
+    """
+    Compile filters of rows (const.FILTERS, list of strings like
+    'field==value', all filters must be true) and normalizers of columns
+    (const.NORMALIZERS, dictionary of field and list of names from
+    const.VARIANTS_NORMALIZERS) from rules for the header once.
+    Values are normalized before filters are checked. If the key-field is
+    normalized, keys which become equal are repeated keys, and the last row
+    wins like in convert_csv_to_dict.
+    Return function which returns normalized row or None if the row is
+    filtered out, or None if there are no rules
+    """
+    if not has_rules(rules):
+        return None
+    filters = rules.get(const.FILTERS) or []
+    normalizers = rules.get(const.NORMALIZERS) or {}
+
+    steps = []
+    for name, names in normalizers.items():
+        unknown = [x for x in names if x not in NORMALIZERS]
+        if unknown:
+            raise ValueError(f'{const.ERROR_NORMALIZER}{unknown[0]}')
+        if name in header:
+            steps.append((header.index(name), [NORMALIZERS[x] for x in names]))
+
+    checks = []
+    for text in filters:
+        name, operator, value = parse_filter(text)
+        if name not in header:
+            raise ValueError(f'{const.ERROR_FILTER_FIELD}{name}')
+        if operator in ('~', '!~'):
+            check = re.compile(value).search
+        else:
+            check = value.__eq__
+        checks.append((header.index(name), check, operator in ('==', '~')))
+
+    def apply_rules(row):
+        for index, functions in steps:
+            value = row[index]
+            for function in functions:
+                value = function(value)
+            row[index] = value
+        for index, check, expected in checks:
+            if bool(check(row[index])) != expected:
+                return None
+        return row
+
+    return apply_rules
+
+
+def iter_filtered_rows(rows, columns=None, rules=None):
+    """
+    Apply rules (see compile_rules) to rows with header in the first row and
+    keep only columns (all if columns are None).
+    Return generator of rows with header in the first row
+    """
+    rows = iter(rows)
+    header = next(rows, [])
+    apply_rules = compile_rules(header, rules)
+    indexes = None
+    if columns is not None:
+        indexes = [index for index, item in enumerate(header)
+                   if item in columns]
+    yield header if indexes is None else [header[x] for x in indexes]
+
+    for row in rows:
+        if apply_rules is not None:
+            row = apply_rules(row)
+            if row is None:
+                continue
+        yield row if indexes is None else [row[x] for x in indexes]
+
+
+def compile_regex(pattern):
+    """
+    Compile the regular expression.
+    Return compiled pattern and error or None as tuple
+    """
+    result = None
+    error = None
+
+    try:
+        result = re.compile(pattern)
+    except re.error as err:
+        error = f'{const.COMPILE_REGEX}{const.FAILED_ERROR}{err}'
+
+    return result, error
+
+
+def get_profile_path(path):
+    """
+    Return path of default profile with selected fields for file on the path
+    """
+    return f'{path}{const.PROFILE_EXTENSION}'
+
+
+def save_profile(path, lists_fields):
+    """
+    Save key-field (the first in the list) and selected fields as profile in
+    json-file on the path.
+    Return error or None
+    """
+    error = None
+
+    try:
+        with open(path, 'w') as my_file:
+            json.dump({const.KEY: lists_fields[0],
+                       const.FIELDS: lists_fields[1:]}, my_file, indent=4)
+
+    except Exception as err:  # pylint: disable=W0703
+        error = f'{const.SAVE_PROFILE}{const.FAILED_ERROR}{err}'
+
+    return error
+
+
+def load_profile(path):
+    """
+    Load profile with key-field and selected fields from json-file on the
+    path.
+    Return list of fields with key-field first and error or None as tuple
+    """
+    result = None
+    error = None
+
+    if not path or not os.path.exists(path):
+        return result, error
+
+    try:
+        with open(path, 'r') as read_file:
+            profile = json.load(read_file)
+        result = [profile[const.KEY]] + [x for x in profile[const.FIELDS]
+                                         if x != profile[const.KEY]]
+
+    except Exception as err:  # pylint: disable=W0703
+        error = f'{const.LOAD_PROFILE}{const.FAILED_ERROR}{err}'
+
+    return result, error
+
+
+def intern_value(table, value):
+    """
+    Find the same value in the table of column (dictionary encoding) and
+    return it, so all repeated values of the column are one object and they
+    are compared by identity. New values are added to the table while it is
+    less than the maximum size, so columns with a lot of unique values do not
+    grow the table.
+    Return value from the table or the value
+    """
+    if not isinstance(value, str):
+        return value
+
+    result = table.get(value)
+    if result is None:
+        result = value
+        if len(table) < const.MAX_SIZE_VALUES_TABLE:
+            table[value] = value
+    return result
+
+
+def get_hash(*values):
+    """
+    Return stable 64-bit hash of values separated by zero character as
+    integer
+    """
+    data = '\0'.join(values).encode(const.ENCODING)
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(),
+                          'little')
+
+
+def get_checksum(key, value):
+    """
+    Return stable checksum (64-bit hash of the key and the value) of the
+    value of the row with the key. Checksum of the column is the sum of
+    checksums of its values, so it does not depend on order of rows
+    """
+    return get_hash(str(key), str(value))
+
+
+def get_identical_fields(dicts, checksums):
+    """
+    Find fields which have identical values for all keys which are in both
+    dictionaries by checksums of columns from convert_csv_to_dict: checksums
+    of values of keys which are only in one dictionary are subtracted from
+    checksums of columns, and then checksums of both files are compared.
+    Equal checksums only select candidates: values of candidates are
+    compared for keys in both dictionaries, and the comparison stops on the
+    first different value.
+    Return set of identical fields
+    """
+    result = set()
+    if not (dicts[0] and dicts[1] and checksums[0] and checksums[1]):
+        return result
+
+    aligned = [dict(checksums[0]), dict(checksums[1])]
+    for index in range(2):
+        other = dicts[1 - index]
+        for key, record in dicts[index].items():
+            if key not in other:
+                for name, value in record.items():
+                    aligned[index][name] = (aligned[index][name] -
+                                            get_checksum(key, value)) \
+                        & const.MASK
+
+    common = [x for x in dicts[0] if x in dicts[1]]
+    for name, checksum in aligned[0].items():
+        if aligned[1].get(name) == checksum and all(
+                dicts[0][x].get(name) == dicts[1][x].get(name)
+                for x in common):
+            result.add(name)
+
+    return result
+
+
+def convert_csv_to_dict(csv_data, name_key_field, list_field, tables=None,
+                        checksums=None):
     """
     Convert data from csv-file to the dictionary.
+    If tables is set (dictionary of tables of columns, which can be shared
+    between files), repeated values of every column are interned with
+    intern_value.
+    If checksums is set (dictionary), checksums of columns are counted in it
+    with get_checksum while rows are converted. If the key repeats, only the
+    last record is counted like it is kept in the dictionary.
     Return result of this action and error or None as tuple
     """
     result = {}
     error = None
-    key_field = None
-    fields = []
 
     try:
-        for index, item in enumerate(csv_data[0]):
-            if item == name_key_field:
-                key_field = index
-            if item in list_field:
-                fields.append((index, item))
+        key_field, fields = get_indexes_fields(csv_data[0], name_key_field,
+                                               list_field)
+        if tables is not None:
+            fields = [(index, name, tables.setdefault(name, {})
+                       if name != name_key_field else None)
+                      for index, name in fields]
+        if checksums is not None:
+            for item in fields:
+                checksums[item[1]] = 0
 
         for row in csv_data[1:]:
-            ret = {}
-            for item in fields:
-                ret.update({item[1]: row[item[0]]})
-            result.update({row[key_field]: ret})
+            key = row[key_field]
+            if tables is not None:
+                record = {item[1]: row[item[0]] if item[2] is None
+                          else intern_value(item[2], row[item[0]])
+                          for item in fields}
+            else:
+                record = {}
+                for item in fields:
+                    record.update({item[1]: row[item[0]]})
+
+            if checksums is not None:
+                old_record = result.get(key)
+                for name, value in record.items():
+                    checksums[name] += get_checksum(key, value)
+                    if old_record is not None:
+                        checksums[name] -= get_checksum(key, old_record[name])
+            result.update({key: record})
+
+        if checksums is not None:
+            for name in checksums:
+                checksums[name] &= const.MASK
 
     except Exception as err:  # pylint: disable=W0703
         error = f'{const.CSV_TO_DICT}{const.FAILED_ERROR}{err}'
@@ -168,80 +1033,275 @@ def convert_csv_to_dict(csv_data, name_key_field, list_field):
     return result, error
 
 
-def create_small_dicts(dicts):
+def iter_rows(path):
+    """
+    Read rows from csv-file, file in columnar format or SQLite database on
+    the path one by one without loading of whole csv-file. The first row is
+    header
+    """
+    if is_columnar(path):
+        yield from load_columnar_data(path)
+        return
+
+    if is_sqlite(path):
+        yield from load_sqlite_data(path)
+        return
+
+    with open_file(path, 'r') as read_file:
+        yield from csv.reader(read_file)
+
+
+def iter_records(path, name_key_field, list_field, rules=None):
+    """
+    Read records from file on the path one by one. Records have the same
+    shape as values of the dictionary from convert_csv_to_dict, but the whole
+    dictionary is not built. Rules (see compile_rules) are applied to rows
+    before records are built.
+    Return generator of tuples (key, record)
+    """
+    rows = iter_rows(path)
+    if has_rules(rules):
+        rows = iter_filtered_rows(rows, None, rules)
+    key_field, fields = get_indexes_fields(next(rows, []), name_key_field,
+                                           list_field)
+    if key_field is None:
+        raise KeyError(name_key_field)
+
+    for row in rows:
+        yield row[key_field], {item[1]: row[item[0]] for item in fields}
+
+
+def update_hash_file(hash_file, path, size=None, start=0,
+                     chunk_size=const.CHUNK_SIZE):
+    """
+    Update the hash object with bytes of file on the path from the start
+    offset to the end of the file or to the size offset.
+    Return the hash object
+    """
+    with open(path, 'rb') as read_file:
+        read_file.seek(start)
+        if size is None:
+            for chunk in iter(lambda: read_file.read(chunk_size), b''):
+                hash_file.update(chunk)
+        else:
+            size -= start
+            while size > 0:
+                chunk = read_file.read(min(chunk_size, size))
+                if not chunk:
+                    break
+                hash_file.update(chunk)
+                size -= len(chunk)
+
+    return hash_file
+
+
+def get_hash_file(path, chunk_size=const.CHUNK_SIZE, size=None):
+    """
+    Calculate hash of whole file on the path or of its first size bytes.
+    Return hex digest of the hash
+    """
+    return update_hash_file(hashlib.sha256(), path, size,
+                            chunk_size=chunk_size).hexdigest()
+
+
+def get_different_key(dicts):
+    """
+    Find the first key with different records in two dictionaries.
+    Return the key or None
+    """
+    for key, row in dicts[0].items():
+        if dicts[1].get(key) != row:
+            return key
+    return next((x for x in dicts[1] if x not in dicts[0]), None)
+
+
+def is_equal_files(paths, name_key_field, list_field):
+    """
+    Check if two csv-files are equal for key-field and selected fields
+    without building of full dictionaries.
+    At first sizes and hashes of files are compared, then both files are read
+    row by row. The first difference is not final, because a later row of
+    the same key replaces it like in convert_csv_to_dict, so files are read
+    to the end.
+    Rows which have not pair in other file yet are kept until the pair will
+    be found, so files with the same order of keys need very little memory
+    (only keys are kept). If the key repeats, files are compared by full
+    dictionaries where the last row of the key wins.
+    Return result of this action, the first different key or None and
+    error or None as tuple
+    """
+    result = True
+    different_key = None
+    error = None
+
+    try:
+        if (os.path.getsize(paths[0]) == os.path.getsize(paths[1]) and
+                get_hash_file(paths[0]) == get_hash_file(paths[1])):
+            return result, different_key, error
+
+        readers = [iter_records(path, name_key_field, list_field)
+                   for path in paths]
+        waiting = [{}, {}]
+        seen = [set(), set()]
+        is_repeated = False
+
+        for records in itertools.zip_longest(*readers):
+            for number, record in enumerate(records):
+                if record is None:
+                    continue
+
+                key, row = record
+                if key in seen[number]:
+                    is_repeated = True
+                    break
+                seen[number].add(key)
+                other = waiting[1 - number]
+
+                if key in other:
+                    if other.pop(key) != row and different_key is None:
+                        different_key = key
+                else:
+                    waiting[number][key] = row
+            if is_repeated:
+                break
+
+        if is_repeated:
+            different_key = get_different_key([
+                dict(iter_records(path, name_key_field, list_field))
+                for path in paths
+            ])
+            result = different_key is None
+        else:
+            for number in range(2):
+                if different_key is None and waiting[number]:
+                    different_key = next(iter(waiting[number]))
+            result = different_key is None
+
+    except Exception as err:  # pylint: disable=W0703
+        result = None
+        error = f'{const.EQUAL_FILES}{const.FAILED_ERROR}{err}'
+
+    return result, different_key, error
+
+
+def is_different_rows(row_1, row_2):
+    """
+    Check if values of common fields of two rows are different.
+    Return True or False
+    """
+    if not (isinstance(row_1, dict) and isinstance(row_2, dict)):
+        return row_1 != row_2
+    return any(row_2[item] != value for item, value in row_1.items()
+               if item in row_2)
+
+
+def create_small_dicts(dicts, count=const.LEN_SMALL_DICTS):
     """
     Create small dictionaries from full dictionaries to show.
+    If both dictionaries are set, small dictionaries are aligned by keys:
+    they contain the same keys from both dictionaries (rows with different
+    values first) and keys which are only in one of dictionaries. Keys are
+    looked through only until count of keys with different values is found.
     Return small dictionaries
     """
     result = [{}, {}]
 
-    for index, dict_item in enumerate(dicts):
-        if dict_item is None or len(dict_item) == 0:
-            continue
+    if not (dicts[0] and dicts[1]):
+        for index, dict_item in enumerate(dicts):
+            if dict_item:
+                for key in itertools.islice(dict_item, count):
+                    result[index][key] = dict_item[key]
+        return result
 
-        keys = dict_item.keys()
-        count = 0
+    different = []
+    same = []
+    only = [[], []]
 
-        for key in keys:
-            if count >= const.LEN_SMALL_DICTS:
-                break
+    for key, row in dicts[0].items():
+        if key not in dicts[1]:
+            if len(only[0]) < count:
+                only[0].append(key)
+        elif is_different_rows(row, dicts[1][key]):
+            different.append(key)
+        elif len(same) < count:
+            same.append(key)
+
+        if len(different) >= count:
+            break
+
+    for key in dicts[1]:
+        if len(only[1]) >= count:
+            break
+        if key not in dicts[0]:
+            only[1].append(key)
+
+    count_common = count - min(count // 2, max(len(only[0]), len(only[1])))
+    common = (different + same)[:count_common]
 
-            result[index].update({key: dict_item[key]})
-            count += 1
+    for index, dict_item in enumerate(dicts):
+        for key in common + only[index][:count - len(common)]:
+            result[index][key] = dict_item[key]
 
     return result
 
 
-def prepare_columns(settings, key_field):
+def plan_columns(settings, key_field):
     """
-    Create names of columns for result
-    Return these names
+    Create names of columns for result and positions of these columns in
+    lists of fields of both files. Lists of fields are used as ordered sets,
+    so the plan is built in linear time from count of fields.
+    Return names of columns and two lists of positions (position is None if
+    column is absent in the file)
     """
     result = []
+    positions = [[], []]
 
     if settings.get(const.FIELDS) and isinstance(settings[const.FIELDS], list):
         mode = settings[const.COLUMNS]
+        fields = [dict.fromkeys(x or []) for x in settings[const.FIELDS]]
 
         if mode == 0:
-            for item in settings[const.FIELDS][0]:
-                if item in settings[const.FIELDS][1]:
-                    result.append(item)
+            result = [x for x in fields[0] if x in fields[1]]
 
         elif mode == 1:
-            result = settings[const.FIELDS][0][0:]
-            for item in settings[const.FIELDS][1]:
-                if item not in result:
-                    result.append(item)
+            result = list(fields[0])
+            result.extend(x for x in fields[1] if x not in fields[0])
 
         elif mode == 2:
-            for item in settings[const.FIELDS][0]:
-                if item not in settings[const.FIELDS][1]:
-                    result.append(item)
-            for item in settings[const.FIELDS][1]:
-                if item not in settings[const.FIELDS][0]:
-                    result.append(item)
+            result = [x for x in fields[0] if x not in fields[1]]
+            result.extend(x for x in fields[1] if x not in fields[0])
 
         elif mode == 3:
-            result = settings[const.FIELDS][0][0:]
+            result = list(fields[0])
 
         else:
-            result = settings[const.FIELDS][1][0:]
+            result = list(fields[1])
 
-        if key_field not in result:
-            result.insert(0, key_field)
-        elif result.index(key_field) != 0:
-            result.pop(result.index(key_field))
-            result.insert(0, key_field)
+        result = [key_field] + [x for x in result if x != key_field]
 
         if settings[const.DIFFERENT_FIELDS]:
             result.insert(1, const.DIFFERENT_FIELDS)
 
-    return result
+        for index, item in enumerate(fields):
+            numbers = {name: number for number, name in enumerate(item)}
+            positions[index] = [numbers.get(x) if x != const.DIFFERENT_FIELDS
+                                else None for x in result]
+
+    return result, positions
 
 
-def process(list_field, dict_1, dict_2, key, settings):
+def prepare_columns(settings, key_field):
+    """
+    Create names of columns for result (see plan_columns).
+    Return these names
+    """
+    return plan_columns(settings, key_field)[0]
+
+
+def process(list_field, dict_1, dict_2, key, settings, identical=()):
     """
-    Create row of result dictionary depending on settings
+    Create row of result dictionary depending on settings.
+    Values of identical fields (see get_identical_fields) are not compared.
     Return result row
     """
     different_fields = None
@@ -254,6 +1314,7 @@ def process(list_field, dict_1, dict_2, key, settings):
         elif settings.get(const.DELIMITER):
             delimiter = const.VARIANTS_DELIMIT[settings[const.DELIMITER]]
 
+    is_both = dict_1 is not None and dict_2 is not None
     for item in list_field:
         if item == list_field[0]:
             res.append(str(key))
@@ -262,6 +1323,14 @@ def process(list_field, dict_1, dict_2, key, settings):
             res.append(const.NOTHING)
             different_fields = []
 
+        elif is_both and item in identical:
+            if settings.get(const.VALUES_MATH) == 0:
+                res.append(const.NOTHING)
+            elif settings.get(const.VALUES_MATH) == 2:
+                res.append(const.MATH)
+            else:
+                res.append(dict_1[item])
+
         elif dict_1 and dict_2 is None:
             res.append(dict_1.get(item))
 
@@ -318,9 +1387,23 @@ def process(list_field, dict_1, dict_2, key, settings):
     return res
 
 
-def generate_report(dicts, settings, key_field):
+def is_key_in_report(settings, dict_1, dict_2):
+    """
+    Check if the key with records dict_1 and dict_2 (None if the key is
+    absent in the file) is included to the report depending on settings.
+    Return True or False
+    """
+    mode = settings.get(const.ITEMS)
+    return ((mode == 0 and dict_1 is not None and bool(dict_2)) or
+            mode == 1 or
+            (mode == 2 and dict_1 is not None and dict_2 is None) or
+            (mode == 3 and dict_1 is None and dict_2 is not None))
+
+
+def generate_report(dicts, settings, key_field, identical=()):
     """
-    Create result dictionary of compare two dictionaries
+    Create result dictionary of compare two dictionaries.
+    Values of identical fields (see get_identical_fields) are not compared.
     Return result dictionary
     """
     result = []
@@ -351,7 +1434,7 @@ def generate_report(dicts, settings, key_field):
     result.append(list_field)
     for key in keys:
         row = process(list_field, dicts[0].get(key), dicts[1].get(key),
-                      key, settings)
+                      key, settings, identical)
 
         if len(row) > 0:
             result.append(row)
@@ -359,6 +1442,73 @@ def generate_report(dicts, settings, key_field):
     return result
 
 
+def generate_statistics(dicts, settings, key_field, identical=()):
+    """
+    Compare two dictionaries like generate_report, but only count the rows
+    in both files, the rows only in one of them, the changed rows and the
+    number of changes for every column.
+    Identical fields (see get_identical_fields) are skipped.
+    Return dictionary with statistics or None
+    """
+    if not (isinstance(dicts, list) and len(dicts) == 2 and
+            isinstance(settings, dict) and
+            len(settings.get(const.FIELDS)) > 0 and
+            isinstance(dicts[0], dict) and isinstance(dicts[1], dict)):
+        return None
+
+    list_field = [x for x in prepare_columns(settings, key_field)[1:]
+                  if x != const.DIFFERENT_FIELDS]
+    histogram = {x: 0 for x in list_field}
+    list_field = [x for x in list_field if x not in identical]
+    result = {
+        const.ROWS_IN_BOTH: 0,
+        const.ROWS_ONLY_FIRST: 0,
+        const.ROWS_ONLY_SECOND: 0,
+        const.ROWS_CHANGED: 0,
+        const.DIFFERENT_FIELDS: histogram,
+    }
+
+    for key, row_1 in dicts[0].items():
+        row_2 = dicts[1].get(key)
+        if row_2 is None:
+            result[const.ROWS_ONLY_FIRST] += 1
+            continue
+
+        result[const.ROWS_IN_BOTH] += 1
+        is_changed = False
+        for item in list_field:
+            value_1 = row_1.get(item)
+            value_2 = row_2.get(item)
+            if (value_1 is not None and value_2 is not None and
+                    value_1 != value_2):
+                histogram[item] += 1
+                is_changed = True
+        if is_changed:
+            result[const.ROWS_CHANGED] += 1
+
+    result[const.ROWS_ONLY_SECOND] = \
+        len(dicts[1]) - result[const.ROWS_IN_BOTH]
+
+    return result
+
+
+def save_statistics(path, statistics):
+    """
+    Save statistics from generate_statistics in json-file on the path.
+    Return error or None
+    """
+    error = None
+
+    try:
+        with open(path, 'w') as my_file:
+            json.dump(statistics, my_file, indent=4)
+
+    except Exception as err:  # pylint: disable=W0703
+        error = f'{const.SAVE_STATISTICS}{const.FAILED_ERROR}{err}'
+
+    return error
+
+
 def dict_to_table(in_dict, list_field):
     """
     Create table from dictionary